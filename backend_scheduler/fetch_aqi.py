@@ -7,6 +7,7 @@ import psycopg2
 import time
 from dotenv import load_dotenv
 from datetime import datetime
+from notify import notify_ingest
 
 # Load environment variables
 load_dotenv()
@@ -96,6 +97,9 @@ def insert_aqi_data(conn, aqi_records_df):
             cursor.execute(insert_query, data_tuple)
             inserted_count += cursor.rowcount 
 
+        # Delivered on commit: the dashboard refreshes as soon as the rows are visible
+        if inserted_count:
+            notify_ingest(cursor, 'aqi_data', aqi_records_df['station'])
         conn.commit() 
         print(f"✅ [DB] Successfully inserted/updated {inserted_count} AQI records.")
         
@@ -4,6 +4,7 @@ import psycopg2
 import time
 from dotenv import load_dotenv
 from datetime import datetime
+from notify import notify_ingest
 
 # 🛡️ BULLETPROOF ENV LOADING
 # This forces Python to look in the same folder as the script for .env
@@ -129,6 +130,8 @@ def fetch_and_store_traffic():
                 UNIQUE(time, station_name)
             );
         """)
+        # Per-station range scans for the inference fetch (preprocessor.fetch_recent)
+        cursor.execute("CREATE INDEX IF NOT EXISTS traffic_data_station_time_idx ON traffic_data (station_name, time DESC);")
         
         insert_query = """
             INSERT INTO traffic_data (time, station_name, current_speed, free_flow_speed, congestion_factor)
@@ -138,6 +141,7 @@ def fetch_and_store_traffic():
         
         timestamp = datetime.now()
         records_inserted = 0
+        updated_stations = []
 
         for station_name, lat, lon in stations:
             result = get_traffic_data(lat, lon)
@@ -149,8 +153,11 @@ def fetch_and_store_traffic():
                     timestamp, station_name, current_speed, free_flow_speed, congestion_factor
                 ))
                 records_inserted += 1
+                updated_stations.append(station_name)
                 time.sleep(0.5) 
         
+        if updated_stations:
+            notify_ingest(cursor, 'traffic_data', updated_stations)
         conn.commit()
         print(f"✅ [Traffic] Successfully stored data for {records_inserted} stations.")
 
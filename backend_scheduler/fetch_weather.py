@@ -7,6 +7,7 @@ import psycopg2
 import time
 from dotenv import load_dotenv
 from datetime import datetime
+from notify import notify_ingest
 
 # Load environment variables from .env file
 load_dotenv()
@@ -64,6 +65,8 @@ def insert_weather_data(conn, weather_data):
     try:
         cursor = conn.cursor()
         cursor.execute(insert_query, data_tuple)
+        if cursor.rowcount:
+            notify_ingest(cursor, 'weather_data')  # Weather feeds every station
         conn.commit() # Commit the transaction to save the data
         cursor.close()
         print(f"✅ [DB] Successfully inserted weather data for {timestamp}")
@@ -5,6 +5,7 @@ import requests
 import psycopg2
 import time
 from datetime import datetime
+from notify import notify_ingest
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -141,8 +142,12 @@ def save_to_db(records):
     try:
         c = conn.cursor()
         c.executemany(query, records)
+        inserted = c.rowcount   # executemany sums the rows across all statements
+        # Only when something was written: a run that hits ON CONFLICT everywhere changes nothing
+        if inserted:
+            notify_ingest(c, 'aqi_data', [r[1] for r in records])
         conn.commit()
-        print(f"🎉 Success! Inserted {c.rowcount} records.")
+        print(f"🎉 Success! Inserted {inserted} records.")
         conn.close()
     except Exception as e:
         print(f"❌ DB Error: {e}")
@@ -0,0 +1,17 @@
+# notify.py
+
+import json
+
+# --- Settings ---
+CHANNEL = 'aeris_data'   # LISTENed to by ml_engine/data_events.py (dashboard)
+MAX_PAYLOAD = 7900       # Postgres caps NOTIFY payloads at 8000 bytes
+
+def notify_ingest(cursor, table, stations=None):
+    """
+    Queues a NOTIFY in the current transaction. Postgres delivers it on COMMIT and drops it
+    on rollback, so listeners only hear about committed rows. stations=None means all stations.
+    """
+    payload = json.dumps({'table': table, 'stations': None if stations is None else sorted(set(stations))})
+    if len(payload.encode()) > MAX_PAYLOAD:
+        payload = json.dumps({'table': table, 'stations': None})
+    cursor.execute("SELECT pg_notify(%s, %s);", (CHANNEL, payload))
@@ -74,6 +74,17 @@ except ImportError as e:
     print(f"   ❌ WARNING: Could not import fetch_traffic: {e}")
 
 
+# Forecast writer (runs in its own process: TensorFlow stays out of the scheduler)
+ML_ENGINE_DIR = BASE_DIR.parent / "ml_engine"
+FORECAST_SCRIPT = ML_ENGINE_DIR / "forecast_writer.py"
+RASTER_SCRIPT = ML_ENGINE_DIR / "forecast_raster.py"
+STORE_SCRIPT = ML_ENGINE_DIR / "tensor_store.py"
+if FORECAST_SCRIPT.exists():
+    print("   ✅ Forecast writer found.")
+else:
+    print(f"   ❌ WARNING: Forecast writer not found at {FORECAST_SCRIPT}")
+
+
 # --- 3. ROBUST JOB WRAPPERS ---
 
 def run_weather_job():
@@ -138,6 +149,52 @@ def run_traffic_job():
     print("--- Traffic job finished ---")
 
 
+def run_store_job():
+    """Appends the hour's merged rows to the dense feature store (tensor_store.py)."""
+    print(f"\n--- 🧊 Running Feature store job at {datetime.now()} ---")
+    
+    if not STORE_SCRIPT.exists():
+        print("⚠️ SKIPPING: Feature store is missing.")
+        return
+
+    try:
+        subprocess.run([sys.executable, str(STORE_SCRIPT), '--append'], cwd=ML_ENGINE_DIR, check=True, timeout=900)
+    except Exception as e:
+        print(f"❌ Error during Feature store job: {e}")
+    print("--- Feature store job finished ---")
+
+
+def run_forecast_job():
+    """Batch-forecasts every station into forecast_logs once the hour's data is in."""
+    print(f"\n--- 🔮 Running Forecast job at {datetime.now()} ---")
+    
+    if not FORECAST_SCRIPT.exists():
+        print("⚠️ SKIPPING: Forecast writer is missing.")
+        return
+
+    try:
+        # cwd=ml_engine so the model/pipeline files resolve like a manual run
+        subprocess.run([sys.executable, str(FORECAST_SCRIPT)], cwd=ML_ENGINE_DIR, check=True, timeout=900)
+    except Exception as e:
+        print(f"❌ Error during Forecast job: {e}")
+    print("--- Forecast job finished ---")
+
+
+def run_raster_job():
+    """Forecasts the whole city grid into the dashboard's heatmap raster."""
+    print(f"\n--- 🗺️ Running Raster job at {datetime.now()} ---")
+    
+    if not RASTER_SCRIPT.exists():
+        print("⚠️ SKIPPING: Raster job is missing.")
+        return
+
+    try:
+        subprocess.run([sys.executable, str(RASTER_SCRIPT)], cwd=ML_ENGINE_DIR, check=True, timeout=900)
+    except Exception as e:
+        print(f"❌ Error during Raster job: {e}")
+    print("--- Raster job finished ---")
+
+
 # --- 4. THE IMMORTAL MAIN LOOP ---
 print("\n🚀 Scheduler started. Waiting for top of the hour...")
 
@@ -146,6 +203,9 @@ print("\n🚀 Scheduler started. Waiting for top of the hour...")
 schedule.every().hour.at(":00").do(run_weather_job)
 schedule.every().hour.at(":01").do(run_dual_aqi_job)
 schedule.every().hour.at(":02").do(run_traffic_job)
+schedule.every().hour.at(":04").do(run_store_job)     # After all three ingestion jobs
+schedule.every().hour.at(":05").do(run_forecast_job)  # Reads the store when AERIS_FEATURE_STORE=1
+schedule.every().hour.at(":07").do(run_raster_job)
 
 # Show upcoming jobs
 print(f"📅 Next run scheduled for: {schedule.next_run()}")
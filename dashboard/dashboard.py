@@ -5,24 +5,34 @@ import pandas as pd
 import numpy as np
 import psycopg2
 import os
-import tensorflow as tf
-import joblib
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import timedelta
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from streamlit_autorefresh import st_autorefresh  # pip install streamlit-autorefresh
 
 # Import Logic
-from preprocessor import fetch_data, FEATURE_COLS, TARGET_COL
-from virtual_sensor import generate_virtual_input
+from preprocessor import fetch_recent, latest_feature_hour
+from features import load_pipeline
+from predict import forecast, load_forecast_model, find_model_path
+from forecast_writer import latest_forecast, model_version
+from prediction_cache import PredictionCache
+import forecast_client
+from data_events import DataListener, changed_stations
+from virtual_sensor import VirtualSensorGrid, station_windows, load_wards
+from forecast_raster import load_raster, png_data_uri, RASTER_PATH
+from history import fetch_history
 
 load_dotenv()
 
 # --- Config ---
 MODEL_PATH = 'aeris_v1.keras'
 SCALER_PATH = 'scaler.gz'
+PIPELINE_PATH = 'feature_pipeline.gz'
 LOOKBACK_WINDOW = 24
+FORECAST_MAX_AGE_HOURS = 3   # Older logged forecasts are ignored and the model runs live
+WATCH_SECONDS = 2            # How often a session checks the (in-memory) data generation
+DATA_TTL_SECONDS = 3600      # Backstop expiry for DB-derived caches if notifications stop
+HISTORY_RANGES = {"24h": 24, "7d": 24 * 7, "30d": 24 * 30, "1y": 24 * 365}
 
 st.set_page_config(
     page_title="Aeris Engine | Command Center",
@@ -31,10 +41,6 @@ st.set_page_config(
     initial_sidebar_state="collapsed" # Collapsed for full screen impact
 )
 
-# --- 1. The "Heartbeat" (Auto-Refresh) ---
-# Refreshes every 60 seconds to fetch new API data
-count = st_autorefresh(interval=60000, key="data_refresh")
-
 # --- CSS Polish (Dark Mode Optimization) ---
 st.markdown("""
     <style>
@@ -54,14 +60,61 @@ def get_db_connection():
         )
     except: return None
 
+def current_pipeline_version():
+    # Newest mtime of the pipeline files: train_model.py rewrites them, so caches keyed on it rebuild
+    mtimes = [os.path.getmtime(p) for p in (PIPELINE_PATH, SCALER_PATH) if os.path.exists(p)]
+    return max(mtimes) if mtimes else None
+
+@st.cache_resource(max_entries=2)
+def load_feature_pipeline(version):
+    # Scaler only (no TensorFlow): needed to build windows for the forecast service too
+    if os.path.exists(SCALER_PATH):
+        return load_pipeline(PIPELINE_PATH, SCALER_PATH)
+    return None
+
+def current_model_version():
+    path = find_model_path()
+    return model_version(path) if path else None
+
+@st.cache_resource(max_entries=2)
+def load_ai_model(version):
+    # Loaded on first use only: with forecast_service.py running, TensorFlow never loads here.
+    # Keyed by model version, so a promoted model (incremental_train.py) is picked up without a restart.
+    # Prefers the global / multi-horizon models (see predict.MODEL_CANDIDATES), falls back to next-hour
+    if version is not None and os.path.exists(SCALER_PATH):
+        return load_forecast_model()
+    return None
+
 @st.cache_resource
-def load_ai_model():
-    if os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH):
-        return tf.keras.models.load_model(MODEL_PATH), joblib.load(SCALER_PATH)
-    return None, None
+def get_prediction_cache():
+    # One cache for every session: repeat forecasts cost a dict lookup, not a fetch + forward pass
+    return PredictionCache()
+
+@st.cache_resource
+def get_data_listener():
+    # One LISTEN connection per dashboard process. Ingestion NOTIFYs after each commit
+    # (backend_scheduler/notify.py): the generation moves and revised stations' forecasts are dropped.
+    cache = get_prediction_cache()
+    def invalidate(events):
+        stations = changed_stations(events)
+        if stations is None: cache.invalidate()
+        for station in stations or (): cache.invalidate(station=station)
+    listener = DataListener(get_db_connection)
+    listener.subscribe(invalidate)
+    return listener
+
+def forecast_window(input_tensor, station):
+    """Scaled window -> real-unit horizon vector: forecast service first, in-process model as fallback."""
+    try:
+        return forecast_client.predict_window(input_tensor, stations=station)
+    except forecast_client.ForecastServiceError:
+        model = load_ai_model(current_model_version())
+        if model is None: return None
+        return forecast(model, pipeline, input_tensor, stations=station)
 
-def load_stations_with_status():
-    """Fetches stations AND their latest AQI for the map color coding"""
+@st.cache_data(ttl=DATA_TTL_SECONDS, max_entries=4)
+def load_stations_with_status(generation):
+    """Fetches stations AND their latest AQI for the map color coding (shared by all sessions, per data generation)"""
     conn = get_db_connection()
     if not conn: return pd.DataFrame()
     
@@ -79,17 +132,52 @@ def load_stations_with_status():
     return df
 
 @st.cache_data
-def load_wards():
+def load_ward_centroids():
+    # No ward file: the Virtual Sensor mode has nothing to offer
     try:
-        df = pd.read_csv('bangalore_wards_cleaned.csv')
-        return df.rename(columns={'latitude': 'lat', 'longitude': 'lon'})
-    except:
+        return load_wards()
+    except OSError:
         return pd.DataFrame()
 
+@st.cache_resource(max_entries=2)
+def load_virtual_grid(station_coords, ward_coords):
+    # Sparse ward x station weights: rebuilt only when a station or ward moves, not every hour
+    stations = pd.DataFrame(list(station_coords), columns=['station_name', 'lat', 'lon'])
+    wards = pd.DataFrame(list(ward_coords), columns=['ward_name', 'lat', 'lon'])
+    if stations.dropna().empty or wards.empty: return None
+    return VirtualSensorGrid(stations, wards)
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, max_entries=2)
+def load_virtual_windows(generation, pipeline_version, station_coords, ward_coords, _pipeline):
+    """Every ward's input window + contributing station for the current data: one matmul per data generation."""
+    # Keyed on the coordinates too: windows built for an older grid never get indexed by a newer one.
+    # The pipeline itself is not hashable; its version stands in for it in the key
+    grid = load_virtual_grid(station_coords, ward_coords)
+    if _pipeline is None or grid is None: return None, None
+    names, windows, _ = station_windows(_pipeline, fetch_recent(grid.station_names))
+    if not names: return None, None
+    return grid.interpolate(names, windows), grid.neighbors(names)
+
+@st.cache_data(max_entries=48)
+def load_forecast_overlay(raster_mtime, lead):
+    """Mapbox image layer for one lead hour of the precomputed city raster (forecast_raster.py). Keyed by file mtime."""
+    raster = load_raster()
+    if raster is None: return None, None
+    lead = min(lead, len(raster['index'])) - 1
+    west, south, east, north = raster['bounds']
+    layer = {
+        "sourcetype": "image",
+        "source": png_data_uri(raster['index'][lead], raster['palette']),
+        "coordinates": [[west, north], [east, north], [east, south], [west, south]],
+        "opacity": 0.45,
+        "below": "traces",
+    }
+    return layer, raster['meta'] | {'horizon': len(raster['index'])}
+
 def get_detailed_metrics(station_name):
-    """Fetches Current AQI, Previous AQI (for Delta), and Traffic"""
+    """Fetches Current AQI, Previous AQI (for Delta), and Traffic (the chart reads load_history)"""
     conn = get_db_connection()
-    metrics = {"current": None, "prev": None, "traffic": None, "history": pd.DataFrame()}
+    metrics = {"station": station_name, "current": None, "prev": None, "traffic": None}
     
     if conn:
         # 1. Get last 2 AQI records for Delta
@@ -108,52 +196,96 @@ def get_detailed_metrics(station_name):
         df_trf = pd.read_sql("SELECT current_speed FROM traffic_data WHERE station_name = %s ORDER BY time DESC LIMIT 1", conn, params=(station_name,))
         if not df_trf.empty: metrics["traffic"] = df_trf.iloc[0]['current_speed']
         
-        # 3. Get 24h History for Graph
-        query_hist = """
-            SELECT time, pollutant_avg FROM aqi_data 
-            WHERE station_name = %s AND pollutant_id = 'PM2.5' 
-            ORDER BY time DESC LIMIT 24
-        """
-        metrics["history"] = pd.read_sql(query_hist, conn, params=(station_name,)).sort_values('time')
-        
         conn.close()
     return metrics
 
-def run_prediction(target_station, model, scaler):
-    # (Same logic as before, just compact)
-    raw_df = fetch_data()
-    if raw_df.empty: return None
-    station_data = raw_df[raw_df['station_name'] == target_station].copy()
-    if len(station_data) < LOOKBACK_WINDOW: return None
+@st.cache_data(ttl=DATA_TTL_SECONDS, max_entries=64)
+def load_history(station_name, hours, generation):
+    """Chart series for any range: raw / hourly / daily rollup + LTTB, so it is always <= history.POINT_BUDGET points"""
+    conn = get_db_connection()
+    if not conn: return pd.DataFrame(), None
+    try:
+        return fetch_history(conn, station_name, hours=hours)
+    finally:
+        conn.close()
+
+def load_logged_forecast(target_station):
+    """Forecast precomputed by forecast_writer.py (scheduled after each ingestion), if fresh."""
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        logged = latest_forecast(conn, target_station)
+    except Exception:
+        logged = None  # forecast_logs not created yet
+    finally:
+        conn.close()
+    if logged is None: return None
+    
+    target_hours, values = logged
+    cutoff = pd.Timestamp.now(tz='UTC') - timedelta(hours=FORECAST_MAX_AGE_HOURS)
+    return values if target_hours[0] >= cutoff else None
+
+def run_prediction(target_station, pipeline):
+    # Cache key: (station, newest feature hour, model version). New data or a new model = new key.
+    conn = get_db_connection()
+    hour = None
+    if conn:
+        try:
+            hour = latest_feature_hour(conn, target_station)
+        finally:
+            conn.close()
+    if hour is None: return compute_prediction(target_station, pipeline)
+    return get_prediction_cache().get_or_compute(
+        target_station, hour, current_model_version(), lambda: compute_prediction(target_station, pipeline)
+    )
+
+def compute_prediction(target_station, pipeline):
+    # 1. Precomputed forecast: a DB read, no TensorFlow on the request path
+    logged = load_logged_forecast(target_station)
+    if logged is not None: return logged
     
-    station_data = station_data.sort_values(by='time')
-    station_data[FEATURE_COLS[:6]] = station_data[FEATURE_COLS[:6]].interpolate(method='linear').ffill().bfill()
+    # 2. Resident forecast service: warm model + latest windows, one HTTP round trip
+    try:
+        live = forecast_client.predict_station(target_station)
+        if live is not None: return live
+    except forecast_client.ForecastServiceError:
+        pass  # Not running: fall through to in-process inference
     
-    # Feature Engineering
-    station_data['hour'] = station_data['time'].dt.hour
-    station_data['day_of_week'] = station_data['time'].dt.dayofweek
-    station_data['hour_sin'] = np.sin(2 * np.pi * station_data['hour'] / 24)
-    station_data['hour_cos'] = np.cos(2 * np.pi * station_data['hour'] / 24)
-    station_data['day_sin'] = np.sin(2 * np.pi * station_data['day_of_week'] / 7)
-    station_data['day_cos'] = np.cos(2 * np.pi * station_data['day_of_week'] / 7)
+    # 3. Fallback: live inference (same logic as before, just compact)
+    if pipeline is None: return None
+    # Only this station's last LOOKBACK_WINDOW (+ margin) hours: ~30 indexed rows, not 30 days of everything
+    station_data = fetch_recent([target_station])
+    if len(station_data) < LOOKBACK_WINDOW: return None
     
-    station_data[FEATURE_COLS] = scaler.transform(station_data[FEATURE_COLS])
-    input_tensor = np.expand_dims(station_data[FEATURE_COLS].values[-LOOKBACK_WINDOW:], axis=0)
+    # Imputation + Feature Engineering + Scaling (shared pipeline, same as training)
+    _, scaled = pipeline.transform_array(station_data)
     
-    pred_scaled = model.predict(input_tensor)
-    dummy = np.zeros((1, len(FEATURE_COLS)))
-    dummy[0, FEATURE_COLS.index(TARGET_COL)] = pred_scaled[0][0]
-    return scaler.inverse_transform(dummy)[0, FEATURE_COLS.index(TARGET_COL)]
+    # Real-unit forecast vector: next hour first, then the rest of the horizon
+    return forecast_window(scaled[-LOOKBACK_WINDOW:], target_station)
+
+# --- 1. The "Heartbeat" (Push Refresh) ---
+# Reruns the page only when ingestion has committed new data; idle sessions never touch the DB
+@st.fragment(run_every=WATCH_SECONDS)
+def watch_data():
+    generation = get_data_listener().generation
+    if st.session_state.setdefault('data_generation', generation) != generation:
+        st.session_state.data_generation = generation
+        st.rerun()
 
 # --- MAIN UI ---
-model, scaler = load_ai_model()
-stations_df = load_stations_with_status() # Updated loader
-wards_df = load_wards()
+watch_data()
+data_listener = get_data_listener()
+pipeline_version = current_pipeline_version()
+pipeline = load_feature_pipeline(pipeline_version)
+stations_df = load_stations_with_status(data_listener.generation) # Updated loader
+wards_df = load_ward_centroids()
 
 # --- SIDEBAR ---
 with st.sidebar:
     st.title("🌬️ Aeris Engine")
-    st.caption(f"Last Update: Cycle {count}")
+    last_event = data_listener.last_event_at
+    st.caption(f"Last Update: {datetime.fromtimestamp(last_event):%H:%M:%S}" if last_event
+               else f"Last Update: {'Live' if data_listener.connected else 'Offline'} (waiting for new data)")
     mode = st.radio("Detection Mode:", ["Physical Network", "Virtual Sensor"])
     
     selected_target = None
@@ -194,23 +326,27 @@ if st.session_state.trigger and selected_target:
         # 1. PHYSICAL PATH
         if not is_virtual:
             st.session_state.metrics = get_detailed_metrics(selected_target)
-            st.session_state.pred_val = run_prediction(selected_target, model, scaler)
+            st.session_state.pred_val = run_prediction(selected_target, pipeline)
             st.session_state.neighbor = None
             
         # 2. VIRTUAL PATH
         else:
-            row = wards_df[wards_df['ward_name'] == selected_target].iloc[0]
-            input_tensor, neighbor = generate_virtual_input(row['lat'], row['lon'], stations_df, scaler)
+            # Ward windows are precomputed for the whole city each data generation: a lookup here
+            station_coords = tuple(stations_df[['station_name', 'lat', 'lon']].itertuples(index=False, name=None))
+            ward_coords = tuple(wards_df[['ward_name', 'lat', 'lon']].itertuples(index=False, name=None))
+            grid = load_virtual_grid(station_coords, ward_coords)
+            ward_windows, ward_neighbors = load_virtual_windows(data_listener.generation, pipeline_version,
+                                                                station_coords, ward_coords, pipeline)
+            i = grid.target_names.index(selected_target) if grid else None
+            input_tensor = None if ward_windows is None or np.isnan(ward_windows[i]).any() else ward_windows[i]
+            neighbor = ((ward_neighbors[i] if ward_neighbors else None) or grid.nearest[i]) if grid else None
             st.session_state.neighbor = neighbor
             
             # For Virtual, we fetch the NEIGHBOR's history to show as reference
             st.session_state.metrics = get_detailed_metrics(neighbor) 
             
             if input_tensor is not None:
-                pred_scaled = model.predict(input_tensor)
-                dummy = np.zeros((1, len(FEATURE_COLS)))
-                dummy[0, FEATURE_COLS.index(TARGET_COL)] = pred_scaled[0][0]
-                st.session_state.pred_val = scaler.inverse_transform(dummy)[0, FEATURE_COLS.index(TARGET_COL)]
+                st.session_state.pred_val = forecast_window(input_tensor, neighbor)
             
     st.session_state.trigger = False # Reset trigger
 
@@ -219,7 +355,8 @@ if st.session_state.pred_val is not None:
     
     # 1. METRICS ROW
     m = st.session_state.metrics
-    pred = st.session_state.pred_val
+    horizon_vals = st.session_state.pred_val
+    pred = horizon_vals[0]
     
     # Calculate Delta
     delta_val = None
@@ -259,13 +396,15 @@ if st.session_state.pred_val is not None:
         """, unsafe_allow_html=True)
 
     if is_virtual and st.session_state.neighbor:
-        st.info(f"📡 Virtual Sensor Active: Data Interpolated from **{st.session_state.neighbor}** (Nearest Neighbor)")
+        st.info(f"📡 Virtual Sensor Active: Data Interpolated from the nearest stations (led by **{st.session_state.neighbor}**)")
 
     # 2. EVIDENCE GRAPH (Trend Line)
     st.markdown("### 📉 Historical Trend & Forecast")
+    history_range = st.radio("History range:", list(HISTORY_RANGES), horizontal=True)
+    hist_df, resolution = (load_history(m['station'], HISTORY_RANGES[history_range], data_listener.generation)
+                           if m and m['station'] else (pd.DataFrame(), None))
     
-    if m and not m['history'].empty:
-        hist_df = m['history']
+    if not hist_df.empty:
         
         fig_trend = go.Figure()
         
@@ -273,18 +412,18 @@ if st.session_state.pred_val is not None:
         fig_trend.add_trace(go.Scatter(
             x=hist_df['time'], 
             y=hist_df['pollutant_avg'],
-            mode='lines+markers',
-            name='Historical Data',
+            mode='lines+markers' if resolution == 'raw' else 'lines',
+            name='Historical Data' if resolution == 'raw' else f'Historical Data ({resolution})',
             line=dict(color='#00CC96', width=3)
         ))
         
-        # Forecast Point
+        # Forecast Line (1 point for the next-hour model, the whole horizon otherwise)
         last_time = hist_df.iloc[-1]['time']
-        future_time = last_time + timedelta(hours=1)
+        future_times = [last_time + timedelta(hours=h) for h in range(1, len(horizon_vals) + 1)]
         
         fig_trend.add_trace(go.Scatter(
-            x=[last_time, future_time],
-            y=[hist_df.iloc[-1]['pollutant_avg'], pred],
+            x=[last_time] + future_times,
+            y=[hist_df.iloc[-1]['pollutant_avg']] + list(horizon_vals),
             mode='lines+markers',
             name='AI Prediction',
             line=dict(color='#FF4B4B', width=3, dash='dot')
@@ -305,6 +444,19 @@ st.markdown("---")
 # --- 3. LIVE MAP (Color Coded) ---
 st.markdown("### 🗺️ Live Monitoring Network")
 
+# City-wide forecast heatmap: a precomputed palette PNG, so a view costs no inference at all
+overlay, overlay_meta = None, None
+if os.path.exists(RASTER_PATH):
+    c_map_1, c_map_2 = st.columns([1, 3])
+    with c_map_1:
+        show_heatmap = st.checkbox("Forecast heatmap", value=True)
+    if show_heatmap:
+        _, overlay_meta = load_forecast_overlay(os.path.getmtime(RASTER_PATH), 1)
+        horizon = overlay_meta['horizon'] if overlay_meta else 1
+        with c_map_2:
+            lead = st.slider("Hours ahead", 1, horizon, 1) if horizon > 1 else 1
+        overlay, overlay_meta = load_forecast_overlay(os.path.getmtime(RASTER_PATH), lead)
+
 map_df = stations_df.copy()
 
 # Add Status Color Column based on Live AQI
@@ -324,7 +476,7 @@ if selected_target:
         new_row = pd.DataFrame([{
             'station_name': f"{selected_target} (Virtual)",
             'lat': current_lat, 'lon': current_lon,
-            'latest_aqi': st.session_state.pred_val if st.session_state.pred_val else 0,
+            'latest_aqi': st.session_state.pred_val[0] if st.session_state.pred_val is not None else 0,
             'color': '#3366FF', # Blue for Virtual
             'size': 20
         }])
@@ -350,7 +502,10 @@ fig_map.update_layout(
     mapbox_style="carto-darkmatter", # Dark mode map
     mapbox_center={"lat": current_lat, "lon": current_lon},
     margin={"r":0,"t":0,"l":0,"b":0},
-    showlegend=False
+    showlegend=False,
+    mapbox_layers=[overlay] if overlay else []
 )
+if overlay_meta:
+    st.caption(f"Heatmap: PM2.5 forecast from data hour {overlay_meta['data_hour']} ({overlay_meta['model_version']})")
 
 st.plotly_chart(fig_map, use_container_width=True)
\ No newline at end of file
@@ -0,0 +1,204 @@
+# benchmark.py
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import numpy as np
+import pandas as pd
+
+from preprocessor import build_base_arrays, create_sequences, LOOKBACK_WINDOW, FEATURE_COLS
+from features import FeaturePipeline
+from synthetic_data import generate_sources, merged_frame, DEFAULT_STATIONS, DEFAULT_DAYS
+
+# --- Settings ---
+REPEATS = 3                 # Each stage runs this many times; the median is reported
+RESULTS_PATH = 'benchmark_results.json'
+REGRESSION_THRESHOLD = 0.2  # --baseline flags stages more than 20% slower
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class StageTimer:
+    """Collects wall-clock timings per stage."""
+
+    def __init__(self, repeats=REPEATS):
+        self.repeats = repeats
+        self.stages = {}
+
+    def run(self, name, fn, items=None, repeats=None):
+        """
+        Runs fn() `repeats` times, keeps the last result. `items` = rows/samples handled per run,
+        or a callable that counts them from the result (e.g. items=len).
+        """
+        timings, result = [], None
+        for _ in range(repeats or self.repeats):
+            started = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - started)
+        median = float(np.median(timings))
+        if callable(items):
+            items = items(result)
+        self.stages[name] = {
+            'seconds': round(median, 6),
+            'min_seconds': round(min(timings), 6),
+            'runs': len(timings),
+        }
+        if items:
+            self.stages[name]['items'] = int(items)
+            self.stages[name]['items_per_sec'] = round(items / median, 1) if median > 0 else None
+        print(f"   ⏱️ {name:<16} {median * 1000:10.1f} ms" + (f"  ({items:,} items)" if items else ""))
+        return result
+
+def _fetch_fn(backend, sources, since):
+    if backend == 'memory':
+        return lambda: merged_frame(sources)
+
+    from preprocessor import fetch_range
+    from synthetic_data import scratch_connection
+
+    def fetch():
+        conn = scratch_connection()
+        try:
+            return fetch_range(conn, since=since)
+        finally:
+            conn.close()
+    return fetch
+
+def run_benchmark(n_stations=DEFAULT_STATIONS, days=DEFAULT_DAYS, seed=0, backend='memory',
+                  repeats=REPEATS, batch_size=16, skip_model=False, truncate=False):
+    """
+    Times every stage of the pipeline on deterministic synthetic data.
+    backend: 'memory' = in-process stand-in for the DB, 'postgres' = load into the scratch DB
+    in $AERIS_BENCH_DSN first (truncate=True empties its tables before the load).
+    Returns None when the postgres backend has no usable scratch database.
+    """
+    print(f"📏 BENCHMARK: {n_stations} stations x {days} days | backend={backend} | repeats={repeats}")
+    timer = StageTimer(repeats)
+    sources = generate_sources(n_stations, days, seed)
+    since = sources[2]['time'].min()
+
+    if backend == 'postgres':
+        from synthetic_data import load_into_postgres, scratch_connection
+        conn = scratch_connection()
+        if conn is None:
+            return None
+        try:
+            timer.run('load', lambda: load_into_postgres(conn, sources, replace=truncate), repeats=1,
+                      items=sum(len(df) for df in sources))
+        finally:
+            conn.close()
+
+    # 1. Extract
+    raw_df = timer.run('fetch', _fetch_fn(backend, sources, since), items=len)
+    n_rows = len(raw_df)
+
+    # 2. Transform: impute + time-encode, then scale (split so each cost is visible)
+    pipeline = FeaturePipeline()
+    sorted_df, matrix = timer.run('impute', lambda: pipeline.encode(raw_df), items=n_rows)
+    timer.run('scale', lambda: pipeline.scaler.fit(matrix).transform(matrix), items=n_rows)
+    clean_df = pipeline.fit_transform(raw_df)
+
+    # 3. Windows: streaming base arrays vs. materialized sequences
+    base = timer.run('window', lambda: build_base_arrays(clean_df), items=n_rows)
+    X, _ = timer.run('window_legacy', lambda: create_sequences(clean_df), items=n_rows)
+    n_windows = len(base['starts'])
+
+    result = {
+        'version': _git_revision(),
+        'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+        'config': {'stations': n_stations, 'days': days, 'seed': seed, 'backend': backend,
+                   'repeats': repeats, 'batch_size': batch_size},
+        'platform': {'python': platform.python_version(), 'machine': platform.machine(),
+                     'cpus': os.cpu_count()},
+        'data': {'rows': n_rows, 'windows': n_windows, 'features': len(FEATURE_COLS)},
+        'stages': timer.stages,
+    }
+    if skip_model or n_windows == 0:
+        return result
+
+    # 4. Model: one training epoch + inference
+    import tensorflow as tf
+    from train_model import build_model
+    from window_dataset import make_window_dataset
+
+    result['platform']['tensorflow'] = tf.__version__
+    tf.keras.utils.set_random_seed(seed)
+    model = build_model((LOOKBACK_WINDOW, len(FEATURE_COLS)))
+    train_ds = make_window_dataset(base, base['starts'], batch_size, shuffle=True)
+    model.fit(train_ds, epochs=1, verbose=0)  # Warm-up: graph tracing is not what we measure
+    timer.run('fit_epoch', lambda: model.fit(train_ds, epochs=1, verbose=0), items=n_windows)
+
+    # Single prediction exactly like dashboard.run_prediction: one station's frame -> (1, 24, F)
+    station = raw_df['station_name'].iloc[0]
+    station_df = raw_df[raw_df['station_name'] == station]
+
+    def predict_single():
+        _, scaled = pipeline.transform_array(station_df)
+        pred = model.predict(np.expand_dims(scaled[-LOOKBACK_WINDOW:], axis=0), verbose=0)
+        return pipeline.inverse_target(pred[0][0])
+
+    predict_single()
+    timer.run('predict_single', predict_single, items=1)
+
+    # Batch prediction: the latest window of every station in one forward pass
+    last_rows = np.flatnonzero(np.diff(np.append(base['station_codes'], -1))) + 1
+    last_rows = last_rows[last_rows >= LOOKBACK_WINDOW]
+    batch = base['features'][last_rows[:, None] - LOOKBACK_WINDOW + np.arange(LOOKBACK_WINDOW)]
+    model.predict(batch, verbose=0)
+    timer.run('predict_batch', lambda: model.predict(batch, verbose=0), items=len(batch))
+
+    return result
+
+def compare(result, baseline, threshold=REGRESSION_THRESHOLD):
+    """Stages that got slower than `threshold` relative to a previous result. Returns the list."""
+    regressions = []
+    for name, stage in result['stages'].items():
+        old = baseline.get('stages', {}).get(name)
+        if not old or not old.get('seconds'):
+            continue
+        change = stage['seconds'] / old['seconds'] - 1
+        flag = '🔺' if change > threshold else ('🔻' if change < -threshold else '  ')
+        print(f"   {flag} {name:<16} {old['seconds'] * 1000:10.1f} -> {stage['seconds'] * 1000:10.1f} ms ({change:+.0%})")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times every pipeline stage on synthetic data.")
+    parser.add_argument('--stations', type=int, default=DEFAULT_STATIONS)
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', choices=['memory', 'postgres'], default='memory',
+                        help="'postgres' loads the synthetic tables into the scratch DB in $AERIS_BENCH_DSN.")
+    parser.add_argument('--truncate', action='store_true',
+                        help="(postgres) Empty the scratch DB's tables before loading.")
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--skip-model', action='store_true', help="Only data stages (no TensorFlow).")
+    parser.add_argument('--out', default=RESULTS_PATH)
+    parser.add_argument('--baseline', default=None, help="Previous JSON result to compare against.")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.stations, args.days, args.seed, args.backend,
+                           args.repeats, args.batch_size, args.skip_model, args.truncate)
+    if result is None:
+        sys.exit(1)
+    with open(args.out, 'w') as f:
+        json.dump(result, f, indent=1)
+    print(f"\n✅ Results saved to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\n📊 Compared with {args.baseline} (version {baseline.get('version')}):")
+        if compare(result, baseline):
+            sys.exit(1)
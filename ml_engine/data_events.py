@@ -0,0 +1,104 @@
+# data_events.py
+
+import json
+import time
+import select
+import threading
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+# --- Settings ---
+CHANNEL = 'aeris_data'   # Same channel as backend_scheduler/notify.py
+RECONNECT_SECONDS = 10
+WAKEUP_SECONDS = 60      # select() timeout; nothing is sent to the database while idle
+
+def parse_event(payload):
+    """NOTIFY payload -> {'table', 'stations'}. Anything unreadable counts as 'everything changed'."""
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        event = None
+    if not isinstance(event, dict):
+        return {'table': None, 'stations': None}
+    return {'table': event.get('table'), 'stations': event.get('stations')}
+
+def changed_stations(events):
+    """Union of the stations named by `events`, or None if any of them touched every station."""
+    stations = set()
+    for event in events:
+        if event['stations'] is None:
+            return None
+        stations.update(event['stations'])
+    return stations
+
+class DataListener:
+    """
+    Background LISTEN on CHANNEL. Each batch of notifications bumps `generation` (a cache key
+    for everything derived from the tables) and is passed to the subscribers. A reconnect counts
+    as a change too, since notifications sent while disconnected are lost.
+    """
+
+    def __init__(self, connect, channel=CHANNEL):
+        self.connect = connect   # () -> psycopg2 connection (or None when the DB is down)
+        self.channel = channel
+        self.generation = 0
+        self.last_event_at = None
+        self.connected = False
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name='aeris-data-listener', daemon=True)
+        self.thread.start()
+
+    def subscribe(self, callback):
+        """callback(events) runs on the listener thread after every batch."""
+        self.subscribers.append(callback)
+
+    def _publish(self, events):
+        with self.lock:
+            self.generation += 1
+            self.last_event_at = time.time()
+        for callback in list(self.subscribers):
+            try:
+                callback(events)
+            except Exception as e:
+                print(f"⚠️ Data event subscriber failed: {e}")
+
+    def _listen(self, conn):
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        cursor.execute(f"LISTEN {self.channel};")
+        cursor.close()
+        self.connected = True
+        while True:
+            if select.select([conn], [], [], WAKEUP_SECONDS) == ([], [], []):
+                continue
+            conn.poll()
+            events = [parse_event(n.payload) for n in conn.notifies]
+            conn.notifies.clear()
+            if events:
+                self._publish(events)
+
+    def _run(self):
+        first = True
+        while True:
+            conn = None
+            try:
+                conn = self.connect()
+                if conn is not None:
+                    if not first:
+                        self._publish([{'table': None, 'stations': None}])
+                    first = False
+                    self._listen(conn)
+            except psycopg2.Error as e:
+                print(f"⚠️ Data listener lost its connection ({e}); retrying in {RECONNECT_SECONDS}s.")
+            except Exception as e:
+                # Anything else (e.g. OSError from select, a bad connect callback) must not end the thread
+                print(f"⚠️ Data listener failed ({type(e).__name__}: {e}); retrying in {RECONNECT_SECONDS}s.")
+            finally:
+                self.connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(RECONNECT_SECONDS)
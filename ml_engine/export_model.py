@@ -0,0 +1,153 @@
+# export_model.py
+
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+from features import load_pipeline
+from lite_runtime import LiteModel, lite_path_for, file_digest, META_SUFFIX
+from numpy_lstm import NumpyLSTM, extract_weights, numpy_path_for, save_numpy_model
+from predict import (
+    find_model_path, latest_windows, PIPELINE_PATH, SCALER_PATH, MULTI_PIPELINE_PATH,
+    MODEL_CANDIDATES, MULTI_MODEL_CANDIDATES
+)
+
+# --- Settings ---
+EXPORT_BATCH = 8           # The LSTM needs a static batch; the runtime pads/chunks to this size
+PARITY_SAMPLES = 256       # Random scaled windows in the parity check (plus the latest real ones)
+PARITY_MAX_ABS = 2.0       # Largest allowed |lite - keras| in real units (µg/m³)
+NUMPY_MAX_ABS = 0.01       # The NumPy engine is the same float32 math: only rounding differences
+QUANTIZATIONS = ['none', 'float16', 'int8']
+FORMATS = ['tflite', 'numpy']
+
+def convert(model, quantize='none', batch=EXPORT_BATCH):
+    """Keras model -> TFLite flatbuffer bytes. int8 = dynamic-range (int8 weights, float activations)."""
+    import tensorflow as tf
+    # Private TF helper, but the public entry points (from_keras_model, from_saved_model,
+    # from_concrete_functions, also with SELECT_TF_OPS) cannot freeze the LSTM's weights
+    try:
+        from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+    except ImportError as e:
+        raise RuntimeError(f"TensorFlow {tf.__version__} no longer provides convert_variables_to_constants_v2; "
+                           f"export with --format numpy instead") from e
+
+    # Fixed batch: TFLite cannot lower the LSTM's dynamic-batch tensor lists into builtin ops
+    specs = [tf.TensorSpec((batch,) + tuple(i.shape[1:]), i.dtype, name=f"input_{k}")
+             for k, i in enumerate(model.inputs)]
+    fn = tf.function(lambda *x: model(list(x) if len(x) > 1 else x[0], training=False))
+    # Weights frozen into constants: the LSTM loop otherwise reads uninitialized resource variables
+    frozen = convert_variables_to_constants_v2(fn.get_concrete_function(*specs))
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([frozen])
+
+    if quantize in ('float16', 'int8'):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+def parity_inputs(model, pipeline, samples=PARITY_SAMPLES, seed=0):
+    """Random scaled windows (+ the latest window of every station if the DB is reachable)."""
+    from preprocessor import fetch_multi_pollutant_data, fetch_data
+
+    rng = np.random.default_rng(seed)
+    windows = rng.random((samples,) + tuple(model.inputs[0].shape[1:]), dtype=np.float32)
+    stations = list(rng.choice(list(pipeline.stations) or [None], samples))
+    source = 'random'
+    try:
+        raw_df = fetch_multi_pollutant_data() if len(pipeline.targets) > 1 else fetch_data()
+        names, latest = latest_windows(pipeline, raw_df)
+        if names:
+            windows = np.concatenate([latest.astype(np.float32), windows])
+            stations = names + stations
+            source = f"random+{len(names)} stations"
+    except Exception as e:
+        print(f"   ⚠️ No live windows for the parity check ({e}); random windows only.")
+
+    inputs = [windows, pipeline.station_ids(stations).reshape(-1, 1)] if len(model.inputs) > 1 else windows
+    return inputs, source
+
+def parity_check(model, lite, pipeline, inputs):
+    """Errors of the exported model vs. Keras, in real units (after inverse scaling)."""
+    def real(m):
+        scaled = np.asarray(m(inputs, training=False))
+        if len(pipeline.targets) == 1:
+            scaled = scaled.reshape(len(scaled), -1)
+        return pipeline.inverse_target(scaled)
+
+    diff = np.abs(real(lite) - real(model))
+    return {'mae': float(diff.mean()), 'max_abs': float(diff.max()), 'windows': int(len(diff))}
+
+def export(model_path=None, quantize='none', batch=EXPORT_BATCH, multi=False, fmt='tflite'):
+    """
+    tflite: <model>.tflite (+ .tflite.json report), optionally quantized.
+    numpy: <model>.npz with the LSTM/Dense weights for numpy_lstm.NumpyLSTM (report stored inside).
+    """
+    import tensorflow as tf
+
+    model_path = model_path or find_model_path(MULTI_MODEL_CANDIDATES if multi else MODEL_CANDIDATES)
+    if model_path is None:
+        print("❌ Error: No trained model found. Train the model first!")
+        return None
+    multi = multi or os.path.basename(model_path).startswith('aeris_v1_multi')
+    pipeline = (load_pipeline(MULTI_PIPELINE_PATH, scaler_path='') if multi
+                else load_pipeline(PIPELINE_PATH, SCALER_PATH))
+
+    model = tf.keras.models.load_model(model_path, compile=False)
+    if fmt == 'numpy':
+        print(f"📦 EXPORTING {model_path} (NumPy weights)...")
+        weights = extract_weights(model)
+        exported, out_path, max_abs = NumpyLSTM(weights), numpy_path_for(model_path), NUMPY_MAX_ABS
+    else:
+        print(f"📦 EXPORTING {model_path} (quantize={quantize}, batch={batch})...")
+        out_path, max_abs = lite_path_for(model_path), PARITY_MAX_ABS
+        try:
+            flatbuffer = convert(model, quantize, batch)
+        except RuntimeError as e:
+            print(f"❌ Error: {e}")
+            return None
+        with open(out_path, 'wb') as f:
+            f.write(flatbuffer)
+        exported = LiteModel(out_path)
+
+    inputs, source = parity_inputs(model, pipeline)
+    parity = parity_check(model, exported, pipeline, inputs)
+    passed = parity['max_abs'] <= max_abs
+
+    meta = {
+        'source': model_path,
+        'source_sha256': file_digest(model_path),
+        'format': fmt,
+        'parity': {**parity, 'source': source, 'max_abs_allowed': max_abs},
+        'passed': passed,
+        'exported_at': pd.Timestamp.now(tz='UTC').isoformat(),
+    }
+    if fmt == 'numpy':
+        save_numpy_model(out_path, weights, meta)
+    else:
+        meta.update(quantize=quantize, batch=batch)
+        with open(os.path.splitext(model_path)[0] + META_SUFFIX, 'w') as f:
+            json.dump(meta, f, indent=1)
+
+    size_kb = os.path.getsize(out_path) / 1024
+    print(f"   > {out_path}: {size_kb:.1f} KB (Keras file: {os.path.getsize(model_path) / 1024:.1f} KB)")
+    print(f"   > Parity on {parity['windows']} windows ({source}): "
+          f"MAE {parity['mae']:.4f}, max {parity['max_abs']:.4f} µg/m³")
+    if passed:
+        print("✅ Export passed the parity check; predict.py and the dashboard will use it.")
+    else:
+        print(f"❌ Parity check failed (max > {max_abs}); the loaders keep using the Keras model.")
+    return meta
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the trained model for TensorFlow-free inference.")
+    parser.add_argument('--model', default=None, help="Keras file (default: the one predict.py would load).")
+    parser.add_argument('--format', choices=FORMATS, default='tflite',
+                        help="numpy = plain weight arrays for the NumPy LSTM (no runtime beyond NumPy).")
+    parser.add_argument('--quantize', choices=QUANTIZATIONS, default='none',
+                        help="float16 halves the file; int8 = int8 weights with float activations.")
+    parser.add_argument('--batch', type=int, default=EXPORT_BATCH)
+    parser.add_argument('--all-pollutants', action='store_true', help="Export the multi-pollutant model instead.")
+    args = parser.parse_args()
+    export(args.model, args.quantize, args.batch, args.all_pollutants, args.format)
@@ -0,0 +1,244 @@
+# feature_cache.py
+
+import os
+import json
+import fcntl  # POSIX only: without it fetch_data() falls back to a plain DB fetch
+import shutil
+import threading
+import pandas as pd
+from contextlib import contextmanager
+
+from preprocessor import get_db_connection, fetch_range, HISTORY_DAYS
+
+# --- Settings ---
+CACHE_DIR = os.getenv(
+    'AERIS_FEATURE_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feature_cache')
+)
+META_FILE = '_meta.json'
+LOCK_FILE = '.lock'
+# Re-query this many hours before the high-water mark to pick up late/revised rows
+REVISION_HOURS = 3
+# A day with more delta parts than this gets rewritten into a single part
+MAX_PARTS_PER_DAY = 8
+# Oldest days are evicted once the cache grows past this size
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+def _now(tz=None):
+    """'Now' with the same timezone awareness as the cached time column."""
+    return pd.Timestamp.now(tz=tz) if tz is not None else pd.Timestamp.now()
+
+class FeatureCache:
+    """
+    Local columnar cache of the merged hourly feature table, partitioned by day.
+
+    Layout:  <cache_dir>/day=YYYY-MM-DD/part-00001.parquet
+    Each refresh appends one delta part per touched day. A part records the hour
+    it was fetched `since`; rows from older parts at or after that hour are
+    superseded by it (that is how late corrections inside the revision window land).
+
+    Several processes share the directory (the forecast service, training jobs, ...):
+    writes hold an exclusive flock on <cache_dir>/.lock, reads a shared one, and the
+    metadata is re-read once the lock is held.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, revision_hours=REVISION_HOURS,
+                 max_parts_per_day=MAX_PARTS_PER_DAY, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.revision = pd.Timedelta(hours=revision_hours)
+        self.max_parts_per_day = max_parts_per_day
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._thread_lock = threading.RLock()
+        self._lock_fd = None
+        self.meta = self._load_meta()
+
+    # --- Locking ---
+    @contextmanager
+    def _locked(self, exclusive=True):
+        """
+        Holds the directory lock (re-entrant: refresh -> compact / evict keep the outer one).
+        Threads sharing this instance are serialized by the RLock, other instances and
+        processes by the flock.
+        """
+        with self._thread_lock:
+            if self._lock_fd is not None:
+                yield
+                return
+            fd = os.open(os.path.join(self.cache_dir, LOCK_FILE), os.O_RDWR | os.O_CREAT)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                self._lock_fd = fd
+                self.meta = self._load_meta()  # Another writer may have moved on since we last looked
+                yield
+            finally:
+                self._lock_fd = None
+                os.close(fd)  # Releases the flock
+
+    # --- Metadata ---
+    def _meta_path(self):
+        return os.path.join(self.cache_dir, META_FILE)
+
+    def _load_meta(self):
+        try:
+            with open(self._meta_path()) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'high_water_mark': None, 'next_part': 1, 'days': {}}
+
+    def _save_meta(self):
+        tmp_path = self._meta_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(tmp_path, self._meta_path())
+
+    @property
+    def high_water_mark(self):
+        hwm = self.meta['high_water_mark']
+        return pd.Timestamp(hwm) if hwm else None
+
+    # --- Public API ---
+    def fetch(self, days=HISTORY_DAYS, mode=None):
+        """Brings the cache up to date with the DB, then returns the last `days` days."""
+        conn = get_db_connection()
+        try:
+            self.refresh(conn, days=days, mode=mode)
+        finally:
+            conn.close()
+        return self.read(days=days)
+
+    def refresh(self, conn, days=HISTORY_DAYS, mode=None):
+        """
+        Queries only hours after (high-water mark - revision window).
+        Falls back to a full fetch when the cache is empty or too stale to bridge.
+        """
+        with self._locked():
+            hwm = self.high_water_mark
+
+            if hwm is None or hwm < _now(hwm.tz) - pd.Timedelta(days=days):
+                print("   > [Cache] Cold cache. Fetching full window from DB...")
+                self.clear()
+                since = None
+                delta_df = fetch_range(conn, days=days, mode=mode)
+            else:
+                since = hwm - self.revision
+                delta_df = fetch_range(conn, since=since, mode=mode)
+                print(f"   > [Cache] Fetched {len(delta_df)} rows since {since}.")
+
+            self._append(delta_df, since)
+
+            if not delta_df.empty:
+                latest = delta_df['time'].max()
+                if hwm is None or latest > hwm:
+                    self.meta['high_water_mark'] = latest.isoformat()
+
+            self._save_meta()
+            self.compact()
+            self.evict()
+
+    def read(self, days=HISTORY_DAYS):
+        """Reads the last `days` days of cached rows (no DB access)."""
+        with self._locked(exclusive=False):
+            frames = []
+            for day in sorted(self.meta['days']):
+                rows = self._read_day(day)
+                if rows is not None and not rows.empty:
+                    frames.append(rows)
+
+            if not frames:
+                return pd.DataFrame()
+
+            df = pd.concat(frames, ignore_index=True)
+            window_start = _now(df['time'].dt.tz) - pd.Timedelta(days=days)
+            return df[df['time'] > window_start].reset_index(drop=True)
+
+    def compact(self, force=False):
+        """Rewrites every day with too many delta parts (or all days, if forced) into one part."""
+        with self._locked():
+            for day, parts in list(self.meta['days'].items()):
+                if len(parts) > 1 and (force or len(parts) > self.max_parts_per_day):
+                    rows = self._read_day(day)
+                    old_files = [p['file'] for p in parts if p['file']]
+                    self.meta['days'][day] = []
+                    if rows is not None:
+                        self._write_part(day, rows, since=None)
+                    for name in old_files:
+                        os.remove(os.path.join(self._day_dir(day), name))
+            self._save_meta()
+
+    def evict(self):
+        """Drops the oldest day partitions until the cache fits in max_bytes."""
+        with self._locked():
+            days = sorted(self.meta['days'])
+            total = sum(self._day_bytes(day) for day in days)
+            while days and total > self.max_bytes:
+                day = days.pop(0)
+                total -= self._day_bytes(day)
+                shutil.rmtree(self._day_dir(day), ignore_errors=True)
+                del self.meta['days'][day]
+                print(f"   > [Cache] Evicted {day} (cache over {self.max_bytes // (1024 * 1024)} MB).")
+            self._save_meta()
+
+    def clear(self):
+        with self._locked():
+            for day in list(self.meta['days']):
+                shutil.rmtree(self._day_dir(day), ignore_errors=True)
+            self.meta = {'high_water_mark': None, 'next_part': 1, 'days': {}}
+            self._save_meta()
+
+    # --- Partitions ---
+    def _day_dir(self, day):
+        return os.path.join(self.cache_dir, f"day={day}")
+
+    def _day_bytes(self, day):
+        day_dir = self._day_dir(day)
+        if not os.path.isdir(day_dir):
+            return 0
+        return sum(os.path.getsize(os.path.join(day_dir, name)) for name in os.listdir(day_dir))
+
+    def _write_part(self, day, rows, since):
+        os.makedirs(self._day_dir(day), exist_ok=True)
+        name = None
+        if not rows.empty:
+            name = f"part-{self.meta['next_part']:05d}.parquet"
+            self.meta['next_part'] += 1
+            path = os.path.join(self._day_dir(day), name)
+            rows.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+        # An empty part (file=None) is a tombstone: it still supersedes rows after `since`
+        self.meta['days'].setdefault(day, []).append({
+            'file': name,
+            'since': since.isoformat() if since is not None else None
+        })
+
+    def _append(self, delta_df, since):
+        touched = set()
+        if not delta_df.empty:
+            for day_start, rows in delta_df.groupby(delta_df['time'].dt.floor('D')):
+                day = day_start.strftime('%Y-%m-%d')
+                self._write_part(day, rows.reset_index(drop=True), since)
+                touched.add(day)
+
+        # Cached days inside the revision window that came back empty lose their superseded rows
+        if since is not None:
+            since_day = since.floor('D').strftime('%Y-%m-%d')
+            for day in self.meta['days']:
+                if day >= since_day and day not in touched:
+                    self._write_part(day, delta_df.iloc[0:0], since)
+
+    def _read_day(self, day):
+        rows = None
+        for part in self.meta['days'].get(day, []):
+            if rows is not None and part['since']:
+                rows = rows[rows['time'] < pd.Timestamp(part['since'])]
+            if part['file']:
+                part_df = pd.read_parquet(os.path.join(self._day_dir(day), part['file']))
+                rows = part_df if rows is None else pd.concat([rows, part_df], ignore_index=True)
+        return rows
+
+if __name__ == "__main__":
+    cache = FeatureCache()
+    df = cache.fetch()
+    print(f"✅ Cache ready at {cache.cache_dir}")
+    print(f"   High-water mark: {cache.high_water_mark}")
+    print(f"   Cached rows (last {HISTORY_DAYS} days): {len(df)}")
@@ -0,0 +1,211 @@
+# features.py
+
+import os
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.preprocessing import MinMaxScaler
+
+from preprocessor import FEATURE_COLS, TARGET_COL
+
+# --- Settings ---
+PIPELINE_PATH = 'feature_pipeline.gz'
+TIME_COLS = ['hour_sin', 'hour_cos', 'day_sin', 'day_cos']
+
+# Precomputed cyclical encodings (indexed by hour of day / day of week)
+HOUR_SIN = np.sin(2 * np.pi * np.arange(24) / 24)
+HOUR_COS = np.cos(2 * np.pi * np.arange(24) / 24)
+DAY_SIN = np.sin(2 * np.pi * np.arange(7) / 7)
+DAY_COS = np.cos(2 * np.pi * np.arange(7) / 7)
+
+def segment_bounds(station_codes):
+    """
+    For rows sorted by station, returns each row's segment start (inclusive) and end (exclusive).
+    """
+    n = len(station_codes)
+    boundaries = np.flatnonzero(station_codes[1:] != station_codes[:-1]) + 1
+    seg_starts = np.concatenate(([0], boundaries))
+    seg_ends = np.concatenate((boundaries, [n]))
+    lengths = seg_ends - seg_starts
+    return np.repeat(seg_starts, lengths), np.repeat(seg_ends, lengths)
+
+def impute_segments(values, row_start, row_end):
+    """
+    Vectorized version of groupby(station).transform(interpolate -> ffill -> bfill).
+    One pass over the whole (Rows, Cols) block: for every cell we find the previous and
+    next valid row inside the same station and blend them linearly.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return values.copy()
+
+    idx = np.arange(n)[:, None]
+    valid = ~np.isnan(values)
+
+    prev = np.maximum.accumulate(np.where(valid, idx, -1), axis=0)
+    nxt = np.minimum.accumulate(np.where(valid, idx, n)[::-1], axis=0)[::-1]
+    has_prev = prev >= row_start[:, None]
+    has_next = nxt < row_end[:, None]
+
+    prev_vals = np.take_along_axis(values, np.clip(prev, 0, n - 1), axis=0)
+    next_vals = np.take_along_axis(values, np.clip(nxt, 0, n - 1), axis=0)
+
+    span = nxt - prev
+    weight = (idx - prev) / np.where(span > 0, span, 1)
+    interpolated = prev_vals + (next_vals - prev_vals) * weight
+
+    # Inside: interpolate. Trailing gap: ffill. Leading gap: bfill. Empty station column: NaN.
+    return np.where(
+        has_prev & has_next, interpolated,
+        np.where(has_prev, prev_vals, np.where(has_next, next_vals, np.nan))
+    )
+
+def encode_time(times):
+    """Sin/Cos hour-of-day and day-of-week features via lookup tables. Returns (Rows, 4)."""
+    times = pd.DatetimeIndex(times)
+    hour = times.hour.to_numpy()
+    day = times.dayofweek.to_numpy()
+    return np.column_stack((HOUR_SIN[hour], HOUR_COS[hour], DAY_SIN[day], DAY_COS[day]))
+
+class FeaturePipeline:
+    """
+    The one feature-engineering path shared by training, predict.py and the dashboard:
+    sort -> per-station imputation -> time encoding -> MinMax scaling.
+    Saved as a single file so inference always uses the exact training transform.
+    """
+
+    # Station vocabulary for the global model's embedding (id 0 = unknown station).
+    # Class-level defaults so pipelines pickled before these existed still load.
+    stations = ()
+    target_cols = None
+
+    def __init__(self, feature_cols=FEATURE_COLS, target_col=TARGET_COL, scaler=None, target_cols=None):
+        """target_cols: several forecast targets (multi-output model); target_col is then the first."""
+        self.feature_cols = list(feature_cols)
+        self.target_cols = list(target_cols) if target_cols else None
+        self.target_col = self.target_cols[0] if self.target_cols else target_col
+        self.raw_cols = [c for c in self.feature_cols if c not in TIME_COLS]
+        self.scaler = scaler if scaler is not None else MinMaxScaler()
+
+    @property
+    def target_index(self):
+        return self.feature_cols.index(self.target_col)
+
+    @property
+    def targets(self):
+        """Every forecast target column (just [target_col] for the single-output model)."""
+        return self.target_cols or [self.target_col]
+
+    @property
+    def target_indices(self):
+        return [self.feature_cols.index(c) for c in self.targets]
+
+    def encode(self, df):
+        """
+        Returns (sorted_df, unscaled feature matrix in feature_cols order).
+        """
+        df = df.sort_values(by=['station_name', 'time'], kind='stable').reset_index(drop=True)
+        codes, _ = pd.factorize(df['station_name'])
+        row_start, row_end = segment_bounds(codes)
+
+        raw = impute_segments(df[self.raw_cols].to_numpy(dtype=np.float64), row_start, row_end)
+        time_block = encode_time(df['time'])
+
+        columns = dict(zip(self.raw_cols, raw.T))
+        columns.update(zip(TIME_COLS, time_block.T))
+        matrix = np.column_stack([columns[c] for c in self.feature_cols])
+        return df, matrix
+
+    def encode_block(self, values, hour_times):
+        """
+        Dense-grid version of encode(): values is (Stations, Hours, len(raw_cols)) with NaN gaps,
+        hour_times the Hours timestamps. Each station row is its own imputation segment.
+        Returns the unscaled (Stations, Hours, Features) block.
+        """
+        n_stations, n_hours, _ = values.shape
+        flat = values.reshape(n_stations * n_hours, len(self.raw_cols))
+        row_start = np.repeat(np.arange(n_stations) * n_hours, n_hours)
+        raw = impute_segments(flat, row_start, row_start + n_hours)
+        time_block = np.tile(encode_time(hour_times), (n_stations, 1))
+
+        columns = dict(zip(self.raw_cols, raw.T))
+        columns.update(zip(TIME_COLS, time_block.T))
+        matrix = np.column_stack([columns[c] for c in self.feature_cols])
+        return matrix.reshape(n_stations, n_hours, len(self.feature_cols))
+
+    def transform_block(self, values, hour_times, fill_missing=True):
+        """Scaled float32 (Stations, Hours, Features) block from a dense raw block."""
+        block = self.encode_block(values, hour_times)
+        shape = block.shape
+        scaled = self.scaler.transform(block.reshape(-1, shape[-1])).astype(np.float32).reshape(shape)
+        if fill_missing:
+            scaled = np.nan_to_num(scaled, nan=0.0)
+        return scaled
+
+    def learn_stations(self, names, reset=False):
+        """Adds station names to the vocabulary. Existing ids never change, new names are appended."""
+        known = [] if reset else list(self.stations)
+        seen = set(known)
+        self.stations = known + sorted(n for n in set(pd.unique(names)) if n not in seen)
+        return self
+
+    def station_ids(self, names):
+        """Embedding ids (1..N) for station names, 0 for stations unseen in training."""
+        index = {name: i + 1 for i, name in enumerate(self.stations)}
+        return np.array([index.get(name, 0) for name in names], dtype=np.int32)
+
+    def fit(self, df):
+        _, matrix = self.encode(df)
+        self.scaler.fit(matrix)
+        self.learn_stations(df['station_name'], reset=True)
+        return self
+
+    def partial_fit(self, df):
+        _, matrix = self.encode(df)
+        self.scaler.partial_fit(matrix)
+        self.learn_stations(df['station_name'])
+        return self
+
+    def transform_array(self, df, fill_missing=False):
+        """Returns (sorted_df, scaled float32 matrix). fill_missing=True zero-fills leftover gaps."""
+        df, matrix = self.encode(df)
+        scaled = self.scaler.transform(matrix).astype(np.float32)
+        if fill_missing:
+            scaled = np.nan_to_num(scaled, nan=0.0)
+        return df, scaled
+
+    def transform(self, df, fill_missing=False):
+        """Returns the sorted frame with feature_cols replaced by their scaled values."""
+        df, scaled = self.transform_array(df, fill_missing=fill_missing)
+        df[self.feature_cols] = scaled
+        return df
+
+    def fit_transform(self, df):
+        df, matrix = self.encode(df)
+        df[self.feature_cols] = self.scaler.fit_transform(matrix)
+        self.learn_stations(df['station_name'], reset=True)
+        return df
+
+    def inverse_target(self, scaled_values):
+        """
+        Vectorized inverse scaling of target predictions (any shape).
+        With several targets, the last axis is the target axis (in `targets` order).
+        """
+        i = self.target_indices if len(self.targets) > 1 else self.target_index
+        scaled_values = np.asarray(scaled_values, dtype=np.float64)
+        return (scaled_values - self.scaler.min_[i]) / self.scaler.scale_[i]
+
+    def save(self, path=PIPELINE_PATH):
+        joblib.dump(self, path)
+
+def load_pipeline(pipeline_path=PIPELINE_PATH, scaler_path='scaler.gz'):
+    """
+    Loads the saved FeaturePipeline, or wraps a legacy scaler.gz from older training runs.
+    Returns None if neither exists.
+    """
+    if os.path.exists(pipeline_path):
+        return joblib.load(pipeline_path)
+    if os.path.exists(scaler_path):
+        return FeaturePipeline(scaler=joblib.load(scaler_path))
+    return None
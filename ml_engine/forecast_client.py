@@ -0,0 +1,69 @@
+# forecast_client.py
+
+import os
+import json
+import urllib.request
+import urllib.error
+import numpy as np
+
+# --- Settings ---
+# Plain stdlib + NumPy: clients never import TensorFlow
+SERVICE_URL = os.getenv('AERIS_FORECAST_URL', f"http://127.0.0.1:{os.getenv('AERIS_FORECAST_PORT', '8765')}")
+TIMEOUT = 5.0            # Seconds per request
+HEALTH_TIMEOUT = 0.5     # Fast fail when the service is not running
+
+class ForecastServiceError(Exception):
+    """The forecast service is down or answered with an error."""
+
+def _request(path, payload=None, timeout=TIMEOUT):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(
+        SERVICE_URL + path, data=data, headers={'Content-Type': 'application/json'}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise ForecastServiceError(f"{path}: HTTP {e.code} {e.read().decode(errors='replace')}") from e
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        raise ForecastServiceError(f"{path}: {e}") from e
+
+def health():
+    return _request('/health', timeout=HEALTH_TIMEOUT)
+
+def is_available():
+    try:
+        health()
+        return True
+    except ForecastServiceError:
+        return False
+
+def predict_stations(stations=None):
+    """
+    Latest forecast for the given stations (all of them if None), answered from the service's
+    resident windows. Returns (model_version, {station: (Horizon,) array}); unknown stations are left out.
+    """
+    result = _request('/predict/station', {'stations': list(stations) if stations is not None else None})
+    forecasts = {name: np.asarray(item['forecast'], dtype=np.float64) for name, item in result['forecasts'].items()}
+    return result['model_version'], forecasts
+
+def predict_station(station_name):
+    """(Horizon,) forecast for one station, or None if the service has no window for it."""
+    _, forecasts = predict_stations([station_name])
+    return forecasts.get(station_name)
+
+def predict_window(windows, stations=None):
+    """
+    Forecast for already-scaled windows, (24, Features) or (n, 24, Features).
+    stations: station name(s) for the global model. Same shapes as predict.forecast().
+    """
+    windows = np.asarray(windows, dtype=np.float32)
+    single = windows.ndim == 2
+    if isinstance(stations, str):
+        stations = [stations]
+    result = _request('/predict/window', {
+        'windows': (windows[None] if single else windows).tolist(),
+        'stations': list(stations) if stations is not None else None,
+    })
+    real = np.asarray(result['forecast'], dtype=np.float64)
+    return real[0] if single else real
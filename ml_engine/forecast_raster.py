@@ -0,0 +1,167 @@
+# forecast_raster.py
+
+import os
+import json
+import zlib
+import base64
+import struct
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+
+from preprocessor import get_db_connection, fetch_recent
+from features import load_pipeline
+from virtual_sensor import VirtualSensorGrid, station_windows, MAX_DISTANCE_KM
+from forecast_writer import model_version
+from data_events import CHANNEL
+
+# --- Settings ---
+RASTER_PATH = 'forecast_raster.npz'
+GRID_SIZE = 64            # Cells per side; every cell is one batched virtual-sensor forecast
+PAD_DEGREES = 0.02        # Margin around the outermost stations
+VALUE_MAX = 250.0         # µg/m³ mapped to palette index 254 (higher values are clipped)
+NO_DATA = 255             # Palette index of cells without a forecast (fully transparent)
+
+# PM2.5 colour stops, matching the dashboard's station colours (green / orange / red)
+COLOR_STOPS = [(0, '#00CC96'), (30, '#00CC96'), (60, '#FFA500'), (90, '#FF4B4B'), (VALUE_MAX, '#7E0023')]
+
+def make_palette():
+    """(256, 4) RGBA uint8: index i = i * VALUE_MAX / 254 µg/m³, NO_DATA transparent."""
+    levels = np.arange(NO_DATA) * VALUE_MAX / (NO_DATA - 1)
+    stops = np.array([s for s, _ in COLOR_STOPS])
+    rgb = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for _, c in COLOR_STOPS], dtype=np.float64)
+    palette = np.zeros((256, 4), dtype=np.uint8)
+    palette[:NO_DATA, :3] = np.column_stack([np.interp(levels, stops, rgb[:, i]) for i in range(3)]).round()
+    palette[:NO_DATA, 3] = 255
+    return palette
+
+def quantize(values):
+    """Real-unit values (NaN = no data) -> uint8 palette indices."""
+    index = np.clip(np.rint(np.nan_to_num(values, nan=0.0) * (NO_DATA - 1) / VALUE_MAX), 0, NO_DATA - 1)
+    return np.where(np.isnan(values), NO_DATA, index).astype(np.uint8)
+
+def dequantize(index):
+    return np.where(index == NO_DATA, np.nan, index.astype(np.float32) * VALUE_MAX / (NO_DATA - 1))
+
+def raster_png(index, palette):
+    """(Rows, Cols) uint8 indices -> palette PNG bytes (PLTE + tRNS), written with zlib only."""
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+    rows, cols = index.shape
+    scanlines = np.hstack([np.zeros((rows, 1), dtype=np.uint8), index]).tobytes()  # Filter type 0 per row
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', cols, rows, 8, 3, 0, 0, 0))
+            + chunk(b'PLTE', palette[:, :3].tobytes())
+            + chunk(b'tRNS', palette[:, 3].tobytes())
+            + chunk(b'IDAT', zlib.compress(scanlines, 9))
+            + chunk(b'IEND', b''))
+
+def png_data_uri(index, palette):
+    return "data:image/png;base64," + base64.b64encode(raster_png(index, palette)).decode()
+
+def grid_cells(stations_df, size=GRID_SIZE, pad=PAD_DEGREES):
+    """Cell centres (row-major, north row first) and the raster bounds (west, south, east, north)."""
+    west, east = stations_df['lon'].min() - pad, stations_df['lon'].max() + pad
+    south, north = stations_df['lat'].min() - pad, stations_df['lat'].max() + pad
+    lats = north - (np.arange(size) + 0.5) * (north - south) / size
+    lons = west + (np.arange(size) + 0.5) * (east - west) / size
+    lat, lon = np.meshgrid(lats, lons, indexing='ij')
+    return pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel()}), (west, south, east, north)
+
+def load_stations(conn):
+    return pd.read_sql("SELECT station_name, latitude AS lat, longitude AS lon FROM stations", conn).dropna()
+
+def build_raster(model, pipeline, stations_df, raw_df, size=GRID_SIZE):
+    """
+    Forecast of every grid cell as (Horizon, size, size) uint8, plus the bounds and the data hour.
+    Cell windows come from one sparse matmul over the station windows; the forecast is one batch.
+    """
+    from predict import forecast
+
+    cells, bounds = grid_cells(stations_df, size)
+    grid = VirtualSensorGrid(stations_df, cells)
+    names, windows, hour = station_windows(pipeline, raw_df)
+    if not names:
+        return None, bounds, None
+
+    cell_windows = grid.interpolate(names, windows)
+    neighbors = grid.neighbors(names)
+    # Only cells with a current window and a station within reach get a value
+    ok = ~np.isnan(cell_windows).any(axis=(1, 2)) & (grid.nearest_km <= MAX_DISTANCE_KM)
+    if not ok.any():
+        return None, bounds, hour
+    real = forecast(model, pipeline, cell_windows[ok], stations=[n for n, keep in zip(neighbors, ok) if keep])
+
+    values = np.full((len(cells), real.shape[1]), np.nan)
+    values[ok] = real
+    return quantize(values.T.reshape(-1, size, size)), bounds, hour
+
+def save_raster(path, index, bounds, hour, version):
+    # Written beside the target and renamed: readers never see a half-written file
+    tmp = path + '.tmp.npz'
+    np.savez_compressed(tmp, index=index, palette=make_palette(), bounds=np.asarray(bounds),
+                        meta=np.asarray(json.dumps({
+                            'data_hour': hour.isoformat() if hour is not None else None,
+                            'issued_at': datetime.now(timezone.utc).isoformat(),
+                            'model_version': version, 'value_max': VALUE_MAX,
+                        })))
+    os.replace(tmp, path)
+
+def load_raster(path=RASTER_PATH):
+    """{'index': (Horizon, R, C) uint8, 'palette', 'bounds': (west, south, east, north), 'meta'}, or None."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {'index': data['index'], 'palette': data['palette'],
+                'bounds': tuple(float(b) for b in data['bounds']), 'meta': json.loads(str(data['meta']))}
+
+def run_raster_job(size=GRID_SIZE, path=RASTER_PATH):
+    """Hourly: forecasts the whole city grid and replaces RASTER_PATH. Returns the number of cells with data."""
+    from predict import find_model_path, load_forecast_model, PIPELINE_PATH, SCALER_PATH
+
+    print(f"🗺️ RASTER JOB at {datetime.now()}")
+    model_path = find_model_path()
+    if model_path is None or not os.path.exists(SCALER_PATH):
+        print("⚠️ SKIPPING: No trained model/scaler found.")
+        return 0
+
+    conn = get_db_connection()
+    try:
+        stations_df = load_stations(conn)
+        raw_df = fetch_recent(list(stations_df['station_name']), conn=conn)
+    finally:
+        conn.close()
+    if stations_df.empty or raw_df.empty:
+        print("⚠️ SKIPPING: No stations or no recent data.")
+        return 0
+
+    model = load_forecast_model()
+    pipeline = load_pipeline(PIPELINE_PATH, SCALER_PATH)
+    index, bounds, hour = build_raster(model, pipeline, stations_df, raw_df, size)
+    if index is None:
+        print("⚠️ SKIPPING: No station has a current lookback window.")
+        return 0
+
+    save_raster(path, index, bounds, hour, model_version(model_path))
+    cells = int((index[0] != NO_DATA).sum())
+    print(f"✅ Raster {index.shape[0]}h x {size}x{size} ({cells} cells with data, "
+          f"{os.path.getsize(path) / 1024:.1f} KB) for data hour {hour}.")
+
+    conn = get_db_connection()
+    try:
+        conn.autocommit = True
+        cursor = conn.cursor()
+        # Same channel as the ingestion NOTIFYs: dashboards rerun once the raster is replaced
+        cursor.execute("SELECT pg_notify(%s, %s);", (CHANNEL, json.dumps({'table': 'forecast_raster', 'stations': []})))
+        cursor.close()
+    finally:
+        conn.close()
+    return cells
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast the city grid into a palette raster for the dashboard map.")
+    parser.add_argument('--size', type=int, default=GRID_SIZE, help="Cells per side.")
+    parser.add_argument('--output', default=RASTER_PATH)
+    args = parser.parse_args()
+    run_raster_job(args.size, args.output)
@@ -0,0 +1,284 @@
+# forecast_service.py
+
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from preprocessor import fetch_recent, LOOKBACK_WINDOW
+from features import load_pipeline
+from forecast_writer import model_version
+from predict import (
+    forecast, latest_windows, find_model_path, load_forecast_model, PIPELINE_PATH, SCALER_PATH
+)
+
+# --- Settings ---
+HOST = os.getenv('AERIS_FORECAST_HOST', '127.0.0.1')   # Localhost only
+PORT = int(os.getenv('AERIS_FORECAST_PORT', '8765'))
+MAX_BATCH = 256         # Windows per forward pass
+MAX_WAIT_MS = 2         # How long the first request of a batch waits for company
+REFRESH_SECONDS = 300   # Latest station windows are rebuilt this often (new hourly data)
+REQUEST_TIMEOUT = 10.0
+
+class MicroBatcher:
+    """
+    Collects concurrent forecast requests for up to MAX_WAIT_MS (or MAX_BATCH windows)
+    and answers all of them with a single forward pass.
+    """
+
+    def __init__(self, model, pipeline, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.pipeline = pipeline
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.window_shape = (LOOKBACK_WINDOW, len(pipeline.feature_cols))
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+        threading.Thread(target=self._loop, daemon=True, name='micro-batcher').start()
+
+    def submit(self, windows, stations=None):
+        """
+        windows: scaled (n, 24, F). Returns a Future resolving to real-unit (n, Horizon[, Pollutants]).
+        Malformed input raises ValueError here, before it can join (and fail) a shared batch.
+        """
+        windows = np.asarray(windows, dtype=np.float32)
+        if windows.ndim != 3 or windows.shape[1:] != self.window_shape or not len(windows):
+            raise ValueError(f"windows must be (n, {self.window_shape[0]}, {self.window_shape[1]}) "
+                             f"with n >= 1, got {windows.shape}")
+        stations = list(stations) if stations is not None else [None] * len(windows)
+        if len(stations) != len(windows):
+            raise ValueError(f"{len(stations)} stations for {len(windows)} windows")
+        future = Future()
+        self.queue.put((windows, stations, future))
+        return future
+
+    def _collect(self):
+        items = [self.queue.get()]
+        size = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    def _loop(self):
+        while True:
+            items = self._collect()
+            try:
+                windows = np.concatenate([w for w, _, _ in items])
+                stations = [s for _, names, _ in items for s in names]
+                real = forecast(self.model, self.pipeline, windows, stations=stations)
+            except Exception as e:
+                for _, _, future in items:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(items)
+            offset = 0
+            for w, _, future in items:
+                future.set_result(real[offset:offset + len(w)])
+                offset += len(w)
+
+class StationWindows:
+    """
+    Latest scaled window per station, rebuilt from the newest hours in the DB in the background.
+    With a stateful_lstm.StatefulForecaster, each refresh instead steps every station's LSTM state
+    over its new hours and keeps the resulting forecasts (`forecasts`), so requests skip the model.
+    """
+
+    def __init__(self, pipeline, refresh_seconds=REFRESH_SECONDS, forecaster=None):
+        self.pipeline = pipeline
+        self.refresh_seconds = refresh_seconds
+        self.forecaster = forecaster
+        self.windows, self.last_hours, self.updated_at = {}, {}, None
+        self.forecasts, self.stats = None, None
+        self.lock = threading.Lock()           # Guards the published windows / forecasts
+        self.refresh_lock = threading.Lock()   # One refresh (DB read + state update) at a time
+        self.refresh()
+        threading.Thread(target=self._loop, daemon=True, name='window-refresh').start()
+
+    def refresh(self):
+        # POST /refresh and the background loop can both get here; the stateful forecaster's
+        # update() is not safe to run twice at once, so whole refreshes are serialized
+        with self.refresh_lock:
+            try:
+                raw_df = fetch_recent()
+                if self.forecaster is not None:
+                    df, scaled = self.pipeline.transform_array(raw_df, fill_missing=True)
+                    self.forecaster.update(df, scaled)
+                    names, real, last = self.forecaster.forecast()
+                    windows, last = [None] * len(names), dict(zip(names, last))
+                else:
+                    names, windows = latest_windows(self.pipeline, raw_df)
+                    last = raw_df.groupby('station_name', observed=True)['time'].max().dt.floor('h')
+            except Exception as e:
+                print(f"   ⚠️ Window refresh failed: {e}")
+                return
+            with self.lock:
+                self.windows = dict(zip(names, windows))
+                self.last_hours = {name: last[name].isoformat() for name in names}
+                if self.forecaster is not None:
+                    self.forecasts = dict(zip(names, real))
+                    self.stats = dict(self.forecaster.stats)   # update() mutates stats outside self.lock
+                self.updated_at = pd.Timestamp.now(tz='UTC').isoformat()
+        print(f"   🔄 Windows refreshed for {len(names)} stations")
+
+    def _loop(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            self.refresh()
+
+    def get(self, names=None):
+        with self.lock:
+            names = list(self.windows) if names is None else names
+            missing = [n for n in names if n not in self.windows]
+            found = [n for n in names if n in self.windows]
+            if self.forecasts is not None:
+                return found, [self.forecasts[n] for n in found], [self.last_hours[n] for n in found], missing
+            return found, [self.windows[n] for n in found], [self.last_hours[n] for n in found], missing
+
+class ForecastServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128   # socketserver's default backlog of 5 resets bursts of dashboard sessions
+
+def make_handler(batcher, station_windows, info):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'   # Keep-alive: clients reuse one connection
+
+        def log_message(self, fmt, *args):
+            pass  # One line per request would dominate the service's own cost
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def _stations(self, names):
+            found, windows, last_hours, missing = station_windows.get(names)
+            result = {'model_version': info['model_version'], 'missing': missing, 'forecasts': {}}
+            if found:
+                if station_windows.forecasts is not None:
+                    real = windows  # Stateful mode: already forecast at refresh time
+                else:
+                    real = batcher.submit(np.stack(windows), found).result(REQUEST_TIMEOUT)
+                result['forecasts'] = {
+                    name: {'last_hour': hour, 'forecast': np.asarray(values).tolist()}
+                    for name, hour, values in zip(found, last_hours, real)
+                }
+            return result
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            try:
+                if url.path == '/health':
+                    # Snapshot under the lock: a refresh publishes these concurrently
+                    with station_windows.lock:
+                        health = {'stations': len(station_windows.windows), 'stateful': station_windows.stats,
+                                  'windows_updated_at': station_windows.updated_at}
+                    self._send(200, {**info, **health, 'batches': batcher.batches, 'requests': batcher.requests})
+                elif url.path == '/predict/station':
+                    names = parse_qs(url.query).get('name')
+                    self._send(200, self._stations(names))
+                else:
+                    self._send(404, {'error': f"Unknown path {url.path}"})
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            try:
+                body = self._body()
+                if url.path == '/predict/station':
+                    self._send(200, self._stations(body.get('stations')))
+                elif url.path == '/predict/window':
+                    # Scaled (n, 24, F) windows, e.g. built by the virtual sensor
+                    real = batcher.submit(body['windows'], body.get('stations')).result(REQUEST_TIMEOUT)
+                    self._send(200, {'model_version': info['model_version'], 'forecast': np.asarray(real).tolist()})
+                elif url.path == '/refresh':
+                    station_windows.refresh()
+                    self._send(200, {'windows_updated_at': station_windows.updated_at})
+                else:
+                    self._send(404, {'error': f"Unknown path {url.path}"})
+            except (KeyError, ValueError, TypeError) as e:
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+
+    return Handler
+
+def serve(host=HOST, port=PORT, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, refresh_seconds=REFRESH_SECONDS,
+          stateful=False):
+    print("🛰️ STARTING FORECAST SERVICE...")
+    path = find_model_path()
+    if path is None or not os.path.exists(SCALER_PATH):
+        print("❌ Error: Model or Scaler not found. Train the model first!")
+        return
+
+    # Loaded once for the life of the process
+    started = time.perf_counter()
+    model = load_forecast_model()
+    pipeline = load_pipeline(PIPELINE_PATH, SCALER_PATH)
+    print(f"1. Model {path} loaded in {time.perf_counter() - started:.1f}s")
+
+    batcher = MicroBatcher(model, pipeline, max_batch, max_wait_ms)
+    forecaster = None
+    if stateful:
+        from numpy_lstm import NumpyLSTM
+        from stateful_lstm import StatefulForecaster
+        if isinstance(model, NumpyLSTM):
+            forecaster = StatefulForecaster(model, pipeline)
+        else:
+            print("   ⚠️ --stateful needs the NumPy export (export_model.py --format numpy); serving full windows.")
+    print("2. Building latest station " + ("states..." if forecaster is not None else "windows..."))
+    station_windows = StationWindows(pipeline, refresh_seconds, forecaster)
+
+    # Warm-up pass so the first real request does not pay for graph tracing
+    if station_windows.windows and forecaster is None:
+        name = next(iter(station_windows.windows))
+        batcher.submit(station_windows.windows[name][None], [name]).result(60)
+
+    info = {'model': path, 'model_version': model_version(path), 'pid': os.getpid()}
+    server = ForecastServer((host, port), make_handler(batcher, station_windows, info))
+    print(f"✅ Serving on http://{host}:{port} (max batch {max_batch}, wait {max_wait_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Forecast service stopped.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident forecast service (model loaded once, micro-batched).")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    parser.add_argument('--refresh-seconds', type=int, default=REFRESH_SECONDS)
+    parser.add_argument('--stateful', action='store_true',
+                        help="Keep per-station LSTM states and step them once per new hour (NumPy export only).")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.max_batch, args.max_wait_ms, args.refresh_seconds, args.stateful)
@@ -0,0 +1,173 @@
+# forecast_writer.py
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+
+from preprocessor import get_db_connection, fetch_recent
+from schema import FORECAST_LOGS_DDL
+
+# --- Settings ---
+PAGE_SIZE = 1000   # Rows per INSERT statement in execute_values
+
+INSERT_QUERY = """
+    INSERT INTO forecast_logs (issued_at, station_name, target_hour, lead_hours, predicted_aqi, model_version)
+    VALUES %s
+    ON CONFLICT (target_hour, station_name, lead_hours, model_version)
+    DO UPDATE SET predicted_aqi = EXCLUDED.predicted_aqi, issued_at = EXCLUDED.issued_at;
+"""
+
+def ensure_forecast_table(conn):
+    """Creates the forecast_logs hypertable if needed (utils/create_tables.py runs the same DDL)."""
+    cursor = conn.cursor()
+    cursor.execute(FORECAST_LOGS_DDL)
+    cursor.execute("SELECT create_hypertable('forecast_logs', 'target_hour', if_not_exists => TRUE);")
+    conn.commit()
+    cursor.close()
+
+def model_version(path):
+    """File name + modification time, e.g. 'aeris_v1_h24@20240131T0930' (changes on every retrain)."""
+    stamp = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc).strftime('%Y%m%dT%H%M')
+    return f"{os.path.splitext(os.path.basename(path))[0]}@{stamp}"
+
+def forecast_rows(forecasts, last_hours, version, issued_at):
+    """
+    (Stations x Horizon) forecast frame -> forecast_logs tuples.
+    last_hours: latest observed hour per station; lead h targets last hour + h.
+    """
+    stations = forecasts.index.to_numpy()
+    horizon = forecasts.shape[1]
+    leads = np.arange(1, horizon + 1)
+    base = pd.DatetimeIndex(last_hours.reindex(stations).to_numpy())
+    targets = base.repeat(horizon) + pd.to_timedelta(np.tile(leads, len(stations)), unit='h')
+
+    return list(zip(
+        [issued_at] * (len(stations) * horizon),
+        np.repeat(stations, horizon).tolist(),
+        targets.to_pydatetime().tolist(),
+        np.tile(leads, len(stations)).tolist(),
+        forecasts.to_numpy(dtype=np.float64).reshape(-1).tolist(),
+        [version] * (len(stations) * horizon),
+    ))
+
+def write_forecasts(conn, rows):
+    from psycopg2.extras import execute_values
+    cursor = conn.cursor()
+    execute_values(cursor, INSERT_QUERY, rows, page_size=PAGE_SIZE)
+    conn.commit()
+    cursor.close()
+    return len(rows)
+
+def run_forecast_job():
+    """
+    Batch-forecasts every station with one forward pass and bulk-writes the result.
+    Meant to run right after each ingestion cycle (see backend_scheduler/scheduler.py).
+    """
+    from features import load_pipeline
+    from predict import forecast_network, forecast_frame, find_model_path, load_forecast_model, PIPELINE_PATH, SCALER_PATH
+    from tensor_store import FeatureTensorStore, USE_FEATURE_STORE
+
+    print(f"📝 FORECAST JOB at {datetime.now()}")
+    path = find_model_path()
+    if path is None or not os.path.exists(SCALER_PATH):
+        print("⚠️ SKIPPING: No trained model/scaler found.")
+        return 0
+
+    model = load_forecast_model()
+    pipeline = load_pipeline(PIPELINE_PATH, SCALER_PATH)
+    version = model_version(path)
+
+    if USE_FEATURE_STORE:
+        # Windows are slices of the store the scheduler appended to a few minutes earlier
+        names, windows, hour = FeatureTensorStore().inference_windows(pipeline)
+        forecasts = forecast_frame(model, pipeline, names, windows)
+        # Floored in the data's timezone, like the fetch_recent() path below
+        last_hours = pd.Series(pd.Timestamp(hour).floor('h'), index=forecasts.index) if names else None
+    else:
+        raw_df = fetch_recent()
+        if raw_df.empty:
+            print("⚠️ SKIPPING: No recent data.")
+            return 0
+        forecasts = forecast_network(model, pipeline, raw_df)
+        last_hours = raw_df.groupby('station_name', observed=True)['time'].max().dt.floor('h')
+
+    if forecasts.empty:
+        print("⚠️ SKIPPING: No station has a full lookback window.")
+        return 0
+
+    rows = forecast_rows(forecasts, last_hours, version, datetime.now(timezone.utc))
+
+    conn = get_db_connection()
+    try:
+        ensure_forecast_table(conn)
+        written = write_forecasts(conn, rows)
+    finally:
+        conn.close()
+    print(f"✅ {written} forecasts ({len(forecasts)} stations x {forecasts.shape[1]} h) written as {version}")
+    return written
+
+# --- Read API ---
+def read_forecasts(conn, stations=None, since=None, until=None, lead_hours=None, model_version=None):
+    """
+    Logged forecasts as a DataFrame (station_name, target_hour, lead_hours, predicted_aqi,
+    model_version, issued_at), newest issue first. Every argument is an optional filter.
+    """
+    conditions, params = [], []
+    if stations is not None:
+        conditions.append("station_name = ANY(%s)")
+        params.append(list(stations))
+    if since is not None:
+        conditions.append("target_hour >= %s")
+        params.append(pd.Timestamp(since).to_pydatetime())
+    if until is not None:
+        conditions.append("target_hour < %s")
+        params.append(pd.Timestamp(until).to_pydatetime())
+    if lead_hours is not None:
+        conditions.append("lead_hours = %s")
+        params.append(int(lead_hours))
+    if model_version is not None:
+        conditions.append("model_version = %s")
+        params.append(model_version)
+
+    query = f"""
+        SELECT station_name, target_hour, lead_hours, predicted_aqi, model_version, issued_at
+        FROM forecast_logs
+        WHERE {' AND '.join(conditions) or 'TRUE'}
+        ORDER BY issued_at DESC, station_name, target_hour
+    """
+    return pd.read_sql(query, conn, params=tuple(params) or None)
+
+def latest_forecast(conn, station_name):
+    """
+    The most recently issued forecast run for one station: (target hours, values) sorted by
+    target hour, or None if nothing has been logged yet.
+    """
+    query = """
+        SELECT target_hour, predicted_aqi
+        FROM forecast_logs
+        WHERE station_name = %s
+          AND issued_at = (SELECT MAX(issued_at) FROM forecast_logs WHERE station_name = %s)
+        ORDER BY target_hour
+    """
+    df = pd.read_sql(query, conn, params=(station_name, station_name))
+    if df.empty:
+        return None
+    return pd.DatetimeIndex(df['target_hour']), df['predicted_aqi'].to_numpy(dtype=np.float64)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-forecast every station into forecast_logs.")
+    parser.add_argument('--show', default=None, metavar='STATION', help="Print the latest logged forecast instead.")
+    args = parser.parse_args()
+
+    if args.show:
+        conn = get_db_connection()
+        result = latest_forecast(conn, args.show)
+        conn.close()
+        if result is None:
+            print(f"📭 No logged forecast for {args.show}.")
+        else:
+            print(pd.Series(result[1], index=result[0], name='predicted_aqi').round(2).to_string())
+    else:
+        run_forecast_job()
@@ -0,0 +1,100 @@
+# history.py
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+# --- Settings ---
+POINT_BUDGET = 400            # Points per chart series, whatever the range
+RAW_MAX_HOURS = 72            # Up to 3 days: raw rows
+HOURLY_MAX_HOURS = 24 * 120   # Up to ~4 months: hourly rollup; beyond that the daily one
+
+# Rollups created by utils/create_tables.py (TimescaleDB continuous aggregates on aqi_data)
+ROLLUPS = {'hourly': ('aqi_hourly', '1 hour'), 'daily': ('aqi_daily', '1 day')}
+
+# Anchored at the station's newest row, so a stale station still shows its last `hours` of data
+HISTORY_QUERY = """
+    WITH last AS (
+        SELECT MAX(time) AS t FROM aqi_data
+        WHERE station_name = %(station)s AND pollutant_id = %(pollutant)s
+    )
+    SELECT EXTRACT(EPOCH FROM s.{time_col})::float8, s.pollutant_avg::float8
+    FROM {source} s, last
+    WHERE s.station_name = %(station)s AND s.pollutant_id = %(pollutant)s
+      AND s.{time_col} > last.t - %(hours)s * INTERVAL '1 hour' AND s.{time_col} <= last.t
+    ORDER BY 1
+"""
+
+# Same buckets computed from aqi_data, for databases where the rollups were never created
+ROLLUP_FALLBACK = """(
+        SELECT time_bucket('{width}', time) AS bucket, station_name, pollutant_id, AVG(pollutant_avg) AS pollutant_avg
+        FROM aqi_data, last
+        WHERE station_name = %(station)s AND pollutant_id = %(pollutant)s
+          AND time > last.t - %(hours)s * INTERVAL '1 hour' - INTERVAL '{width}'
+        GROUP BY 1, 2, 3
+    )"""
+
+def pick_resolution(hours):
+    """'raw', 'hourly' or 'daily': the finest source whose row count stays within a few budgets."""
+    if hours <= RAW_MAX_HOURS:
+        return 'raw'
+    return 'hourly' if hours <= HOURLY_MAX_HOURS else 'daily'
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the visual shape of (x, y).
+    The first and last points are always kept; each bucket in between keeps the point forming the
+    largest triangle with the previously kept point and the next bucket's average.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)   # threshold - 2 interior buckets
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        following = slice(end, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        cx, cy = x[following].mean(), y[following].mean()
+        area = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def _query(conn, resolution, params, fallback=False):
+    if resolution == 'raw':
+        source, time_col = 'aqi_data', 'time'
+    else:
+        view, width = ROLLUPS[resolution]
+        source, time_col = (ROLLUP_FALLBACK.format(width=width) if fallback else view), 'bucket'
+    cursor = conn.cursor()
+    try:
+        cursor.execute(HISTORY_QUERY.format(source=source, time_col=time_col), params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def fetch_history(conn, station, hours=24, pollutant='PM2.5', budget=POINT_BUDGET):
+    """
+    A station's last `hours` of one pollutant as (DataFrame[time, pollutant_avg], resolution),
+    with at most `budget` points: the source (raw / hourly / daily rollup) is picked from the
+    range and the result is LTTB-downsampled, so the chart payload does not grow with the range.
+    """
+    resolution = pick_resolution(hours)
+    params = {'station': station, 'pollutant': pollutant, 'hours': hours}
+    try:
+        rows = _query(conn, resolution, params)
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        rows = _query(conn, resolution, params, fallback=True)
+
+    epoch = np.array([r[0] for r in rows], dtype=np.float64)
+    values = np.array([np.nan if r[1] is None else r[1] for r in rows], dtype=np.float64)
+    ok = ~np.isnan(values)
+    epoch, values = epoch[ok], values[ok]
+
+    keep = lttb(epoch, values, budget)
+    history = pd.DataFrame({'time': pd.to_datetime(epoch[keep], unit='s', utc=True), 'pollutant_avg': values[keep]})
+    return history, resolution
@@ -0,0 +1,133 @@
+# incremental_train.py
+
+import os
+import shutil
+import argparse
+import numpy as np
+import tensorflow as tf
+
+from preprocessor import fetch_data, build_base_arrays, LOOKBACK_WINDOW
+from features import load_pipeline
+from window_dataset import make_window_dataset
+from train_model import SAFE_STATIONS, SCALER_PATH, PIPELINE_PATH, BATCH_SIZE, attach_station_ids
+from predict import find_model_path
+
+# --- Settings ---
+RECENT_DAYS = 2            # Windows whose target falls in the last N days are "new data"
+HOLDOUT_HOURS = 24         # Newest hours held out to decide promotion
+REPLAY_RATIO = 1.0         # Older windows replayed per recent window (fights forgetting)
+FINE_TUNE_EPOCHS = 3
+FINE_TUNE_LR = 1e-4        # Well below Adam's 1e-3 so we nudge, not retrain
+PROMOTION_TOLERANCE = 0.0  # Allowed relative MAE regression (0.0 = must not get worse)
+BACKUP_SUFFIX = '.prev.keras'  # aeris_v1_h24.keras -> aeris_v1_h24.prev.keras
+
+def select_windows(base, recent_days=RECENT_DAYS, holdout_hours=HOLDOUT_HOURS, replay_ratio=REPLAY_RATIO, seed=42):
+    """
+    Splits window starts by target time into (fine-tune starts, holdout starts).
+    Fine-tune = recent windows before the holdout + a random replay sample of older windows.
+    """
+    starts = base['starts']
+    target_times = base['times'][starts + LOOKBACK_WINDOW]
+    latest = target_times.max()
+
+    holdout_start = latest - np.timedelta64(holdout_hours, 'h')
+    recent_start = latest - np.timedelta64(recent_days * 24, 'h')
+
+    holdout = starts[target_times > holdout_start]
+    recent = starts[(target_times > recent_start) & (target_times <= holdout_start)]
+    older = starts[target_times <= recent_start]
+
+    rng = np.random.default_rng(seed)
+    n_replay = min(len(older), int(len(recent) * replay_ratio))
+    replay = rng.choice(older, size=n_replay, replace=False) if n_replay else older[:0]
+
+    return np.concatenate((recent, replay)), holdout, len(recent), n_replay
+
+def model_shape(model):
+    """(horizon, global) of a trained model: output width and whether it takes station ids."""
+    return int(np.prod(model.output_shape[1:])), len(model.inputs) > 1
+
+def holdout_mae(model, base, holdout, horizon=1, with_station=False):
+    """Scaled-space MAE of `model` on the holdout windows, over every forecast hour."""
+    ds = make_window_dataset(base, holdout, batch_size=256, horizon=horizon, with_station=with_station)
+    preds = model.predict(ds, verbose=0).reshape(len(holdout), horizon)
+    targets = base['targets'][holdout[:, None] + LOOKBACK_WINDOW + np.arange(horizon)]
+    return float(np.mean(np.abs(preds - targets)))
+
+def incremental_update(epochs=FINE_TUNE_EPOCHS, learning_rate=FINE_TUNE_LR, tolerance=PROMOTION_TOLERANCE):
+    print("♻️ STARTING INCREMENTAL RETRAINING...")
+
+    # The model predict.py serves (global / multi-horizon variants first), not always aeris_v1.keras
+    model_path = find_model_path()
+    if model_path is None or not os.path.exists(SCALER_PATH):
+        print("❌ Error: No current model/scaler. Run a full train_model.py first.")
+        return False
+
+    # 1. Current production model + the pipeline it was trained with (scaler is NOT refitted)
+    current = tf.keras.models.load_model(model_path)
+    pipeline = load_pipeline(PIPELINE_PATH, SCALER_PATH)
+    horizon, global_model = model_shape(current)
+    print(f"   > Serving model: {model_path} (horizon {horizon}h{', station embedding' if global_model else ''})")
+
+    # 2. Latest data (cheap with AERIS_FEATURE_CACHE=1), same safety filter as full training
+    raw_df = fetch_data()
+    raw_df = raw_df[raw_df['station_name'].isin(SAFE_STATIONS)]
+    if raw_df.empty:
+        print("❌ Error: No data for the safe station list.")
+        return False
+
+    clean_df = pipeline.transform(raw_df)
+    base = build_base_arrays(clean_df, horizon=horizon)
+    del clean_df
+    if global_model:
+        attach_station_ids(base, pipeline)
+    if len(base['starts']) == 0:
+        print("❌ Error: Not enough data to create sequences.")
+        return False
+
+    out_of_range = np.mean((base['features'] < -0.05) | (base['features'] > 1.05))
+    if out_of_range > 0.01:
+        print(f"⚠️ {out_of_range:.1%} of scaled values fall outside [0, 1]. Consider a full retrain.")
+
+    # 3. Recent windows + replay sample, newest hours held out
+    tune_starts, holdout, n_recent, n_replay = select_windows(base)
+    print(f"   > Fine-tune windows: {n_recent} recent + {n_replay} replay | Holdout: {len(holdout)}")
+    if n_recent == 0 or len(holdout) == 0:
+        print("⚠️ Not enough new data since the last run. Nothing to do.")
+        return False
+
+    # 4. Warm start: copy of the current weights, low learning rate
+    candidate = tf.keras.models.clone_model(current)
+    candidate.set_weights(current.get_weights())
+    candidate.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate), loss='mse', metrics=['mae'])
+
+    train_ds = make_window_dataset(base, tune_starts, BATCH_SIZE, shuffle=True,
+                                   horizon=horizon, with_station=global_model)
+    candidate.fit(train_ds, epochs=epochs, verbose=1)
+
+    # 5. Promotion gate
+    old_mae = holdout_mae(current, base, holdout, horizon, global_model)
+    new_mae = holdout_mae(candidate, base, holdout, horizon, global_model)
+    to_real = 1.0 / pipeline.scaler.scale_[pipeline.target_index]
+    print(f"   > Holdout MAE  current: {old_mae * to_real:.2f}  |  candidate: {new_mae * to_real:.2f} µg/m³")
+
+    if new_mae <= old_mae * (1 + tolerance):
+        backup_path = model_path.replace('.keras', BACKUP_SUFFIX)
+        shutil.copy(model_path, backup_path)
+        tmp_path = model_path.replace('.keras', '.tmp.keras')
+        candidate.save(tmp_path)
+        os.replace(tmp_path, model_path)
+        print(f"✅ PROMOTED. New model saved to {model_path} (previous kept at {backup_path})")
+        return True
+
+    print("🛑 NOT PROMOTED. Candidate regressed on the holdout; keeping the current model.")
+    return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm-start fine-tuning of the current Aeris model.")
+    parser.add_argument('--epochs', type=int, default=FINE_TUNE_EPOCHS)
+    parser.add_argument('--lr', type=float, default=FINE_TUNE_LR)
+    parser.add_argument('--tolerance', type=float, default=PROMOTION_TOLERANCE,
+                        help="Allowed relative holdout MAE regression before refusing promotion.")
+    args = parser.parse_args()
+    incremental_update(args.epochs, args.lr, args.tolerance)
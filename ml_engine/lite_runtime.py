@@ -0,0 +1,94 @@
+# lite_runtime.py
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+
+# --- Settings ---
+LITE_SUFFIX = '.tflite'
+META_SUFFIX = '.tflite.json'
+
+def lite_path_for(model_path):
+    """'aeris_v1_h24.keras' -> 'aeris_v1_h24.tflite' (written by export_model.py)."""
+    return os.path.splitext(model_path)[0] + LITE_SUFFIX
+
+def file_digest(path):
+    """sha256 of the Keras file: ties an export to the exact weights (mtimes change on git checkout)."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _interpreter_class():
+    # Smallest runtime first: LiteRT / tflite-runtime are a few MB, TensorFlow is the last resort
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+class LiteModel:
+    """
+    Exported model behind the same call interface predict.forecast() uses for Keras:
+    `len(model.inputs)` and `model(inputs, training=False)`.
+    The LSTM is exported with a fixed batch size, so inputs are run in padded chunks of that size.
+    """
+
+    def __init__(self, path, meta=None):
+        self.path = path
+        self.meta = meta or {}
+        self.interpreter = _interpreter_class()(model_path=path)
+        self.interpreter.allocate_tensors()
+        # Keras input order is kept in the tensor names (input_0, input_1, ...)
+        self.inputs = sorted(self.interpreter.get_input_details(), key=lambda d: d['name'])
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch = int(self.inputs[0]['shape'][0])
+        self.lock = threading.Lock()  # One interpreter, shared by dashboard sessions / service threads
+
+    def __call__(self, inputs, training=False):
+        inputs = [inputs] if len(self.inputs) == 1 and not isinstance(inputs, (list, tuple)) else list(inputs)
+        arrays = [np.asarray(x, dtype=d['dtype']) for x, d in zip(inputs, self.inputs)]
+        n = len(arrays[0])
+        outputs = []
+        with self.lock:
+            for start in range(0, n, self.batch):
+                chunk = [a[start:start + self.batch] for a in arrays]
+                size = len(chunk[0])
+                if size < self.batch:
+                    # Pad with copies of the last row; the padded outputs are dropped
+                    chunk = [np.concatenate([c, np.repeat(c[-1:], self.batch - size, axis=0)]) for c in chunk]
+                for c, detail in zip(chunk, self.inputs):
+                    self.interpreter.set_tensor(detail['index'], c)
+                self.interpreter.invoke()
+                outputs.append(self.interpreter.get_tensor(self.output['index'])[:size])
+        return np.concatenate(outputs)
+
+def read_meta(model_path):
+    meta_path = os.path.splitext(model_path)[0] + META_SUFFIX
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+def load_lite_model(model_path):
+    """
+    The exported artifact of `model_path`, or None if there is none, it failed its parity
+    check, or the Keras model was retrained after the export.
+    """
+    path, meta = lite_path_for(model_path), read_meta(model_path)
+    if not os.path.exists(path) or meta is None:
+        return None
+    if not meta.get('passed'):
+        print(f"   ⚠️ {path} failed its parity check; using the Keras model.")
+        return None
+    if os.path.exists(model_path) and file_digest(model_path) != meta.get('source_sha256'):
+        print(f"   ⚠️ {path} was exported from an older {model_path}; run export_model.py again. Using the Keras model.")
+        return None
+    return LiteModel(path, meta)
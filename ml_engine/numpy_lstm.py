@@ -0,0 +1,148 @@
+# numpy_lstm.py
+
+import os
+import json
+import numpy as np
+
+# --- Settings ---
+NUMPY_SUFFIX = '.npz'
+
+def numpy_path_for(model_path):
+    """'aeris_v1_h24.keras' -> 'aeris_v1_h24.npz' (written by export_model.py --format numpy)."""
+    return os.path.splitext(model_path)[0] + NUMPY_SUFFIX
+
+def _sigmoid(x):
+    # tanh form: one ufunc call, no overflow warnings for large |x|
+    return 0.5 * np.tanh(0.5 * x) + 0.5
+
+def _gate_order(array):
+    """Keras gate blocks (i, f, c, o) -> (i, f, o, c): the three sigmoid gates become contiguous."""
+    i, f, c, o = np.split(array, 4, axis=-1)
+    return np.concatenate([i, f, o, c], axis=-1)
+
+def extract_weights(model):
+    """
+    The arrays of a train_model.build_model / build_global_model network, as a flat dict.
+    Raises ValueError for layers or activations the NumPy forward pass does not implement.
+    """
+    layers = {type(layer).__name__: layer for layer in model.layers}
+    unknown = set(layers) - {'InputLayer', 'LSTM', 'Dropout', 'Dense', 'Reshape', 'Embedding', 'Flatten', 'Concatenate'}
+    if unknown or 'LSTM' not in layers or 'Dense' not in layers:
+        raise ValueError(f"Unsupported architecture for the NumPy engine: {sorted(layers)}")
+
+    lstm, dense = layers['LSTM'], layers['Dense']
+    config = lstm.get_config()
+    if (config['activation'], config['recurrent_activation']) != ('tanh', 'sigmoid') or config.get('go_backwards'):
+        raise ValueError(f"Unsupported LSTM configuration: {config['activation']}/{config['recurrent_activation']}")
+
+    kernel, recurrent_kernel, bias = lstm.get_weights()   # Gate blocks in Keras order: i, f, c, o
+    dense_kernel, dense_bias = dense.get_weights()
+    weights = {
+        'kernel': kernel, 'recurrent_kernel': recurrent_kernel, 'bias': bias,
+        'dense_kernel': dense_kernel, 'dense_bias': dense_bias,
+        'output_shape': np.asarray(layers['Reshape'].target_shape if 'Reshape' in layers else (-1,)),
+    }
+    if 'Embedding' in layers:
+        weights['embedding'] = layers['Embedding'].get_weights()[0]
+    return {name: np.asarray(value) for name, value in weights.items()}
+
+class NumpyLSTM:
+    """
+    NumPy-only forward pass of the shipped LSTM -> Dropout -> Dense(H [x P]) model
+    (and the global variant's station embedding), with the Keras call interface
+    predict.forecast() uses: `len(model.inputs)` and `model(inputs, training=False)`.
+    """
+
+    def __init__(self, weights, meta=None):
+        self.meta = meta or {}
+        units = weights['recurrent_kernel'].shape[0]
+        self.kernel = _gate_order(weights['kernel']).astype(np.float32)
+        self.recurrent_kernel = _gate_order(weights['recurrent_kernel']).astype(np.float32)
+        self.bias = _gate_order(weights['bias']).astype(np.float32)
+        self.dense_kernel = weights['dense_kernel'].astype(np.float32)
+        self.dense_bias = weights['dense_bias'].astype(np.float32)
+        self.output_shape = tuple(int(d) for d in weights['output_shape'])
+        self.embedding = weights['embedding'].astype(np.float32) if 'embedding' in weights else None
+        self.units = units
+        self.inputs = ['window', 'station'] if self.embedding is not None else ['window']
+
+    def _cell(self, z, h, c):
+        """One recurrence step from the input projection z = x @ W + b. Returns (h, c)."""
+        u = self.units
+        z = z + h @ self.recurrent_kernel
+        gates = _sigmoid(z[:, :3 * u])   # i, f, o
+        c = gates[:, u:2 * u] * c + gates[:, :u] * np.tanh(z[:, 3 * u:])
+        return gates[:, 2 * u:] * np.tanh(c), c
+
+    def zero_state(self, n):
+        return np.zeros((n, self.units), dtype=np.float32), np.zeros((n, self.units), dtype=np.float32)
+
+    def step(self, rows, h, c):
+        """Advances (N, Units) states by one hour of features (N, F). Returns (h, c)."""
+        return self._cell(np.asarray(rows, dtype=np.float32) @ self.kernel + self.bias, h, c)
+
+    def run(self, windows, h=None, c=None, return_sequences=False):
+        """
+        (N, T, F) windows from state (h, c) (zeros if None) -> final (h, c),
+        or the states after every step, (T, N, Units) each, with return_sequences=True.
+        """
+        n, steps, _ = windows.shape
+        if h is None:
+            h, c = self.zero_state(n)
+        # Input projection of every time step in one matmul; only h @ U stays inside the loop
+        projected = np.asarray(windows, dtype=np.float32) @ self.kernel + self.bias
+        hs, cs = [], []
+        for t in range(steps):
+            h, c = self._cell(projected[:, t], h, c)
+            if return_sequences:
+                hs.append(h)
+                cs.append(c)
+        return (np.stack(hs), np.stack(cs)) if return_sequences else (h, c)
+
+    def lstm(self, windows):
+        """(N, T, F) -> last hidden state (N, Units)."""
+        return self.run(windows)[0]
+
+    def head(self, h, station_ids=None):
+        """Dense output from hidden states (Dropout is the identity at inference)."""
+        x = h
+        if self.embedding is not None:
+            x = np.concatenate([h, self.embedding[np.asarray(station_ids).reshape(-1)]], axis=1)
+        out = x @ self.dense_kernel + self.dense_bias
+        return out.reshape((len(out),) + self.output_shape)
+
+    def __call__(self, inputs, training=False):
+        if self.embedding is not None:
+            windows, station_ids = inputs
+        else:
+            windows, station_ids = (inputs[0] if isinstance(inputs, (list, tuple)) else inputs), None
+        return self.head(self.lstm(np.asarray(windows, dtype=np.float32)), station_ids)
+
+def save_numpy_model(path, weights, meta):
+    np.savez(path, meta=np.asarray(json.dumps(meta)), **weights)
+
+def read_numpy_model(path):
+    """(weights, meta) from a saved .npz."""
+    with np.load(path) as data:
+        weights = {name: data[name] for name in data.files if name != 'meta'}
+        meta = json.loads(str(data['meta'])) if 'meta' in data.files else {}
+    return weights, meta
+
+def load_numpy_model(model_path):
+    """
+    The NumPy engine for `model_path`, or None if there is no .npz, it failed its
+    verification, or the Keras model was retrained after the export.
+    """
+    from lite_runtime import file_digest
+
+    path = numpy_path_for(model_path)
+    if not os.path.exists(path):
+        return None
+    weights, meta = read_numpy_model(path)
+    if not meta.get('passed'):
+        print(f"   ⚠️ {path} failed its verification against Keras; ignoring it.")
+        return None
+    if os.path.exists(model_path) and file_digest(model_path) != meta.get('source_sha256'):
+        print(f"   ⚠️ {path} was exported from an older {model_path}; run export_model.py again. Ignoring it.")
+        return None
+    return NumpyLSTM(weights, meta)
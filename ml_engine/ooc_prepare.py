@@ -0,0 +1,149 @@
+# ooc_prepare.py
+
+import os
+import json
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+
+from preprocessor import (
+    get_db_connection, iter_bucketed_chunks, LOOKBACK_WINDOW, RAW_FEATURE_COLS
+)
+from features import FeaturePipeline, PIPELINE_PATH
+
+# --- Settings ---
+SHARD_DIR = os.getenv(
+    'AERIS_SHARD_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shards')
+)
+CHUNK_ROWS = 50000          # Rows per DB round trip (bounds RAM)
+VALIDATION_FRACTION = 0.2   # Last 20% of the archive's time span is validation
+SCALER_PATH = 'scaler.gz'
+MANIFEST_FILE = 'manifest.json'
+
+def archive_time_range(conn):
+    """(first hour, last hour) of PM2.5 data in the archive."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT MIN(time), MAX(time) FROM aqi_data WHERE pollutant_id = 'PM2.5'")
+    first, last = cursor.fetchone()
+    cursor.close()
+    return (pd.Timestamp(first), pd.Timestamp(last)) if first is not None else (None, None)
+
+def chunk_to_frame(chunk, stations):
+    df = pd.DataFrame(chunk['values'], columns=RAW_FEATURE_COLS)
+    df.insert(0, 'time', pd.to_datetime(chunk['epoch'], unit='s', utc=True))
+    df.insert(1, 'station_name', np.asarray(stations, dtype=object)[chunk['station_codes']])
+    return df
+
+def iter_frames(conn, until=None, stations=None):
+    """Time-ordered chunks of the whole archive as small DataFrames, optionally only `stations` (filtered in SQL)."""
+    station_index = {}
+    for chunk in iter_bucketed_chunks(conn, since=None, days=None, until=until,
+                                      order_by='a.bucket, a.station_name', chunk_rows=CHUNK_ROWS,
+                                      station_index=station_index, stations=stations):
+        yield chunk_to_frame(chunk, list(station_index))
+
+def fit_pipeline_streaming(conn, cutoff, stations=None):
+    """Pass 1: MinMaxScaler.partial_fit over training-range chunks only (no validation leakage)."""
+    pipeline = FeaturePipeline()
+    n_rows = 0
+    for frame in iter_frames(conn, until=cutoff, stations=stations):
+        pipeline.partial_fit(frame)
+        n_rows += len(frame)
+    print(f"   > Scaler fitted on {n_rows} training-range rows.")
+    return pipeline
+
+def write_shards(conn, pipeline, cutoff, shard_dir, stations=None):
+    """
+    Pass 2: stream every chunk, carry the last LOOKBACK_WINDOW imputed rows of each station
+    into the next chunk, and write scaled (windows, 24, F) / (windows,) shards to disk.
+    Imputation at a chunk's trailing edge forward-fills instead of looking ahead.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    manifest = {'cutoff': cutoff.isoformat(), 'lookback': LOOKBACK_WINDOW, 'shards': []}
+    carry = None
+    target_i = pipeline.target_index
+    raw_i = [pipeline.feature_cols.index(c) for c in pipeline.raw_cols]
+
+    for n, frame in enumerate(iter_frames(conn, stations=stations)):
+        frame['is_new'] = True
+        if carry is not None:
+            frame = pd.concat([carry, frame], ignore_index=True)
+
+        df, matrix = pipeline.encode(frame)
+        scaled = pipeline.scaler.transform(matrix).astype(np.float32)
+
+        codes, _ = pd.factorize(df['station_name'])
+        is_new = df['is_new'].to_numpy(dtype=bool)
+
+        # Windows whose target row is new in this chunk and stays inside one station
+        targets = np.flatnonzero(is_new)
+        targets = targets[targets >= LOOKBACK_WINDOW]
+        targets = targets[codes[targets - LOOKBACK_WINDOW] == codes[targets]]
+
+        rows = targets[:, None] - LOOKBACK_WINDOW + np.arange(LOOKBACK_WINDOW)
+        X = scaled[rows]
+        y = scaled[targets, target_i]
+        is_train = (df['time'].iloc[targets] < cutoff).to_numpy()
+
+        for split, keep in (('train', is_train), ('val', ~is_train)):
+            if keep.any():
+                name = f"{split}-{n:05d}"
+                np.save(os.path.join(shard_dir, f"{name}.X.npy"), X[keep])
+                np.save(os.path.join(shard_dir, f"{name}.y.npy"), y[keep])
+                manifest['shards'].append({'name': name, 'split': split, 'samples': int(keep.sum())})
+
+        # Carry the last LOOKBACK_WINDOW imputed (unscaled) rows per station
+        raw = pd.DataFrame(matrix[:, raw_i], columns=pipeline.raw_cols)
+        raw.insert(0, 'time', df['time'])
+        raw.insert(1, 'station_name', df['station_name'])
+        raw['is_new'] = False
+        carry = raw.groupby('station_name', sort=False).tail(LOOKBACK_WINDOW)
+
+        print(f"   > Chunk {n}: {len(frame)} rows -> {len(targets)} windows")
+
+    with open(os.path.join(shard_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+def prepare(shard_dir=SHARD_DIR, val_fraction=VALIDATION_FRACTION, all_stations=False):
+    print("🧱 STARTING OUT-OF-CORE PREPARATION...")
+    # Same station filter as train_model.py's in-memory path
+    from train_model import SAFE_STATIONS
+    stations = None if all_stations else SAFE_STATIONS
+    if stations is not None:
+        print(f"🧐 Filtering for {len(stations)} original stations...")
+    conn = get_db_connection()
+    try:
+        first, last = archive_time_range(conn)
+        if first is None:
+            print("❌ Error: No PM2.5 data in the archive.")
+            return None
+        if first.tz is None:
+            first, last = first.tz_localize('UTC'), last.tz_localize('UTC')
+        cutoff = (first + (last - first) * (1 - val_fraction)).floor('h')
+        print(f"1. Archive {first} -> {last}. Train/validation boundary: {cutoff}")
+
+        print("2. Pass 1: streaming scaler fit...")
+        pipeline = fit_pipeline_streaming(conn, cutoff, stations)
+
+        print("3. Pass 2: writing windowed shards...")
+        manifest = write_shards(conn, pipeline, cutoff, shard_dir, stations)
+    finally:
+        conn.close()
+
+    joblib.dump(pipeline.scaler, SCALER_PATH)
+    pipeline.save(PIPELINE_PATH)
+
+    totals = {split: sum(s['samples'] for s in manifest['shards'] if s['split'] == split) for split in ('train', 'val')}
+    print(f"\n✅ Shards written to {shard_dir}: {totals['train']} train / {totals['val']} validation windows")
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Out-of-core dataset preparation for the whole archive.")
+    parser.add_argument('--out', default=SHARD_DIR, help="Shard output directory.")
+    parser.add_argument('--val-fraction', type=float, default=VALIDATION_FRACTION)
+    parser.add_argument('--all-stations', action='store_true', help="Skip the SAFE_STATIONS filter.")
+    args = parser.parse_args()
+    prepare(args.out, args.val_fraction, args.all_stations)
@@ -0,0 +1,132 @@
+# parallel_preprocess.py
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from features import (
+    FeaturePipeline, TIME_COLS, HOUR_SIN, HOUR_COS, DAY_SIN, DAY_COS,
+    segment_bounds, impute_segments
+)
+
+# --- Settings ---
+DEFAULT_WORKERS = os.cpu_count() or 1
+PARTITIONS_PER_WORKER = 4   # More partitions than workers keeps the pool balanced
+
+def _shared_array(shape, dtype):
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _attach(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _encode_partition(args):
+    """
+    Worker, phase 1: impute + time-encode rows [start, end) of the shared input
+    into the shared output. Only the row range and column min/max cross the pipe.
+    """
+    raw_spec, time_spec, out_spec, start, end, raw_pos, time_pos = args
+    raw_shm, raw = _attach(raw_spec)
+    time_shm, hour_day = _attach(time_spec)
+    out_shm, out = _attach(out_spec)
+    try:
+        codes = hour_day[start:end, 2]
+        row_start, row_end = segment_bounds(codes)
+        out[start:end, raw_pos] = impute_segments(raw[start:end], row_start, row_end)
+
+        hour, day = hour_day[start:end, 0], hour_day[start:end, 1]
+        for pos, table, idx in zip(time_pos, (HOUR_SIN, HOUR_COS, DAY_SIN, DAY_COS), (hour, hour, day, day)):
+            out[start:end, pos] = table[idx]
+
+        block = out[start:end]
+        return np.nanmin(block, axis=0), np.nanmax(block, axis=0)
+    finally:
+        del raw, hour_day, out
+        raw_shm.close(); time_shm.close(); out_shm.close()
+
+def _scale_partition(args):
+    """Worker, phase 2: in-place MinMax scaling of rows [start, end)."""
+    out_spec, start, end, scale, offset = args
+    out_shm, out = _attach(out_spec)
+    try:
+        out[start:end] *= scale
+        out[start:end] += offset
+    finally:
+        del out
+        out_shm.close()
+
+def partition_rows(station_codes, n_partitions):
+    """Splits station-sorted rows into ~equal contiguous ranges that never cut a station."""
+    n = len(station_codes)
+    boundaries = np.concatenate(([0], np.flatnonzero(np.diff(station_codes)) + 1, [n]))
+    targets = np.linspace(0, n, n_partitions + 1)[1:-1]
+    cuts = np.unique(boundaries[np.searchsorted(boundaries, targets)])
+    edges = np.unique(np.concatenate(([0], cuts, [n])))
+    return list(zip(edges[:-1], edges[1:]))
+
+def parallel_transform(df, pipeline=None, workers=DEFAULT_WORKERS):
+    """
+    Same result as FeaturePipeline.fit_transform / transform, computed by a process pool.
+    Inputs and outputs live in shared memory; workers receive only row ranges.
+    If `pipeline` is None (or unfitted) a new one is fitted from the workers' column min/max.
+    Returns (sorted_df, scaled float64 matrix, pipeline).
+    """
+    pipeline = pipeline if pipeline is not None else FeaturePipeline()
+    fit = not hasattr(pipeline.scaler, 'data_min_')
+
+    df = df.sort_values(by=['station_name', 'time'], kind='stable').reset_index(drop=True)
+    n = len(df)
+    if n == 0:
+        return df, np.empty((0, len(pipeline.feature_cols))), pipeline
+    codes, _ = pd.factorize(df['station_name'])
+    times = pd.DatetimeIndex(df['time'])
+
+    raw_pos = [pipeline.feature_cols.index(c) for c in pipeline.raw_cols]
+    time_pos = [pipeline.feature_cols.index(c) for c in TIME_COLS]
+
+    raw_shm, raw = _shared_array((n, len(raw_pos)), np.float64)
+    time_shm, hour_day = _shared_array((n, 3), np.int64)
+    out_shm, out = _shared_array((n, len(pipeline.feature_cols)), np.float64)
+    try:
+        raw[:] = df[pipeline.raw_cols].to_numpy(dtype=np.float64)
+        hour_day[:, 0] = times.hour
+        hour_day[:, 1] = times.dayofweek
+        hour_day[:, 2] = codes
+
+        specs = [(s.name, a.shape, a.dtype) for s, a in ((raw_shm, raw), (time_shm, hour_day), (out_shm, out))]
+        ranges = partition_rows(codes, max(workers, 1) * PARTITIONS_PER_WORKER)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            stats = list(pool.map(_encode_partition, [
+                (specs[0], specs[1], specs[2], start, end, raw_pos, time_pos) for start, end in ranges
+            ]))
+
+            if fit:
+                # Column-wise min/max of the partitions is all MinMaxScaler needs
+                pipeline.scaler.partial_fit(np.vstack([np.fmin.reduce([s[0] for s in stats]),
+                                                       np.fmax.reduce([s[1] for s in stats])]))
+                pipeline.learn_stations(df['station_name'], reset=True)
+
+            scale, offset = pipeline.scaler.scale_, pipeline.scaler.min_
+            list(pool.map(_scale_partition, [(specs[2], start, end, scale, offset) for start, end in ranges]))
+
+        scaled = out.copy()
+    finally:
+        del raw, hour_day, out
+        for shm in (raw_shm, time_shm, out_shm):
+            shm.close()
+            shm.unlink()
+
+    return df, scaled, pipeline
+
+def parallel_preprocess_data(df, workers=DEFAULT_WORKERS):
+    """Drop-in for preprocessor.preprocess_data() that spreads the work over `workers` processes."""
+    print(f"2. [Transform] Cleaning and Feature Engineering ({workers} workers)...")
+    df, scaled, pipeline = parallel_transform(df, workers=workers)
+    df[pipeline.feature_cols] = scaled
+    print("   > Data Scaled and Encoded.")
+    return df, pipeline
@@ -2,109 +2,223 @@
 
 import numpy as np
 import pandas as pd
-import tensorflow as tf
-import joblib
 import os
+import argparse
 from dotenv import load_dotenv
 
 # Import our data fetching logic
-from preprocessor import fetch_data, preprocess_data, FEATURE_COLS, TARGET_COL
+from preprocessor import (
+    fetch_recent, fetch_multi_pollutant_data, FORECAST_HORIZON, POLLUTANT_COLS
+)
+from features import load_pipeline
+from lite_runtime import load_lite_model
+from numpy_lstm import load_numpy_model
 
 # --- Settings ---
 MODEL_PATH = 'aeris_v1.keras'
+HORIZON_MODEL_PATH = f'aeris_v1_h{FORECAST_HORIZON}.keras'  # Used when present (train_model.py --horizon)
+GLOBAL_MODEL_PATH = 'aeris_v1_global.keras'                 # train_model.py --global-model
 SCALER_PATH = 'scaler.gz'
+PIPELINE_PATH = 'feature_pipeline.gz'
 LOOKBACK_WINDOW = 24
 
-def make_prediction():
+# First existing file wins: global multi-horizon > global > multi-horizon > next-hour
+MODEL_CANDIDATES = [
+    f'aeris_v1_global_h{FORECAST_HORIZON}.keras', GLOBAL_MODEL_PATH, HORIZON_MODEL_PATH, MODEL_PATH
+]
+
+# All-pollutant models (train_model.py --all-pollutants) and their own pipeline
+MULTI_PIPELINE_PATH = 'feature_pipeline_multi.gz'
+MULTI_MODEL_CANDIDATES = [p.replace('aeris_v1', 'aeris_v1_multi') for p in MODEL_CANDIDATES]
+
+def find_model_path(candidates=MODEL_CANDIDATES):
+    return next((p for p in candidates if os.path.exists(p)), None)
+
+def load_exported_model(path):
+    """Up-to-date export of `path` (export_model.py): NumPy engine first, then TFLite; else None."""
+    return load_numpy_model(path) or load_lite_model(path)
+
+def load_forecast_model(prefer_lite=True):
+    """
+    The richest trained model available (see MODEL_CANDIDATES).
+    Its NumPy / TFLite export is used instead when present and up to date.
+    """
+    path = find_model_path()
+    lite = load_exported_model(path) if prefer_lite else None
+    if lite is not None:
+        return lite
+    import tensorflow as tf  # Imported here: service clients and TFLite users never pay for TensorFlow
+    return tf.keras.models.load_model(path)
+
+def load_multi_pollutant_model():
+    """(model, pipeline) of the all-pollutant model, or (None, None) if it was never trained."""
+    path = find_model_path(MULTI_MODEL_CANDIDATES)
+    if path is None or not os.path.exists(MULTI_PIPELINE_PATH):
+        return None, None
+    pipeline = load_pipeline(MULTI_PIPELINE_PATH, scaler_path='')
+    lite = load_exported_model(path)
+    if lite is not None:
+        return lite, pipeline
+    # compile=False: inference only, the masked training loss is not needed
+    import tensorflow as tf
+    return tf.keras.models.load_model(path, compile=False), pipeline
+
+def forecast(model, pipeline, windows, stations=None):
+    """
+    Whole-horizon forecast in real units from one forward pass.
+    windows: scaled (24, Features) or (Stations, 24, Features).
+    stations: the window's station name(s); needed by the global model, ignored otherwise.
+    Returns (Horizon,) or (Stations, Horizon); Horizon is 1 for the next-hour model.
+    Multi-pollutant models add a trailing pollutant axis: (..., Horizon or nothing, Pollutants).
+    """
+    windows = np.asarray(windows, dtype=np.float32)
+    single = windows.ndim == 2
+    batch = windows[None] if single else windows
+    
+    if len(model.inputs) > 1:
+        names = [stations] if isinstance(stations, str) else list(stations)
+        inputs = [batch, pipeline.station_ids(names).reshape(-1, 1)]
+    else:
+        inputs = batch
+    
+    # Direct call: one graph execution, without model.predict()'s per-call dataset setup
+    scaled = np.asarray(model(inputs, training=False))
+    # One vectorized inverse-scaling for every station, hour (and pollutant)
+    if len(pipeline.targets) == 1:
+        scaled = scaled.reshape(len(scaled), -1)
+    real = pipeline.inverse_target(scaled)
+    return real[0] if single else real
+
+def latest_windows(pipeline, raw_df, lookback=LOOKBACK_WINDOW):
+    """
+    Every station's most recent window as one scaled (Stations, 24, Features) tensor.
+    Stations with less than `lookback` hours are left out. Returns (station names, windows).
+    """
+    df, scaled = pipeline.transform_array(raw_df, fill_missing=True)
+    codes, names = pd.factorize(df['station_name'])
+    
+    # Last row of each station in the station-sorted matrix
+    ends = np.flatnonzero(np.diff(np.append(codes, -1))) + 1
+    starts = np.concatenate(([0], ends[:-1]))
+    ok = ends - starts >= lookback
+    
+    rows = ends[ok][:, None] - lookback + np.arange(lookback)
+    return list(np.asarray(names)[ok]), scaled[rows]
+
+def forecast_network(model, pipeline, raw_df):
+    """
+    Forecasts every station in `raw_df` with a single batched forward pass.
+    Returns a DataFrame indexed by station_name with one column per forecast hour (+1h, +2h, ...),
+    or (pollutant, hour) columns for the multi-pollutant model.
+    """
+    names, windows = latest_windows(pipeline, raw_df)
+    return forecast_frame(model, pipeline, names, windows)
+
+def forecast_frame(model, pipeline, names, windows):
+    """forecast_network() for windows that are already built (e.g. tensor_store inference_windows())."""
+    if not names:
+        return pd.DataFrame()
+    real = forecast(model, pipeline, windows, stations=names)
+    index = pd.Index(names, name='station_name')
+    
+    if len(pipeline.targets) == 1:
+        columns = [f"+{h}h" for h in range(1, real.shape[1] + 1)]
+        return pd.DataFrame(real, index=index, columns=columns)
+    
+    # (Stations, [Horizon,] Pollutants) -> (Stations, Pollutants x Horizon)
+    real = real if real.ndim == 3 else real[:, None, :]
+    pollutant_ids = {col: pid for pid, col in POLLUTANT_COLS.items()}
+    columns = pd.MultiIndex.from_product(
+        [[pollutant_ids.get(c, c) for c in pipeline.targets], [f"+{h}h" for h in range(1, real.shape[1] + 1)]],
+        names=['pollutant', 'hour']
+    )
+    return pd.DataFrame(real.transpose(0, 2, 1).reshape(len(real), -1), index=index, columns=columns)
+
+def service_forecasts():
+    """Forecast frame from the resident forecast service (forecast_service.py), or None if it is not running."""
+    from forecast_client import predict_stations, ForecastServiceError
+    try:
+        version, forecasts = predict_stations()
+    except ForecastServiceError:
+        return None
+    if not forecasts:
+        return None
+    print(f"1. Answered by the forecast service ({version}).")
+    names = sorted(forecasts)
+    values = np.stack([forecasts[n] for n in names])
+    columns = [f"+{h}h" for h in range(1, values.shape[1] + 1)]
+    return pd.DataFrame(values, index=pd.Index(names, name='station_name'), columns=columns)
+
+def make_prediction(all_pollutants=False, local=False):
     print("🔮 STARTING FORECAST ENGINE...")
     
+    # 0. A running forecast service already holds the model and the latest windows
+    forecasts = None if (all_pollutants or local) else service_forecasts()
+    if forecasts is not None:
+        return _report(forecasts)
+    
     # 1. Load the Saved Model and Scaler
-    if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH):
-        print("❌ Error: Model or Scaler not found. Train the model first!")
-        return
+    if all_pollutants:
+        model, pipeline = load_multi_pollutant_model()
+        if model is None:
+            print("❌ Error: No all-pollutant model. Run train_model.py --all-pollutants first!")
+            return
+        print(f"1. Loaded all-pollutant model ({find_model_path(MULTI_MODEL_CANDIDATES)}).")
+    else:
+        if find_model_path() is None or not os.path.exists(SCALER_PATH):
+            print("❌ Error: Model or Scaler not found. Train the model first!")
+            return
 
-    print("1. Loading model and scaler...")
-    model = tf.keras.models.load_model(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
+        print(f"1. Loading model ({find_model_path()}) and scaler...")
+        model = load_forecast_model()
+        pipeline = load_pipeline(PIPELINE_PATH, SCALER_PATH)
     
     # 2. Get the Latest Data
-    # We need the most recent data to predict the future
-    raw_df = fetch_data()
+    # We need the most recent data to predict the future: only the last lookback (+ margin) hours per station
+    # (the all-pollutant schema has no recent-window query yet, so it still reads HISTORY_DAYS)
+    raw_df = fetch_multi_pollutant_data() if all_pollutants else fetch_recent()
     
     if raw_df.empty:
         print("❌ Error: Database is empty.")
         return
 
-    # 3. Preprocess (Cleaning & Scaling)
-    # We use the SAME scaler we trained with. Do NOT fit a new one.
-    # We perform the same steps: Imputation, Cyclical Time, etc.
+    # 3. Preprocess + 4. Latest 24 hours of EVERY station as one (Stations, 24, Features) tensor
+    # We use the SAME fitted pipeline we trained with. Do NOT fit a new one.
+    # It performs the same steps: Imputation, Cyclical Time, Scaling (gaps force-filled with 0).
+    print("2. Preparing recent data for all stations...")
     
-    # Reuse the logic from preprocessor, but we need to tweak it slightly
-    # to ensure we use the loaded scaler.
+    # 5. PREDICT! One forward pass + one inverse-scaling for the whole network
+    print("3. Running Neural Network (batched)...")
+    forecasts = forecast_network(model, pipeline, raw_df)
     
-    print("2. Preparing recent data...")
-    # A. Sort and Clean
-    df = raw_df.sort_values(by=['station_name', 'time'])
-    df[FEATURE_COLS[:6]] = df.groupby('station_name')[FEATURE_COLS[:6]].transform(
-        lambda group: group.interpolate(method='linear').ffill().bfill()
-    )
-    
-    # B. Time Encoding
-    df['hour'] = df['time'].dt.hour
-    df['day_of_week'] = df['time'].dt.dayofweek
-    df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
-    df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
-    df['day_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
-    df['day_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
-    
-    # C. Scale
-    # Important: transform() only, don't fit()
-    df[FEATURE_COLS] = scaler.transform(df[FEATURE_COLS])
-
-    # --- ADD THIS NEW LINE ---
-    df = df.fillna(0) # Force-fill any remaining gaps with 0
-    
-    # 4. Select a specific station to predict for
-    # Let's pick the first station available in the data
-    target_station = df['station_name'].unique()[0]
-    print(f"3. Targeting Station: {target_station}")
-    
-    station_data = df[df['station_name'] == target_station].copy()
-    
-    # Check if we have enough data (24 hours)
-    if len(station_data) < LOOKBACK_WINDOW:
-        print(f"❌ Not enough history for {target_station}. Need 24 hours, have {len(station_data)}.")
+    if forecasts.empty:
+        print(f"❌ Not enough history. Every station needs {LOOKBACK_WINDOW} hours.")
         return
-
-    # 5. Extract the LAST 24 hours
-    # This is our input to the model
-    last_24_hours = station_data[FEATURE_COLS].values[-LOOKBACK_WINDOW:]
-    
-    # Reshape to (1, 24, 11) because the model expects a batch
-    input_tensor = np.expand_dims(last_24_hours, axis=0)
-    
-    # 6. PREDICT!
-    print("4. Running Neural Network...")
-    scaled_prediction = model.predict(input_tensor)
-    print(f"   > Raw Model Output (Scaled): {scaled_prediction[0][0]:.4f}")
     
-    # 7. Inverse Scale (Convert back to Real AQI)
-    # This is tricky. The scaler expects 11 columns, but we only have 1 prediction.
-    # We create a "dummy" row, put our prediction in the AQI spot, and unscale it.
-    
-    dummy_row = np.zeros((1, len(FEATURE_COLS)))
-    # Find the index of our target column ('pollutant_avg')
-    target_index = FEATURE_COLS.index(TARGET_COL)
-    dummy_row[0, target_index] = scaled_prediction[0][0]
-    
-    # Inverse transform
-    unscaled_row = scaler.inverse_transform(dummy_row)
-    predicted_aqi = unscaled_row[0, target_index]
+    if all_pollutants:
+        print("\n" + "="*40)
+        print(f"🔮 NEXT-HOUR FORECAST FOR {len(forecasts)} STATIONS (all pollutants)")
+        print(forecasts.xs('+1h', axis=1, level='hour').round(2).to_string())
+        print("="*40)
+        return forecasts
     
+    return _report(forecasts)
+
+def _report(forecasts):
     print("\n" + "="*40)
-    print(f"🔮 FORECAST FOR: {target_station}")
-    print(f"💨 PREDICTED PM2.5 (Next Hour): {predicted_aqi:.2f}")
+    print(f"🔮 FORECAST FOR {len(forecasts)} STATIONS")
+    print("💨 PREDICTED PM2.5 (Next Hour):")
+    for station, value in forecasts['+1h'].items():
+        print(f"   {station:<45} {value:7.2f}")
+    if forecasts.shape[1] > 1:
+        print(f"📈 Next {forecasts.shape[1]} hours (network mean): " +
+              ", ".join(f"{v:.1f}" for v in forecasts.mean(axis=0)))
     print("="*40)
+    return forecasts
 
 if __name__ == "__main__":
-    make_prediction()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Forecast every station with the trained Aeris model.")
+    parser.add_argument('--all-pollutants', action='store_true', help="Use the multi-pollutant model.")
+    parser.add_argument('--local', action='store_true', help="Load the model here even if the forecast service is up.")
+    args = parser.parse_args()
+    make_prediction(args.all_pollutants, args.local)
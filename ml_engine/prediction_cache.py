@@ -0,0 +1,89 @@
+# prediction_cache.py
+
+import threading
+from collections import OrderedDict
+
+# --- Settings ---
+MAX_ENTRIES = 512   # ~ every station x a few model versions / data hours
+
+class PredictionCache:
+    """
+    Thread-safe LRU of forecasts keyed by (station, last feature hour, model version).
+
+    A new hour of data or a promoted model changes the key, so a stale entry is never hit;
+    it just ages out. invalidate() drops entries early, e.g. when ingestion revises hours
+    that are already cached. Concurrent misses on the same key compute it once.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, station, hour, version):
+        key = (station, hour, version)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, station, hour, version, value):
+        with self.lock:
+            self._put((station, hour, version), value)
+
+    def _put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get_or_compute(self, station, hour, version, compute):
+        """Cached value, or compute() once for all concurrent callers. None results are not cached."""
+        key = (station, hour, version)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            event = self.inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self.inflight[key] = threading.Event()
+
+        if not owner:
+            event.wait()
+            with self.lock:
+                return self.entries.get(key)
+
+        try:
+            value = compute()
+            if value is not None:
+                with self.lock:
+                    self._put(key, value)
+            return value
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            event.set()
+
+    def invalidate(self, station=None, version=None):
+        """Drops every entry (or those of one station / model version). Returns how many."""
+        with self.lock:
+            stale = [k for k in self.entries
+                     if (station is None or k[0] == station) and (version is None or k[2] == version)]
+            for key in stale:
+                del self.entries[key]
+            return len(stale)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round(self.hits / total, 3) if total else None}
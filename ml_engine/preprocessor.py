@@ -5,7 +5,6 @@ import pandas as pd
 import numpy as np
 import psycopg2
 from dotenv import load_dotenv
-from sklearn.preprocessing import MinMaxScaler
 
 # Load environment variables
 load_dotenv()
@@ -20,6 +19,8 @@ DB_PORT = os.getenv('DB_PORT')
 # --- Settings ---
 # How many past hours the model sees to predict the future
 LOOKBACK_WINDOW = 24 
+# How many future hours the multi-horizon model predicts in one forward pass
+FORECAST_HORIZON = 24
 # Feature columns we want to use
 FEATURE_COLS = [
     'temperature_celsius', 'humidity_percent', 'wind_speed_ms', # Weather
@@ -29,32 +30,284 @@ FEATURE_COLS = [
 ]
 TARGET_COL = 'pollutant_avg'
 
+# Read fetch_data() through the local on-disk feature cache (feature_cache.py).
+# Opt-in: the cache needs pyarrow (Parquet parts) and POSIX fcntl (directory lock).
+USE_FEATURE_CACHE = os.getenv('AERIS_FEATURE_CACHE', '0') == '1'
+# How far back fetch_data() looks
+HISTORY_DAYS = 30
+# 'pandas' = pull raw rows and merge in Python, 'sql' = bucket + join inside TimescaleDB
+EXTRACT_MODE = os.getenv('AERIS_EXTRACT_MODE', 'pandas')
+# Rows per round trip when streaming from the server-side cursor
+FETCH_CHUNK_ROWS = 5000
+# Extra hours fetched before an inference window, so gaps at its start can still be interpolated
+INFERENCE_MARGIN_HOURS = 6
+# Column order of the numeric block returned by fetch_arrays_sql()
+RAW_FEATURE_COLS = FEATURE_COLS[:6]
+
+# --- Multi-pollutant model ---
+# aqi_data.pollutant_id -> feature column. PM2.5 keeps its historical 'pollutant_avg' name.
+POLLUTANT_COLS = {
+    'PM2.5': 'pollutant_avg', 'PM10': 'pm10_avg', 'NO2': 'no2_avg', 'SO2': 'so2_avg',
+    'CO': 'co_avg', 'O3': 'o3_avg', 'NH3': 'nh3_avg',
+}
+POLLUTANT_ALIASES = {'OZONE': 'O3'}  # CPCB reports ozone as 'OZONE', WAQI as 'O3'
+MULTI_TARGET_COLS = list(POLLUTANT_COLS.values())
+MULTI_RAW_COLS = RAW_FEATURE_COLS[:5] + MULTI_TARGET_COLS
+MULTI_FEATURE_COLS = MULTI_RAW_COLS + FEATURE_COLS[6:]
+
+# Hourly buckets + joins done by the database. Weather duplicates are averaged, not dropped.
+BUCKETED_QUERY = """
+    WITH aqi AS (
+        SELECT time_bucket('1 hour', time)::timestamptz AS bucket, station_name,
+               AVG(pollutant_avg)::float8 AS pollutant_avg
+        FROM aqi_data
+        {time_filter} {station_filter} AND pollutant_id = 'PM2.5'
+        GROUP BY 1, 2
+    ),
+    traffic AS (
+        SELECT time_bucket('1 hour', time)::timestamptz AS bucket, station_name,
+               AVG(current_speed)::float8 AS current_speed,
+               AVG(congestion_factor)::float8 AS congestion_factor
+        FROM traffic_data
+        {time_filter} {station_filter}
+        GROUP BY 1, 2
+    ),
+    weather AS (
+        SELECT time_bucket('1 hour', time)::timestamptz AS bucket,
+               AVG(temperature_celsius)::float8 AS temperature_celsius,
+               AVG(humidity_percent)::float8 AS humidity_percent,
+               AVG(wind_speed_ms)::float8 AS wind_speed_ms
+        FROM weather_data
+        {time_filter}
+        GROUP BY 1
+    )
+    SELECT EXTRACT(EPOCH FROM a.bucket)::bigint AS epoch, a.station_name,
+           w.temperature_celsius, w.humidity_percent, w.wind_speed_ms,
+           t.current_speed, t.congestion_factor,
+           a.pollutant_avg
+    FROM aqi a
+    JOIN traffic t USING (bucket, station_name)
+    JOIN weather w USING (bucket)
+    ORDER BY {order_by}
+"""
+
+def _pollutant_ids(pollutant):
+    return [pollutant] + [alias for alias, p in POLLUTANT_ALIASES.items() if p == pollutant]
+
+# Same hourly buckets and joins as BUCKETED_QUERY, but every pollutant is pivoted into its
+# own column in one pass over aqi_data (conditional aggregates instead of 7 queries)
+MULTI_POLLUTANT_QUERY = """
+    WITH aqi AS (
+        SELECT time_bucket('1 hour', time)::timestamptz AS bucket, station_name,
+               {pivot}
+        FROM aqi_data
+        {{time_filter}} {{station_filter}} AND pollutant_id IN ({all_ids})
+        GROUP BY 1, 2
+    ),
+    traffic AS (
+        SELECT time_bucket('1 hour', time)::timestamptz AS bucket, station_name,
+               AVG(current_speed)::float8 AS current_speed,
+               AVG(congestion_factor)::float8 AS congestion_factor
+        FROM traffic_data
+        {{time_filter}} {{station_filter}}
+        GROUP BY 1, 2
+    ),
+    weather AS (
+        SELECT time_bucket('1 hour', time)::timestamptz AS bucket,
+               AVG(temperature_celsius)::float8 AS temperature_celsius,
+               AVG(humidity_percent)::float8 AS humidity_percent,
+               AVG(wind_speed_ms)::float8 AS wind_speed_ms
+        FROM weather_data
+        {{time_filter}}
+        GROUP BY 1
+    )
+    SELECT EXTRACT(EPOCH FROM a.bucket)::bigint AS epoch, a.station_name,
+           w.temperature_celsius, w.humidity_percent, w.wind_speed_ms,
+           t.current_speed, t.congestion_factor,
+           {select}
+    FROM aqi a
+    JOIN traffic t USING (bucket, station_name)
+    JOIN weather w USING (bucket)
+    ORDER BY {{order_by}}
+""".format(
+    pivot=",\n               ".join(
+        f"AVG(pollutant_avg) FILTER (WHERE pollutant_id IN ({', '.join(map(repr, _pollutant_ids(p)))}))::float8 AS {col}"
+        for p, col in POLLUTANT_COLS.items()
+    ),
+    all_ids=", ".join(repr(i) for p in POLLUTANT_COLS for i in _pollutant_ids(p)),
+    select=", ".join(f"a.{col}" for col in MULTI_TARGET_COLS),
+)
+
+# Inference fetch: only the newest `hours` hourly buckets of each requested station.
+# Each station's range starts from its own newest PM2.5 row, so every CTE is an index range
+# scan on (station_name, time) instead of a HISTORY_DAYS sweep over all stations.
+# stations = NULL means every station in the `stations` table. Stations silent for more than
+# max_age_days are left out: the shared weather range starts at the oldest `since`, so a single
+# long-dead station would otherwise drag that scan back to its last reading.
+RECENT_QUERY = """
+    WITH bounds AS (
+        SELECT s.station_name,
+               time_bucket('1 hour', last.time) - (%(hours)s - 1) * INTERVAL '1 hour' AS since
+        FROM unnest(COALESCE(%(stations)s::text[], ARRAY(SELECT station_name::text FROM stations)))
+             AS s(station_name)
+        CROSS JOIN LATERAL (
+            SELECT MAX(time) AS time FROM aqi_data
+            WHERE station_name = s.station_name AND pollutant_id = 'PM2.5'
+        ) last
+        WHERE last.time > NOW() - %(max_age_days)s * INTERVAL '1 day'
+    ),
+    aqi AS (
+        SELECT time_bucket('1 hour', d.time)::timestamptz AS bucket, d.station_name,
+               AVG(d.pollutant_avg)::float8 AS pollutant_avg
+        FROM bounds b
+        JOIN aqi_data d ON d.station_name = b.station_name AND d.time >= b.since
+        WHERE d.pollutant_id = 'PM2.5'
+        GROUP BY 1, 2
+    ),
+    traffic AS (
+        SELECT time_bucket('1 hour', d.time)::timestamptz AS bucket, d.station_name,
+               AVG(d.current_speed)::float8 AS current_speed,
+               AVG(d.congestion_factor)::float8 AS congestion_factor
+        FROM bounds b
+        JOIN traffic_data d ON d.station_name = b.station_name AND d.time >= b.since::timestamp
+        GROUP BY 1, 2
+    ),
+    weather AS (
+        SELECT time_bucket('1 hour', time)::timestamptz AS bucket,
+               AVG(temperature_celsius)::float8 AS temperature_celsius,
+               AVG(humidity_percent)::float8 AS humidity_percent,
+               AVG(wind_speed_ms)::float8 AS wind_speed_ms
+        FROM weather_data
+        WHERE time >= (SELECT MIN(since) FROM bounds)
+        GROUP BY 1
+    )
+    SELECT EXTRACT(EPOCH FROM a.bucket)::bigint AS epoch, a.station_name,
+           w.temperature_celsius, w.humidity_percent, w.wind_speed_ms,
+           t.current_speed, t.congestion_factor,
+           a.pollutant_avg
+    FROM aqi a
+    JOIN traffic t USING (bucket, station_name)
+    JOIN weather w USING (bucket)
+    ORDER BY a.station_name, a.bucket
+"""
+
 def get_db_connection():
     return psycopg2.connect(
         dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT
     )
 
-def fetch_data():
+def merge_sources(weather_df, traffic_df, aqi_df):
     """
-    Fetches data from all 3 tables and merges them into one Master DataFrame.
-    NOW WITH FILTER: Only fetches the last 14 days to avoid old trial data.
+    Floors all three sources to the hour and joins them into the Master DataFrame.
     """
-    print("1. [Extract] Fetching raw data from database (Last 14 Days)...")
-    conn = get_db_connection()
+    weather_df['time'] = pd.to_datetime(weather_df['time']).dt.floor('h')
+    weather_df = weather_df.drop_duplicates(subset=['time']).set_index('time')
+    traffic_df['time'] = pd.to_datetime(traffic_df['time']).dt.floor('h')
+    aqi_df['time'] = pd.to_datetime(aqi_df['time']).dt.floor('h')
+
+    merged_df = pd.merge(aqi_df, traffic_df, on=['time', 'station_name'], how='inner')
+    return pd.merge(merged_df, weather_df, on='time', how='inner')
+
+def _time_filter(since, days, until=None):
+    """WHERE clause + params. since=None and days=None means the whole archive."""
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("time >= %s")
+        params.append(pd.Timestamp(since).to_pydatetime())
+    elif days is not None:
+        conditions.append(f"time > NOW() - INTERVAL '{int(days)} DAYS'")
+    if until is not None:
+        conditions.append("time < %s")
+        params.append(pd.Timestamp(until).to_pydatetime())
+    return "WHERE " + (" AND ".join(conditions) or "TRUE"), tuple(params)
+
+def _rows_to_chunk(rows, station_index):
+    """(epoch, station_name, *values) rows -> one typed chunk (see iter_bucketed_chunks)."""
+    return {
+        'epoch': np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)),
+        'station_codes': np.fromiter(
+            (station_index.setdefault(r[1], len(station_index)) for r in rows),
+            dtype=np.int32, count=len(rows)
+        ),
+        # NULLs arrive as None and become NaN
+        'values': np.array([r[2:] for r in rows], dtype=np.float32),
+    }
+
+def iter_bucketed_chunks(conn, since=None, days=HISTORY_DAYS, until=None,
+                         order_by='a.station_name, a.bucket', chunk_rows=FETCH_CHUNK_ROWS,
+                         station_index=None, query=BUCKETED_QUERY, stations=None):
+    """
+    Runs BUCKETED_QUERY (or MULTI_POLLUTANT_QUERY) through a server-side (named) cursor and
+    yields typed chunks: {'epoch': int64 (n,), 'station_codes': int32 (n,), 'values': float32 (n, cols)}.
+    Station codes index into `station_index` (name -> code), which is filled as names appear.
+    stations: only these stations' aqi/traffic rows are read (default: all).
+    """
+    time_filter, filter_params = _time_filter(since, days, until)
+    station_filter = "" if stations is None else "AND station_name = ANY(%s)"
+    station_params = () if stations is None else (list(stations),)
+    query = query.format(time_filter=time_filter, station_filter=station_filter, order_by=order_by)
+    # aqi, traffic (both station-filtered) and weather CTEs, in query order
+    params = (filter_params + station_params) * 2 + filter_params
+    station_index = {} if station_index is None else station_index
     
-    # Define the time window (e.g., last 14 days)
-    time_filter = "WHERE time > NOW() - INTERVAL '30 DAYS'"
+    cursor = conn.cursor(name='aeris_bucketed_extract')
+    cursor.itersize = chunk_rows
+    try:
+        cursor.execute(query, params or None)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield _rows_to_chunk(rows, station_index)
+    finally:
+        cursor.close()
+
+def fetch_arrays_sql(conn, since=None, days=HISTORY_DAYS, query=BUCKETED_QUERY, columns=RAW_FEATURE_COLS):
+    """
+    SQL-side extraction: TimescaleDB buckets and joins the 3 tables, and the result
+    is streamed through a server-side (named) cursor straight into typed NumPy arrays.
+    Returns {'epoch': int64 (N,), 'station_codes': int32 (N,), 'stations': [names],
+             'values': float32 (N, len(columns)) in `columns` order}. Rows are sorted by station, time.
+    """
+    station_index = {}
+    chunks = list(iter_bucketed_chunks(conn, since=since, days=days, station_index=station_index, query=query))
+    
+    n_cols = len(columns)
+    return {
+        'epoch': np.concatenate([c['epoch'] for c in chunks]) if chunks else np.empty(0, dtype=np.int64),
+        'station_codes': np.concatenate([c['station_codes'] for c in chunks]) if chunks else np.empty(0, dtype=np.int32),
+        'stations': list(station_index),
+        'values': np.concatenate([c['values'] for c in chunks]) if chunks else np.empty((0, n_cols), dtype=np.float32),
+    }
+
+def arrays_to_frame(arrays, columns=RAW_FEATURE_COLS):
+    """
+    Wraps fetch_arrays_sql() output as the usual Master DataFrame
+    (float32 columns, categorical station names, UTC hourly timestamps).
+    """
+    df = pd.DataFrame(arrays['values'], columns=columns)
+    df.insert(0, 'time', pd.to_datetime(arrays['epoch'], unit='s', utc=True))
+    df.insert(1, 'station_name', pd.Categorical.from_codes(arrays['station_codes'], categories=arrays['stations']))
+    return df
+
+def fetch_range(conn, since=None, days=HISTORY_DAYS, mode=None):
+    """
+    Fetches and merges all 3 tables for either the last `days` days,
+    or (when `since` is given) every row at or after `since`.
+    """
+    if (mode or EXTRACT_MODE) == 'sql':
+        return arrays_to_frame(fetch_arrays_sql(conn, since=since, days=days))
+    
+    time_filter, params = _time_filter(since, days)
+    params = params or None
     
     # 1. Fetch Weather
     weather_query = f"SELECT time, temperature_celsius, humidity_percent, wind_speed_ms FROM weather_data {time_filter}"
-    weather_df = pd.read_sql(weather_query, conn)
-    weather_df['time'] = pd.to_datetime(weather_df['time']).dt.floor('H')
-    weather_df = weather_df.drop_duplicates(subset=['time']).set_index('time')
+    weather_df = pd.read_sql(weather_query, conn, params=params)
 
     # 2. Fetch Traffic
     traffic_query = f"SELECT time, station_name, current_speed, congestion_factor FROM traffic_data {time_filter}"
-    traffic_df = pd.read_sql(traffic_query, conn)
-    traffic_df['time'] = pd.to_datetime(traffic_df['time']).dt.floor('H')
+    traffic_df = pd.read_sql(traffic_query, conn, params=params)
     
     # 3. Fetch AQI
     aqi_query = f"""
@@ -62,56 +315,137 @@ def fetch_data():
         FROM aqi_data 
         {time_filter} AND pollutant_id = 'PM2.5'
     """
-    aqi_df = pd.read_sql(aqi_query, conn)
-    aqi_df['time'] = pd.to_datetime(aqi_df['time']).dt.floor('H')
-
-    conn.close()
+    aqi_df = pd.read_sql(aqi_query, conn, params=params)
 
     # --- MERGE ---
-    # (Rest of the code remains exactly the same...)
-    merged_df = pd.merge(aqi_df, traffic_df, on=['time', 'station_name'], how='inner')
-    master_df = pd.merge(merged_df, weather_df, on='time', how='inner')
+    return merge_sources(weather_df, traffic_df, aqi_df)
+
+def pivot_pollutants(aqi_df):
+    """Long aqi_data rows -> one row per (hour, station) with a column per pollutant."""
+    aqi_df = aqi_df.copy()
+    aqi_df['time'] = pd.to_datetime(aqi_df['time']).dt.floor('h')
+    aqi_df['pollutant_id'] = aqi_df['pollutant_id'].replace(POLLUTANT_ALIASES).map(POLLUTANT_COLS)
+    wide = aqi_df.pivot_table(index=['time', 'station_name'], columns='pollutant_id',
+                              values='pollutant_avg', aggfunc='mean')
+    return wide.reindex(columns=MULTI_TARGET_COLS).reset_index().rename_axis(columns=None)
+
+def fetch_multi_pollutant_data(days=HISTORY_DAYS, mode=None):
+    """
+    Master DataFrame with every tracked pollutant as its own column (MULTI_RAW_COLS).
+    'sql' mode runs MULTI_POLLUTANT_QUERY: one pass over aqi_data, pivoted by the database.
+    (Not served by the feature cache, which holds the PM2.5 schema.)
+    """
+    print(f"1. [Extract] Fetching all pollutants from database (Last {days} Days)...")
+    conn = get_db_connection()
+    try:
+        if (mode or EXTRACT_MODE) == 'sql':
+            arrays = fetch_arrays_sql(conn, days=days, query=MULTI_POLLUTANT_QUERY, columns=MULTI_RAW_COLS)
+            master_df = arrays_to_frame(arrays, columns=MULTI_RAW_COLS)
+        else:
+            time_filter, _ = _time_filter(None, days)
+            weather_df = pd.read_sql(
+                f"SELECT time, temperature_celsius, humidity_percent, wind_speed_ms FROM weather_data {time_filter}", conn)
+            traffic_df = pd.read_sql(
+                f"SELECT time, station_name, current_speed, congestion_factor FROM traffic_data {time_filter}", conn)
+            aqi_df = pd.read_sql(
+                f"SELECT time, station_name, pollutant_id, pollutant_avg FROM aqi_data {time_filter}", conn)
+            master_df = merge_sources(weather_df, traffic_df, pivot_pollutants(aqi_df))
+    finally:
+        conn.close()
     
     print(f"   > Merged Data Shape: {master_df.shape}")
     return master_df
 
-def preprocess_data(df):
+def fetch_data(use_cache=USE_FEATURE_CACHE, days=HISTORY_DAYS, mode=None):
     """
-    Cleans, encodes time, and scales the data.
+    Fetches data from all 3 tables and merges them into one Master DataFrame.
+    NOW WITH FILTER: Only fetches the last 30 days to avoid old trial data.
+    With the feature cache on, only the newest hours are queried from the DB.
     """
-    print("2. [Transform] Cleaning and Feature Engineering...")
-    
-    # A. Sort by Station and Time
-    df = df.sort_values(by=['station_name', 'time'])
+    print(f"1. [Extract] Fetching raw data from database (Last {days} Days)...")
     
-    # B. Imputation (Fill missing values)
-    # We interpolate strictly within each station's data group
-    df[FEATURE_COLS[:6]] = df.groupby('station_name')[FEATURE_COLS[:6]].transform(
-        lambda group: group.interpolate(method='linear').ffill().bfill()
-    )
+    master_df = None
+    if use_cache:
+        try:
+            from feature_cache import FeatureCache
+            master_df = FeatureCache().fetch(days=days, mode=mode)
+        except ImportError as e:
+            print(f"   ⚠️ Feature cache unavailable ({e}). Falling back to a full fetch.")
     
-    # C. Time Encoding (Cyclical Features)
-    df['hour'] = df['time'].dt.hour
-    df['day_of_week'] = df['time'].dt.dayofweek
+    if master_df is None:
+        conn = get_db_connection()
+        master_df = fetch_range(conn, days=days, mode=mode)
+        conn.close()
     
-    # Sine/Cosine encoding
-    df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
-    df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
-    df['day_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
-    df['day_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
+    print(f"   > Merged Data Shape: {master_df.shape}")
+    return master_df
+
+def fetch_recent(stations=None, lookback=LOOKBACK_WINDOW, margin=INFERENCE_MARGIN_HOURS, conn=None):
+    """
+    Inference counterpart of fetch_data(): the newest `lookback + margin` hourly rows of each
+    station in `stations` (default: all), e.g. ~30 rows for one station instead of 30 days of
+    every station. Same columns as fetch_data(); rows sorted by station, time.
+    Stations without a reading in the last HISTORY_DAYS are skipped.
+    """
+    hours = lookback + margin
+    own_conn = conn is None
+    conn = get_db_connection() if own_conn else conn
+    try:
+        cursor = conn.cursor()
+        cursor.execute(RECENT_QUERY, {'stations': None if stations is None else list(stations), 'hours': hours,
+                                      'max_age_days': HISTORY_DAYS})
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        if own_conn:
+            conn.close()
+
+    if not rows:
+        return arrays_to_frame({'epoch': np.empty(0, dtype=np.int64), 'station_codes': np.empty(0, dtype=np.int32),
+                                'stations': [], 'values': np.empty((0, len(RAW_FEATURE_COLS)), dtype=np.float32)})
+    station_index = {}
+    master_df = arrays_to_frame({**_rows_to_chunk(rows, station_index), 'stations': list(station_index)})
+    return master_df.groupby('station_name', observed=True, sort=False).tail(hours).reset_index(drop=True)
+
+# Newest hour for which a station has all three sources (what its newest feature row would be)
+LATEST_HOUR_QUERY = """
+    SELECT date_trunc('hour', LEAST(
+        (SELECT MAX(time) FROM aqi_data WHERE station_name = %(station)s AND pollutant_id = 'PM2.5'),
+        (SELECT MAX(time) FROM traffic_data WHERE station_name = %(station)s)::timestamptz,
+        (SELECT MAX(time) FROM weather_data)
+    ))
+"""
+
+def latest_feature_hour(conn, station_name):
+    """Three index lookups instead of a fetch: the hour a forecast for this station depends on (None if no data)."""
+    cursor = conn.cursor()
+    cursor.execute(LATEST_HOUR_QUERY, {'station': station_name})
+    hour = cursor.fetchone()[0]
+    cursor.close()
+    return hour
+
+def preprocess_data(df):
+    """
+    Cleans, encodes time, and scales the data.
+    Returns (clean_df, pipeline). The fitted FeaturePipeline (features.py) holds the
+    scaler and is reused as-is by predict.py and the dashboard.
+    """
+    from features import FeaturePipeline
+
+    print("2. [Transform] Cleaning and Feature Engineering...")
     
-    # D. Scaling (0 to 1)
-    # We will fit the scaler now. In a real app, you save this scaler to a file to use later.
-    scaler = MinMaxScaler()
-    df[FEATURE_COLS] = scaler.fit_transform(df[FEATURE_COLS])
+    # A. Sort by Station and Time, B. Per-station imputation, C. Time encoding, D. Scaling (0 to 1)
+    # All four steps run vectorized inside the pipeline (no per-station Python loops).
+    pipeline = FeaturePipeline()
+    df = pipeline.fit_transform(df)
     
     print("   > Data Scaled and Encoded.")
-    return df, scaler
+    return df, pipeline
 
-def create_sequences(df):
+def create_sequences(df, horizon=1):
     """
     Creates sliding windows for LSTM.
-    Input: (Samples, 24, Features) -> Output: (Samples, 1)
+    Input: (Samples, 24, Features) -> Output: (Samples,) or, with horizon > 1, (Samples, horizon)
     """
     print("3. [Sequence] Creating LSTM Windows...")
     
@@ -132,14 +466,58 @@ def create_sequences(df):
         target_values = station_data[TARGET_COL].values
         
         # Sliding Window Loop
-        for i in range(len(data_values) - LOOKBACK_WINDOW):
+        for i in range(len(data_values) - LOOKBACK_WINDOW - horizon + 1):
             # Input: Past 24 hours
             X_sequences.append(data_values[i : i + LOOKBACK_WINDOW])
-            # Output: The NEXT hour's pollution level
-            y_targets.append(target_values[i + LOOKBACK_WINDOW])
+            # Output: The NEXT hour's pollution level (or the next `horizon` hours)
+            if horizon == 1:
+                y_targets.append(target_values[i + LOOKBACK_WINDOW])
+            else:
+                y_targets.append(target_values[i + LOOKBACK_WINDOW : i + LOOKBACK_WINDOW + horizon])
             
     return np.array(X_sequences), np.array(y_targets)
 
+def build_base_arrays(df, horizon=1, feature_cols=FEATURE_COLS, target_cols=(TARGET_COL,)):
+    """
+    Packs the preprocessed frame into flat float32 arrays for streaming windows.
+    Instead of materializing every (24, Features) window, we keep one copy of the
+    raw table plus the start index of each valid window (with room for `horizon` targets).
+    Targets are (Rows,) for one target column, (Rows, Targets) for several.
+    """
+    print("3. [Sequence] Building base arrays for streaming windows...")
+    
+    df = df.sort_values(by=['station_name', 'time'])
+    
+    features = df[list(feature_cols)].to_numpy(dtype=np.float32)
+    targets = df[list(target_cols)].to_numpy(dtype=np.float32)
+    if targets.shape[1] == 1:
+        targets = targets[:, 0]
+    times = pd.DatetimeIndex(df['time'])
+    times = (times.tz_convert('UTC').tz_localize(None) if times.tz is not None else times).values
+    
+    station_codes, stations = pd.factorize(df['station_name'])
+    starts = window_starts(station_codes, horizon=horizon)
+    
+    return {'features': features, 'targets': targets, 'times': times, 'starts': starts,
+            'station_codes': station_codes.astype(np.int32), 'stations': list(stations)}
+
+def window_starts(station_codes, lookback=LOOKBACK_WINDOW, horizon=1):
+    """
+    Start index of every window (lookback rows + `horizon` target rows) in station-sorted rows.
+    Window starts never cross a station boundary (same rule as create_sequences).
+    """
+    n = len(station_codes)
+    boundaries = np.flatnonzero(np.diff(station_codes)) + 1
+    seg_starts = np.concatenate(([0], boundaries))
+    seg_ends = np.concatenate((boundaries, [n]))
+    
+    starts = [
+        np.arange(seg_start, seg_end - lookback - horizon + 1, dtype=np.int64)
+        for seg_start, seg_end in zip(seg_starts, seg_ends)
+        if seg_end - seg_start >= lookback + horizon
+    ]
+    return np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+
 if __name__ == "__main__":
     # 1. Get Raw Data
     raw_df = fetch_data()
@@ -148,7 +526,7 @@ if __name__ == "__main__":
         print("❌ Error: Not enough intersecting data found. Keep collecting data!")
     else:
         # 2. Preprocess
-        clean_df, scaler = preprocess_data(raw_df)
+        clean_df, pipeline = preprocess_data(raw_df)
         
         # 3. Sequence
         X, y = create_sequences(clean_df)
@@ -0,0 +1,15 @@
+# schema.py
+# Table definitions shared by the ML jobs and utils/create_tables.py.
+# Keep this module free of imports: the setup script loads it without the ML dependencies.
+
+FORECAST_LOGS_DDL = """
+    CREATE TABLE IF NOT EXISTS forecast_logs (
+        issued_at TIMESTAMPTZ NOT NULL,
+        station_name TEXT NOT NULL,
+        target_hour TIMESTAMPTZ NOT NULL,
+        lead_hours INTEGER NOT NULL,
+        predicted_aqi DOUBLE PRECISION,
+        model_version TEXT NOT NULL,
+        PRIMARY KEY (target_hour, station_name, lead_hours, model_version)
+    );
+"""
@@ -0,0 +1,175 @@
+# stateful_lstm.py
+
+import numpy as np
+import pandas as pd
+
+from preprocessor import LOOKBACK_WINDOW
+
+# --- Settings ---
+RING_HOURS = 48             # Per-station (row, h, c) history kept for rewinding on late corrections
+RESYNC_HOURS = 24 * 7       # Rebuild from a plain 24-hour window at least this often (see StatefulForecaster)
+CORRECTION_TOLERANCE = 1e-6 # Scaled-feature change that counts as a corrected row
+
+class StationState:
+    """
+    One station's recent history as parallel arrays (oldest first, at most `ring_hours` long):
+    hour (int64 ns), scaled row, and the LSTM state (h, c) AFTER that row. The last entry is the live state.
+    """
+
+    def __init__(self, ring_hours, hours, rows, hs, cs):
+        self.ring_hours = ring_hours
+        self.hours, self.rows, self.hs, self.cs = hours, rows, hs, cs
+        self.steps_since_sync = 0
+        self._trim()
+
+    def _trim(self):
+        self.hours, self.rows = self.hours[-self.ring_hours:], self.rows[-self.ring_hours:]
+        self.hs, self.cs = self.hs[-self.ring_hours:], self.cs[-self.ring_hours:]
+
+    def extend(self, hours, rows, hs, cs):
+        self.hours = np.concatenate([self.hours, hours])
+        self.rows = np.concatenate([self.rows, rows])
+        self.hs = np.concatenate([self.hs, hs])
+        self.cs = np.concatenate([self.cs, cs])
+        self._trim()
+
+    def rewind(self, k):
+        """Drops every entry from position k on (the state goes back to just after entry k - 1)."""
+        self.hours, self.rows, self.hs, self.cs = self.hours[:k], self.rows[:k], self.hs[:k], self.cs[:k]
+
+    @property
+    def h(self):
+        return self.hs[-1]
+
+    @property
+    def last_hour(self):
+        return self.hours[-1]
+
+class StatefulForecaster:
+    """
+    Incremental serving on top of numpy_lstm.NumpyLSTM: every station keeps its LSTM (h, c),
+    and each new hour of features costs one recurrence step instead of a 24-step window.
+
+    The model was trained on 24-hour windows started from a zero state, while a streamed state
+    has seen every hour since its last sync. The forget gates make the two converge, and a
+    full-window rebuild every RESYNC_HOURS (or when a correction reaches past the ring)
+    keeps the drift bounded; `stats['resync_drift']` reports it in real units.
+    """
+
+    def __init__(self, engine, pipeline, lookback=LOOKBACK_WINDOW, ring_hours=RING_HOURS,
+                 resync_hours=RESYNC_HOURS):
+        self.engine = engine
+        self.pipeline = pipeline
+        self.lookback = lookback
+        self.ring_hours = ring_hours
+        self.resync_hours = resync_hours
+        self.stations = {}
+        self.stats = {'steps': 0, 'replayed': 0, 'synced': 0, 'resync_drift': None}
+
+    # --- Planning: what each station needs for the newly fetched rows ---
+    def _plan(self, state, hours, rows):
+        """
+        (start h, start c, hours to step, rows to step) for one station, or None if it must be
+        rebuilt from a window. The fetched rows are lined up with the ring: the first hour that
+        changed, vanished or was inserted late rewinds the state to just before it.
+        """
+        if state is None or state.steps_since_sync >= self.resync_hours:
+            return None
+
+        ring_hours, ring_rows = state.hours, state.rows
+        i0 = np.searchsorted(hours, ring_hours[0])
+        seg_hours, seg_rows = hours[i0:i0 + len(ring_hours)], rows[i0:i0 + len(ring_hours)]
+
+        same = np.zeros(len(ring_hours), dtype=bool)
+        same[:len(seg_hours)] = (seg_hours == ring_hours[:len(seg_hours)]) & (
+            np.abs(seg_rows - ring_rows[:len(seg_hours)]).max(axis=1) <= CORRECTION_TOLERANCE
+        )
+        k = len(ring_hours) if same.all() else int(np.argmin(same))
+        if k == 0:
+            return None  # Correction older than the ring: rebuild
+        if k < len(ring_hours):
+            state.rewind(k)
+            state.steps_since_sync = max(0, state.steps_since_sync - (len(ring_hours) - k))
+            self.stats['replayed'] += len(ring_hours) - k
+
+        new = hours > state.last_hour
+        return state.hs[-1], state.cs[-1], hours[new], rows[new]
+
+    # --- Updating ---
+    def sync(self, names, windows, hours):
+        """Rebuilds stations from their latest windows: (N, lookback, F) rows and (N, lookback) hours."""
+        if not names:
+            return
+        hs, cs = self.engine.run(windows, return_sequences=True)   # (lookback, N, Units) each
+        for j, name in enumerate(names):
+            old = self.stations.get(name)
+            state = StationState(self.ring_hours, hours[j], windows[j], hs[:, j], cs[:, j])
+            self.stations[name] = state
+            if old is not None and old.last_hour == state.last_hour:
+                drift = np.abs(self._real([old.h], [name]) - self._real([state.h], [name])).max()
+                self.stats['resync_drift'] = float(drift)
+        self.stats['synced'] += len(names)
+
+    def update(self, df, scaled):
+        """
+        Consumes a pipeline.transform_array() result (station-sorted frame + scaled rows):
+        new hours are stepped, corrected hours replayed, stale or unknown stations re-synced.
+        Stations with fewer than `lookback` rows are left out.
+        """
+        codes, names = pd.factorize(df['station_name'])
+        # int64 ns (UTC): tz-aware to_numpy() would build one Timestamp object per row
+        hours = pd.DatetimeIndex(df['time']).floor('h').as_unit('ns').asi8
+        ends = np.flatnonzero(np.diff(np.append(codes, -1))) + 1
+        starts = np.concatenate(([0], ends[:-1]))
+
+        to_sync, pending = [], []
+        for name, start, end in zip(names, starts, ends):
+            plan = self._plan(self.stations.get(name), hours[start:end], scaled[start:end])
+            if plan is None:
+                if end - start >= self.lookback:
+                    to_sync.append((name, end))
+                else:
+                    self.stations.pop(name, None)
+            elif len(plan[2]):
+                pending.append((name,) + plan)
+
+        # Re-synced stations: one batched window pass
+        rows = np.array([end for _, end in to_sync], dtype=np.int64)[:, None] - self.lookback + np.arange(self.lookback)
+        self.sync([name for name, _ in to_sync], scaled[rows], hours[rows])
+
+        # Streaming stations: step k of every station that has a k-th new row, as one batch
+        if not pending:
+            return
+        h = np.stack([p[1] for p in pending])
+        c = np.stack([p[2] for p in pending])
+        lengths = np.array([len(p[3]) for p in pending])
+        steps_h, steps_c = [], []
+        for k in range(lengths.max()):
+            sel = np.flatnonzero(lengths > k)
+            h[sel], c[sel] = self.engine.step(np.stack([pending[j][4][k] for j in sel]), h[sel], c[sel])
+            steps_h.append(h.copy())
+            steps_c.append(c.copy())
+            self.stats['steps'] += len(sel)
+
+        # (Steps, Stations, Units): station j's states are the first lengths[j] steps
+        steps_h, steps_c = np.stack(steps_h), np.stack(steps_c)
+        for j, (name, _, _, new_hours, new_rows) in enumerate(pending):
+            state = self.stations[name]
+            state.extend(new_hours, new_rows, steps_h[:lengths[j], j], steps_c[:lengths[j], j])
+            state.steps_since_sync += lengths[j]
+
+    # --- Forecasting ---
+    def _real(self, hs, names):
+        ids = self.pipeline.station_ids(list(names)) if self.engine.embedding is not None else None
+        scaled = self.engine.head(np.stack(hs), ids)
+        if len(self.pipeline.targets) == 1:
+            scaled = scaled.reshape(len(scaled), -1)
+        return self.pipeline.inverse_target(scaled)
+
+    def forecast(self, names=None):
+        """(station names, real-unit forecasts (N, Horizon[, Pollutants]), last consumed hour per station)."""
+        names = [n for n in (self.stations if names is None else names) if n in self.stations]
+        if not names:
+            return [], np.empty((0,)), []
+        states = [self.stations[n] for n in names]
+        return names, self._real([s.h for s in states], names), [pd.Timestamp(s.last_hour, tz='UTC') for s in states]
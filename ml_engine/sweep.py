@@ -0,0 +1,201 @@
+# sweep.py
+
+import os
+import json
+import time
+import random
+import argparse
+import itertools
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from preprocessor import fetch_data, preprocess_data, build_base_arrays, window_starts, FEATURE_COLS
+
+# --- Settings ---
+CACHE_DIR = os.getenv(
+    'AERIS_SWEEP_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sweep_cache')
+)
+RESULTS_PATH = 'sweep_results.csv'
+SWEEP_EPOCHS = 20
+GRACE_EPOCHS = 3             # Never prune a trial before this many epochs
+MIN_TRIALS_TO_PRUNE = 3      # Need this many peers at an epoch before comparing against their median
+
+# Production values are in every list (LSTM(50), Dropout(0.2), BATCH_SIZE=16, LOOKBACK_WINDOW=24)
+DEFAULT_GRID = {
+    'units': [32, 50, 64],
+    'dropout': [0.1, 0.2, 0.3],
+    'batch_size': [16, 64],
+    'lookback': [12, 24, 48],
+    'learning_rate': [1e-3],
+}
+
+# --- Dataset cache (built once, memory-mapped by every worker) ---
+CACHE_ARRAYS = ['features', 'targets', 'times', 'station_codes']
+
+def build_cache(cache_dir=CACHE_DIR):
+    """Fetch + preprocess once and write the flat base arrays as .npy files."""
+    from train_model import SAFE_STATIONS
+
+    print("📦 Building sweep dataset cache...")
+    raw_df = fetch_data()
+    raw_df = raw_df[raw_df['station_name'].isin(SAFE_STATIONS)]
+    clean_df, _ = preprocess_data(raw_df)
+    base = build_base_arrays(clean_df)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    for name in CACHE_ARRAYS:
+        np.save(os.path.join(cache_dir, f"{name}.npy"), base[name])
+    with open(os.path.join(cache_dir, 'meta.json'), 'w') as f:
+        json.dump({'rows': len(base['targets']), 'built_at': pd.Timestamp.now().isoformat()}, f)
+    print(f"   > Cached {len(base['targets'])} rows to {cache_dir}")
+
+def load_cache(cache_dir=CACHE_DIR):
+    return {name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode='r') for name in CACHE_ARRAYS}
+
+# --- Worker side ---
+def _pin_threads(threads):
+    """Pool initializer: every worker's TensorFlow gets exactly `threads` compute threads."""
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def _memmap_dataset(tf, base, starts, lookback, batch_size, shuffle):
+    """Windows gathered straight from the memory-mapped cache (pages shared by all workers)."""
+    features, targets = base['features'], base['targets']
+    offsets = np.arange(lookback)
+
+    def generator():
+        order = np.random.permutation(starts) if shuffle else starts
+        for i in range(0, len(order), batch_size):
+            batch = np.sort(order[i:i + batch_size])
+            yield features[batch[:, None] + offsets], targets[batch + lookback]
+
+    signature = (
+        tf.TensorSpec(shape=(None, lookback, features.shape[1]), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.float32),
+    )
+    return tf.data.Dataset.from_generator(generator, output_signature=signature).prefetch(tf.data.AUTOTUNE)
+
+def _median_stopping(tf, trial_id, epoch_losses, lock):
+    """Stops a trial whose val_loss is worse than the median of its peers at the same epoch."""
+
+    class MedianStopping(tf.keras.callbacks.Callback):
+        pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            val_loss = float(logs['val_loss'])
+            with lock:
+                peers = list(epoch_losses.get(epoch, []))
+                epoch_losses[epoch] = peers + [val_loss]
+            if epoch + 1 >= GRACE_EPOCHS and len(peers) >= MIN_TRIALS_TO_PRUNE and val_loss > np.median(peers):
+                print(f"   ✂️ Trial {trial_id} pruned at epoch {epoch + 1} (val_loss {val_loss:.5f} > median {np.median(peers):.5f})")
+                self.pruned = True
+                self.model.stop_training = True
+
+    return MedianStopping()
+
+def run_trial(trial_id, config, cache_dir, epochs, epoch_losses, lock):
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from train_model import build_model
+    from window_dataset import split_by_time
+
+    started = time.time()
+    base = load_cache(cache_dir)
+    lookback = config['lookback']
+    starts = window_starts(base['station_codes'], lookback)
+    train_starts, val_starts, _ = split_by_time(base, starts=starts, lookback=lookback)
+
+    train_ds = _memmap_dataset(tf, base, train_starts, lookback, config['batch_size'], shuffle=True)
+    val_ds = _memmap_dataset(tf, base, val_starts, lookback, 256, shuffle=False)
+
+    model = build_model((lookback, len(FEATURE_COLS)), units=config['units'],
+                        dropout=config['dropout'], learning_rate=config['learning_rate'])
+    pruner = _median_stopping(tf, trial_id, epoch_losses, lock)
+    early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    history = model.fit(train_ds, validation_data=val_ds, epochs=epochs,
+                        callbacks=[early_stop, pruner], verbose=0)
+
+    best = int(np.argmin(history.history['val_loss']))
+    return {
+        'trial': trial_id, **config,
+        'best_val_loss': history.history['val_loss'][best],
+        'best_val_mae': history.history['val_mae'][best],
+        'best_epoch': best + 1,
+        'epochs_run': len(history.history['val_loss']),
+        'pruned': pruner.pruned,
+        'seconds': round(time.time() - started, 1),
+    }
+
+# --- Driver ---
+def expand_grid(grid, max_trials=None, seed=0):
+    keys = list(grid)
+    configs = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    if max_trials and max_trials < len(configs):
+        configs = random.Random(seed).sample(configs, max_trials)
+    return configs
+
+def run_sweep(grid=DEFAULT_GRID, workers=2, threads_per_worker=None, epochs=SWEEP_EPOCHS,
+              max_trials=None, cache_dir=CACHE_DIR, results_path=RESULTS_PATH):
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    # Children inherit these before TensorFlow is imported (covers the oneDNN/OpenMP pools)
+    os.environ['OMP_NUM_THREADS'] = str(threads_per_worker)
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads_per_worker)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+
+    configs = expand_grid(grid, max_trials)
+    print(f"🧪 SWEEP: {len(configs)} trials | {workers} workers x {threads_per_worker} threads | {epochs} epochs max")
+
+    ctx = multiprocessing.get_context('spawn')  # fresh TensorFlow runtime per worker
+    results = []
+    with ctx.Manager() as manager:
+        epoch_losses, lock = manager.dict(), manager.Lock()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_pin_threads, initargs=(threads_per_worker,)) as pool:
+            futures = {
+                pool.submit(run_trial, i, config, cache_dir, epochs, epoch_losses, lock): i
+                for i, config in enumerate(configs)
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"   ❌ Trial {futures[future]} failed: {e}")
+                    continue
+                results.append(result)
+                print(f"   ✓ Trial {result['trial']}: val_loss {result['best_val_loss']:.5f} "
+                      f"({result['epochs_run']} epochs, {result['seconds']}s{', pruned' if result['pruned'] else ''})")
+
+    if not results:
+        print("❌ No trial finished.")
+        return pd.DataFrame()
+
+    ranked = pd.DataFrame(results).sort_values('best_val_loss').reset_index(drop=True)
+    ranked.insert(0, 'rank', ranked.index + 1)
+    ranked.to_csv(results_path, index=False)
+    print(f"\n🏆 RESULTS (saved to {results_path})")
+    print(ranked.head(10).to_string(index=False))
+    return ranked
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel CPU hyperparameter sweep for the Aeris LSTM.")
+    parser.add_argument('--grid', default=None, help="JSON file mapping parameter -> list of values.")
+    parser.add_argument('--max-trials', type=int, default=None, help="Random sample of the grid.")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads-per-worker', type=int, default=None)
+    parser.add_argument('--epochs', type=int, default=SWEEP_EPOCHS)
+    parser.add_argument('--refresh', action='store_true', help="Rebuild the dataset cache from the DB.")
+    args = parser.parse_args()
+
+    if args.refresh or not os.path.exists(os.path.join(CACHE_DIR, 'meta.json')):
+        build_cache()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = {**DEFAULT_GRID, **json.load(f)}
+
+    run_sweep(grid, args.workers, args.threads_per_worker, args.epochs, args.max_trials)
@@ -0,0 +1,194 @@
+# synthetic_data.py
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# --- Settings ---
+DEFAULT_STATIONS = 10
+DEFAULT_DAYS = 30
+DEFAULT_END = '2024-01-31 00:00:00+05:30'   # Fixed, so the same seed always gives the same tables
+MISSING_RATE = 0.03                         # Share of station-hours with no AQI/traffic row
+NULL_RATE = 0.01                            # Share of rows whose value arrives as NULL
+BENCH_DSN_ENV = 'AERIS_BENCH_DSN'           # Scratch database for --load / benchmark.py --backend postgres
+# Other pollutants as (scale vs. PM2.5, noise); ozone uses the CPCB id
+POLLUTANT_PROFILES = {
+    'PM10': (1.8, 8.0), 'NO2': (0.6, 4.0), 'SO2': (0.2, 2.0),
+    'CO': (0.02, 0.1), 'OZONE': (0.5, 5.0), 'NH3': (0.1, 1.0),
+}
+
+def _hours(days, end):
+    end = pd.Timestamp(end).floor('h')
+    return pd.date_range(end=end, periods=days * 24, freq='h')
+
+def station_names(n_stations):
+    return [f"Synthetic Station {i:03d}" for i in range(n_stations)]
+
+def generate_sources(n_stations=DEFAULT_STATIONS, days=DEFAULT_DAYS, seed=0, end=DEFAULT_END,
+                     all_pollutants=False):
+    """
+    Deterministic stand-ins for the three raw tables, with the same columns the
+    fetchers write: (weather_df, traffic_df, aqi_df).
+    Timestamps carry a few minutes of jitter like the real API calls, some
+    station-hours are missing and some values are NULL, so imputation has work to do.
+    all_pollutants=True adds the other POLLUTANT_PROFILES rows to aqi_df (PM2.5 rows are unchanged).
+    """
+    rng = np.random.default_rng(seed)
+    hours = _hours(days, end)
+    n_hours = len(hours)
+    hour_of_day = hours.hour.to_numpy()
+    daily = np.sin(2 * np.pi * (hour_of_day - 9) / 24)
+    rush = np.exp(-((hour_of_day - 9) ** 2) / 4) + np.exp(-((hour_of_day - 19) ** 2) / 4)
+
+    # --- Weather: one city-wide row per hour ---
+    jitter = pd.to_timedelta(rng.integers(0, 5, n_hours), unit='min')
+    weather_df = pd.DataFrame({
+        'time': hours + jitter,
+        'temperature_celsius': 24 + 5 * daily + rng.normal(0, 0.8, n_hours),
+        'humidity_percent': np.clip(65 - 15 * daily + rng.normal(0, 4, n_hours), 10, 100),
+        'wind_speed_ms': np.abs(2.5 + 1.5 * daily + rng.normal(0, 0.7, n_hours)),
+        'conditions_text': rng.choice(['Clear', 'Clouds', 'Haze', 'Rain'], n_hours, p=[0.4, 0.35, 0.2, 0.05]),
+    })
+
+    # --- Traffic + AQI: one row per station-hour (minus gaps) ---
+    names = station_names(n_stations)
+    station = np.repeat(np.arange(n_stations), n_hours)
+    hour_idx = np.tile(np.arange(n_hours), n_stations)
+    keep = rng.random(len(station)) >= MISSING_RATE
+    station, hour_idx = station[keep], hour_idx[keep]
+    n = len(station)
+
+    free_flow = rng.uniform(35, 55, n_stations)[station]
+    congestion = np.clip(0.15 + 0.5 * rush[hour_idx] + rng.normal(0, 0.05, n), 0, 0.95)
+    current_speed = free_flow * (1 - congestion)
+
+    baseline = rng.uniform(25, 70, n_stations)[station]
+    wind = weather_df['wind_speed_ms'].to_numpy()[hour_idx]
+    pm25 = np.clip(baseline * (1 + 0.8 * congestion) - 4 * wind + rng.normal(0, 3, n), 2, None)
+
+    times = hours[hour_idx]
+    traffic_df = pd.DataFrame({
+        'time': (times + pd.to_timedelta(rng.integers(0, 3, n), unit='min')).tz_localize(None),
+        'station_name': np.asarray(names, dtype=object)[station],
+        'current_speed': current_speed,
+        'free_flow_speed': free_flow,
+        'congestion_factor': congestion,
+    })
+    aqi_df = pd.DataFrame({
+        'time': times,
+        'station_name': np.asarray(names, dtype=object)[station],
+        'pollutant_id': 'PM2.5',
+        'pollutant_avg': pm25,
+    })
+
+    for df, col in ((traffic_df, 'current_speed'), (aqi_df, 'pollutant_avg'), (weather_df, 'humidity_percent')):
+        df.loc[rng.random(len(df)) < NULL_RATE, col] = np.nan
+
+    if all_pollutants:
+        # Separate generator, so the PM2.5 tables stay identical for the same seed
+        extra_rng = np.random.default_rng(seed + 1)
+        extra = [
+            aqi_df.assign(pollutant_id=pid,
+                          pollutant_avg=np.clip(pm25 * scale + extra_rng.normal(0, noise, n), 0.01, None))
+            for pid, (scale, noise) in POLLUTANT_PROFILES.items()
+        ]
+        aqi_df = pd.concat([aqi_df] + extra, ignore_index=True)
+
+    return weather_df, traffic_df, aqi_df
+
+def merged_frame(sources, all_pollutants=False):
+    """
+    In-process stand-in for fetch_data() (or fetch_multi_pollutant_data() with
+    all_pollutants=True): the same merge the DB path runs.
+    """
+    from preprocessor import merge_sources, pivot_pollutants
+    weather_df, traffic_df, aqi_df = (df.copy() for df in sources)
+    # traffic_data.time is TIMESTAMP (naive); the DB hands it back in the session's zone
+    traffic_df['time'] = traffic_df['time'].dt.tz_localize(aqi_df['time'].dt.tz)
+    if all_pollutants:
+        return merge_sources(weather_df, traffic_df, pivot_pollutants(aqi_df))
+    return merge_sources(weather_df, traffic_df, aqi_df[aqi_df['pollutant_id'] == 'PM2.5'])
+
+def scratch_connection():
+    """
+    Connection to the scratch database in $AERIS_BENCH_DSN, or None (with a message) when it is
+    unset or is the database named in .env: synthetic loads never touch the live ingestion tables.
+    """
+    import psycopg2
+    from preprocessor import DB_NAME
+
+    dsn = os.getenv(BENCH_DSN_ENV)
+    if not dsn:
+        print(f"❌ Error: Set {BENCH_DSN_ENV} to a scratch database (synthetic data is never loaded into .env's DB).")
+        return None
+    conn = psycopg2.connect(dsn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT current_database();")
+    name = cursor.fetchone()[0]
+    cursor.close()
+    if name == DB_NAME:
+        conn.close()
+        print(f"❌ Error: {BENCH_DSN_ENV} points at '{name}', the live database from .env. Use a scratch database.")
+        return None
+    return conn
+
+def load_into_postgres(conn, sources, replace=False):
+    """
+    Writes the synthetic tables into the database behind `conn` (see scratch_connection()).
+    replace=True empties the three tables first.
+    """
+    from psycopg2.extras import execute_values
+
+    weather_df, traffic_df, aqi_df = sources
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS weather_data (
+            time TIMESTAMPTZ NOT NULL, temperature_celsius NUMERIC, humidity_percent NUMERIC,
+            wind_speed_ms NUMERIC, conditions_text TEXT, PRIMARY KEY (time)
+        );
+        CREATE TABLE IF NOT EXISTS aqi_data (
+            time TIMESTAMPTZ NOT NULL, station_name TEXT NOT NULL, pollutant_id TEXT NOT NULL,
+            pollutant_avg NUMERIC, PRIMARY KEY (time, station_name, pollutant_id)
+        );
+        CREATE TABLE IF NOT EXISTS traffic_data (
+            time TIMESTAMP, station_name VARCHAR(100), current_speed FLOAT,
+            free_flow_speed FLOAT, congestion_factor FLOAT, PRIMARY KEY (time, station_name)
+        );
+    """)
+    if replace:
+        cursor.execute("TRUNCATE weather_data, aqi_data, traffic_data;")
+
+    def rows(df):
+        return [tuple(None if pd.isna(v) else v for v in row)
+                for row in df.astype(object).itertuples(index=False, name=None)]
+
+    execute_values(cursor, "INSERT INTO weather_data VALUES %s ON CONFLICT DO NOTHING", rows(weather_df), page_size=5000)
+    execute_values(cursor, "INSERT INTO traffic_data VALUES %s ON CONFLICT DO NOTHING", rows(traffic_df), page_size=5000)
+    execute_values(cursor, "INSERT INTO aqi_data VALUES %s ON CONFLICT DO NOTHING", rows(aqi_df), page_size=5000)
+    conn.commit()
+    cursor.close()
+    return len(weather_df) + len(traffic_df) + len(aqi_df)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic synthetic weather/traffic/AQI tables.")
+    parser.add_argument('--stations', type=int, default=DEFAULT_STATIONS)
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--all-pollutants', action='store_true', help="Also generate PM10, NO2, SO2, CO, ozone, NH3.")
+    parser.add_argument('--load', action='store_true',
+                        help=f"Write the tables into the scratch database in ${BENCH_DSN_ENV}.")
+    parser.add_argument('--truncate', action='store_true', help="(--load) Empty the three tables first.")
+    args = parser.parse_args()
+
+    sources = generate_sources(args.stations, args.days, args.seed, all_pollutants=args.all_pollutants)
+    for name, df in zip(('weather_data', 'traffic_data', 'aqi_data'), sources):
+        print(f"   > {name}: {len(df)} rows")
+
+    if args.load:
+        conn = scratch_connection()
+        if conn is not None:
+            try:
+                print(f"✅ Loaded {load_into_postgres(conn, sources, replace=args.truncate)} rows.")
+            finally:
+                conn.close()
@@ -0,0 +1,299 @@
+# tensor_store.py
+
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+from preprocessor import TARGET_COL, LOOKBACK_WINDOW, RAW_FEATURE_COLS, HISTORY_DAYS, INFERENCE_MARGIN_HOURS
+
+# --- Settings ---
+STORE_DIR = os.getenv(
+    'AERIS_FEATURE_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feature_store')
+)
+HOUR_CHUNK = 24 * 30     # Hour axis grows a month at a time
+STATION_CHUNK = 16       # Station axis grows 16 slots at a time
+# A training window needs at least this many real (unmasked) hours out of LOOKBACK_WINDOW
+MIN_VALID_HOURS = LOOKBACK_WINDOW // 2
+SCALE_BLOCK_STATIONS = 16  # base_arrays() scales this many station rows of the grid at a time
+# Forecast job reads its windows from the store (kept current by the scheduler's hourly append)
+USE_FEATURE_STORE = os.getenv('AERIS_FEATURE_STORE', '0') == '1'
+
+def to_epoch_hours(times):
+    """Timestamps -> int64 hours since 1970-01-01 (UTC for tz-aware input)."""
+    times = pd.DatetimeIndex(times)
+    if times.tz is not None:
+        times = times.tz_convert('UTC').tz_localize(None)
+    return times.values.astype('datetime64[h]').astype(np.int64)
+
+class FeatureTensorStore:
+    """
+    Canonical feature store: a dense float32 tensor of shape (Stations, Hours, Features)
+    on a regular hourly grid, memory-mapped from disk.
+
+    - values[s, h]  raw (unscaled) RAW_FEATURE_COLS for station s at hour h, NaN if missing
+    - mask[s, h]    True where a real merged row exists (gaps are explicit, never skipped)
+    - stations      station name <-> row index
+    - start_hour    epoch hour of column 0
+
+    Windows are plain slices: values[s, h - 24:h].
+    """
+
+    def __init__(self, store_dir=STORE_DIR, feature_cols=RAW_FEATURE_COLS):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+        if os.path.exists(self._path('meta.json')):
+            with open(self._path('meta.json')) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {
+                'feature_cols': list(feature_cols), 'stations': [], 'tz': None,
+                'start_hour': None, 'n_hours': 0,
+                'station_capacity': 0, 'hour_capacity': 0
+            }
+        self.station_index = {name: i for i, name in enumerate(self.meta['stations'])}
+        self._open()
+
+    # --- Files ---
+    def _path(self, name):
+        return os.path.join(self.store_dir, name)
+
+    def _open(self):
+        shape = (self.meta['station_capacity'], self.meta['hour_capacity'])
+        if shape[0] == 0 or shape[1] == 0:
+            self._values, self._mask = None, None
+            return
+        n_features = len(self.meta['feature_cols'])
+        self._values = np.memmap(self._path('values.f32'), dtype=np.float32, mode='r+', shape=shape + (n_features,))
+        self._mask = np.memmap(self._path('mask.u8'), dtype=np.bool_, mode='r+', shape=shape)
+
+    def _save_meta(self):
+        with open(self._path('meta.json.tmp'), 'w') as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(self._path('meta.json.tmp'), self._path('meta.json'))
+
+    def flush(self):
+        if self._values is not None:
+            self._values.flush()
+            self._mask.flush()
+        self._save_meta()
+
+    def _grow(self, n_stations, n_hours):
+        """Re-allocates the memmaps with room for n_stations x n_hours (amortized by chunks)."""
+        old_s, old_h = self.meta['station_capacity'], self.meta['hour_capacity']
+        if n_stations <= old_s and n_hours <= old_h:
+            return
+
+        new_s = max(old_s, -(-n_stations // STATION_CHUNK) * STATION_CHUNK)
+        new_h = max(old_h, -(-n_hours // HOUR_CHUNK) * HOUR_CHUNK)
+        n_features = len(self.meta['feature_cols'])
+
+        values = np.memmap(self._path('values.f32.tmp'), dtype=np.float32, mode='w+', shape=(new_s, new_h, n_features))
+        mask = np.memmap(self._path('mask.u8.tmp'), dtype=np.bool_, mode='w+', shape=(new_s, new_h))
+        values[:] = np.nan
+        if self._values is not None:
+            values[:old_s, :old_h] = self._values
+            mask[:old_s, :old_h] = self._mask
+        values.flush()
+        mask.flush()
+        del values, mask
+        self._values, self._mask = None, None
+
+        os.replace(self._path('values.f32.tmp'), self._path('values.f32'))
+        os.replace(self._path('mask.u8.tmp'), self._path('mask.u8'))
+        self.meta['station_capacity'], self.meta['hour_capacity'] = new_s, new_h
+        self._open()
+
+    # --- Index ---
+    @property
+    def stations(self):
+        return list(self.meta['stations'])
+
+    @property
+    def n_hours(self):
+        return self.meta['n_hours']
+
+    @property
+    def hours(self):
+        """Timestamps of the filled part of the grid (in the tz of the ingested data)."""
+        if self.meta['start_hour'] is None:
+            return pd.DatetimeIndex([])
+        epoch = np.arange(self.meta['start_hour'], self.meta['start_hour'] + self.n_hours)
+        times = pd.DatetimeIndex(epoch.astype('datetime64[h]').astype('datetime64[ns]'))
+        return times.tz_localize('UTC').tz_convert(self.meta['tz']) if self.meta['tz'] else times
+
+    @property
+    def values(self):
+        if self._values is None:
+            return np.empty((0, 0, len(self.meta['feature_cols'])), dtype=np.float32)
+        return self._values[:len(self.meta['stations']), :self.n_hours]
+
+    @property
+    def mask(self):
+        if self._mask is None:
+            return np.empty((0, 0), dtype=np.bool_)
+        return self._mask[:len(self.meta['stations']), :self.n_hours]
+
+    def hour_position(self, time):
+        return int(to_epoch_hours([time])[0] - self.meta['start_hour'])
+
+    # --- Writes ---
+    def ingest(self, df):
+        """
+        Upserts merged hourly rows (time, station_name, RAW_FEATURE_COLS...) into the grid.
+        Call it with each new hour (or any batch of rows); existing cells are overwritten.
+        """
+        if df.empty:
+            return 0
+
+        times = pd.DatetimeIndex(df['time'])
+        if self.meta['tz'] is None and times.tz is not None:
+            self.meta['tz'] = str(times.tz)
+        epoch = to_epoch_hours(times)
+
+        if self.meta['start_hour'] is None:
+            self.meta['start_hour'] = int(epoch.min())
+        elif epoch.min() < self.meta['start_hour']:
+            # The grid only grows forward in time; backfills need a fresh store
+            keep = epoch >= self.meta['start_hour']
+            print(f"   ⚠️ [Store] Skipping {int((~keep).sum())} rows older than the store's first hour.")
+            df, epoch = df[keep], epoch[keep]
+            if df.empty:
+                return 0
+
+        for name in pd.unique(df['station_name']):
+            if name not in self.station_index:
+                self.station_index[name] = len(self.meta['stations'])
+                self.meta['stations'].append(name)
+
+        s_idx = df['station_name'].map(self.station_index).to_numpy(dtype=np.int64)
+        h_idx = epoch - self.meta['start_hour']
+        self._grow(len(self.meta['stations']), int(h_idx.max()) + 1)
+
+        self._values[s_idx, h_idx] = df[self.meta['feature_cols']].to_numpy(dtype=np.float32)
+        self._mask[s_idx, h_idx] = True
+        self.meta['n_hours'] = max(self.n_hours, int(h_idx.max()) + 1)
+        self.flush()
+        return len(df)
+
+    def append_recent(self, conn=None, margin=INFERENCE_MARGIN_HOURS):
+        """
+        Hourly append (backend_scheduler runs it after ingestion): every station's rows since the
+        grid's last hour, plus `margin` hours so late-arriving rows overwrite their cells.
+        An empty store is filled with the last HISTORY_DAYS first.
+        """
+        from preprocessor import fetch_data, fetch_recent
+
+        if self.meta['start_hour'] is None:
+            return self.ingest(fetch_data())
+        now = int(to_epoch_hours([pd.Timestamp.now(tz='UTC')])[0])
+        last = self.meta['start_hour'] + self.n_hours - 1
+        gap = min(max(now - last, 1), HISTORY_DAYS * 24)
+        return self.ingest(fetch_recent(lookback=gap, margin=margin, conn=conn))
+
+    # --- O(1) reads ---
+    def window(self, station, end=None, length=LOOKBACK_WINDOW):
+        """(values, mask) for `length` hours ending just before grid position `end` (default: latest)."""
+        s = self.station_index[station]
+        end = self.n_hours if end is None else end
+        start = max(end - length, 0)
+        return self.values[s, start:end], self.mask[s, start:end]
+
+    def latest_windows(self, stations=None, length=LOOKBACK_WINDOW):
+        """(Stations, length, raw features) block of the most recent hours, plus mask and hour stamps."""
+        stations = self.stations if stations is None else stations
+        idx = np.array([self.station_index[s] for s in stations], dtype=np.int64)
+        start = max(self.n_hours - length, 0)
+        return np.asarray(self.values[idx, start:]), np.asarray(self.mask[idx, start:]), self.hours[start:]
+
+    def inference_windows(self, pipeline, stations=None, lookback=LOOKBACK_WINDOW,
+                          context=INFERENCE_MARGIN_HOURS, min_valid=MIN_VALID_HOURS):
+        """
+        Store counterpart of predict.latest_windows(): scaled (Stations, lookback, Features) windows
+        ending at the grid's newest hour, for stations with >= min_valid real hours in them.
+        `context` extra hours are imputed along so gaps at the window start are interpolated.
+        Returns (station names, windows, newest hour); the hour is None for an empty store.
+        """
+        stations = self.stations if stations is None else [s for s in stations if s in self.station_index]
+        if self.n_hours < lookback or not stations:
+            return [], np.empty((0, lookback, len(pipeline.feature_cols)), dtype=np.float32), None
+
+        values, mask, hours = self.latest_windows(stations, lookback + context)
+        windows = pipeline.transform_block(values, hours)[:, -lookback:]
+        ok = mask[:, -lookback:].sum(axis=1) >= min_valid
+        return [s for s, keep in zip(stations, ok) if keep], windows[ok], hours[-1]
+
+    def history(self, station, hours=24, col=TARGET_COL):
+        """Last `hours` values of one column for one station as a Series (gaps stay NaN)."""
+        values, mask = self.window(station, length=hours)
+        start = self.n_hours - len(values)
+        series = values[:, self.meta['feature_cols'].index(col)].astype(np.float64)
+        return pd.Series(np.where(mask, series, np.nan), index=self.hours[start:], name=col)
+
+    def base_arrays(self, pipeline, min_valid=MIN_VALID_HOURS, horizon=1):
+        """
+        Streaming-training input (see window_dataset.py) built straight from the grid.
+        A window is used when its first target hour is real and it has >= min_valid real hours.
+        With horizon > 1 the last horizon - 1 hours of the grid cannot start a target block.
+        """
+        n_stations, n_hours = len(self.stations), self.n_hours
+        features, targets = self._scaled_grid(pipeline)
+        mask = np.asarray(self.mask)
+        n_windows = max(n_hours - LOOKBACK_WINDOW - horizon + 1, 0)
+
+        # Real hours per window via a cumulative sum along the hour axis
+        counts = np.concatenate((np.zeros((n_stations, 1), dtype=np.int32), np.cumsum(mask, axis=1, dtype=np.int32)), axis=1)
+        window_valid = counts[:, LOOKBACK_WINDOW:LOOKBACK_WINDOW + n_windows] - counts[:, :n_windows]
+        target_valid = mask[:, LOOKBACK_WINDOW:LOOKBACK_WINDOW + n_windows]
+        s, h = np.nonzero((window_valid >= min_valid) & target_valid)
+
+        times = np.tile(self.hours.values, n_stations)
+        return {
+            'features': features,
+            'targets': targets,
+            'times': times,
+            'starts': (s * n_hours + h).astype(np.int64),
+            'station_codes': np.repeat(np.arange(n_stations, dtype=np.int32), n_hours),
+            'stations': self.stations,
+        }
+
+    def _scaled_grid(self, pipeline):
+        """
+        Scaled (Stations * Hours, Features) features as a disk-backed memmap plus the in-RAM target
+        column. Imputation is per station row, so scaling SCALE_BLOCK_STATIONS rows at a time gives
+        the same result as one pass while only one block is ever resident.
+        """
+        n_rows, n_hours = len(self.stations) * self.n_hours, self.n_hours
+        n_features = len(pipeline.feature_cols)
+        targets = np.empty(n_rows, dtype=np.float32)
+        if n_rows == 0:
+            return np.empty((0, n_features), dtype=np.float32), targets
+
+        path = self._path(f'scaled.{os.getpid()}.f32')
+        features = np.memmap(path, dtype=np.float32, mode='w+', shape=(n_rows, n_features))
+        os.remove(path)   # POSIX keeps the mapping alive; the space is freed when it is released
+        hours = self.hours
+        for first in range(0, len(self.stations), SCALE_BLOCK_STATIONS):
+            block = pipeline.transform_block(np.asarray(self.values[first:first + SCALE_BLOCK_STATIONS]), hours)
+            rows = slice(first * n_hours, first * n_hours + block.shape[0] * n_hours)
+            features[rows] = block.reshape(-1, n_features)
+            targets[rows] = block[..., pipeline.target_index].reshape(-1)
+        return features, targets
+
+if __name__ == "__main__":
+    from preprocessor import fetch_data
+
+    parser = argparse.ArgumentParser(description="Build or extend the dense feature store.")
+    parser.add_argument('--append', action='store_true', help="Only add the hours since the store's last hour.")
+    args = parser.parse_args()
+
+    store = FeatureTensorStore()
+    written = store.append_recent() if args.append else store.ingest(fetch_data())
+    print(f"✅ Feature store at {store.store_dir}")
+    print(f"   Rows written: {written}")
+    print(f"   Grid: {len(store.stations)} stations x {store.n_hours} hours x {len(store.meta['feature_cols'])} features")
+    if store.n_hours:
+        print(f"   Coverage: {store.mask.mean() * 100:.1f}% of station-hours have data")
@@ -1,19 +1,33 @@
+import argparse
+import time
 import numpy as np
 import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
-from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.models import Sequential, Model
+from tensorflow.keras.layers import LSTM, Dense, Dropout, Input, Embedding, Flatten, Concatenate, Reshape
+from tensorflow.keras.callbacks import EarlyStopping, Callback
 from sklearn.model_selection import train_test_split
 import joblib
 
 # Import our custom data pipeline
-from preprocessor import fetch_data, preprocess_data, create_sequences
+from preprocessor import (
+    fetch_data, fetch_multi_pollutant_data, preprocess_data, create_sequences, build_base_arrays,
+    LOOKBACK_WINDOW, FEATURE_COLS, FORECAST_HORIZON, MULTI_FEATURE_COLS, MULTI_TARGET_COLS
+)
 
 # --- Settings ---
 EPOCHS = 20              # How many times to loop through the data
 BATCH_SIZE = 16          # How many examples to feed at once
 MODEL_PATH = 'aeris_v1.keras'
+HORIZON_MODEL_PATH = f'aeris_v1_h{FORECAST_HORIZON}.keras'  # Multi-horizon variant (--horizon)
 SCALER_PATH = 'scaler.gz'
+PIPELINE_PATH = 'feature_pipeline.gz'
+MULTI_PIPELINE_PATH = 'feature_pipeline_multi.gz'  # Pipeline of the all-pollutant model (--all-pollutants)
+
+STATION_EMBED_DIM = 4    # Global model: size of the learned per-station vector
+
+# --- Performance profile (--profile perf) ---
+PERF_BATCH_SIZE = 128        # Bigger batches keep all CPU cores busy per step
+BASE_LEARNING_RATE = 1e-3    # Adam default, tuned for BATCH_SIZE
 
 # 🛡️ SAFE STATION LIST (Verified from your DB)
 SAFE_STATIONS = [
@@ -29,31 +43,265 @@ SAFE_STATIONS = [
     "Silk Board, Bengaluru - KSPCB"
 ]
 
-def build_model(input_shape):
+@tf.keras.utils.register_keras_serializable(package='aeris')
+def masked_mse(y_true, y_pred):
+    """MSE over the targets that exist: a pollutant a station does not report (NaN) adds no loss."""
+    valid = tf.math.is_finite(y_true)
+    error = tf.where(valid, y_pred - tf.where(valid, y_true, 0.0), 0.0)
+    count = tf.maximum(tf.reduce_sum(tf.cast(valid, y_pred.dtype), axis=-1), 1.0)
+    return tf.reduce_sum(tf.square(error), axis=-1) / count
+
+@tf.keras.utils.register_keras_serializable(package='aeris')
+def masked_mae(y_true, y_pred):
+    valid = tf.math.is_finite(y_true)
+    error = tf.where(valid, y_pred - tf.where(valid, y_true, 0.0), 0.0)
+    count = tf.maximum(tf.reduce_sum(tf.cast(valid, y_pred.dtype), axis=-1), 1.0)
+    return tf.reduce_sum(tf.abs(error), axis=-1) / count
+
+def _compile(model, learning_rate, jit_compile, n_outputs):
+    optimizer = 'adam' if learning_rate is None else tf.keras.optimizers.Adam(learning_rate=learning_rate)
+    if n_outputs > 1:
+        model.compile(optimizer=optimizer, loss=masked_mse, metrics=[masked_mae], jit_compile=jit_compile)
+    else:
+        model.compile(optimizer=optimizer, loss='mse', metrics=['mae'], jit_compile=jit_compile)
+    return model
+
+def build_model(input_shape, units=50, dropout=0.2, learning_rate=None, jit_compile=False, horizon=1, n_outputs=1):
     """
     Defines the LSTM Neural Network Architecture.
+    Defaults are the production architecture; sweep.py varies them.
+    horizon > 1 gives the multi-horizon variant: one output per future hour.
+    n_outputs > 1 gives the multi-pollutant variant: one output per pollutant (x horizon).
     """
     model = Sequential()
     
     # 1. LSTM Layer
-    model.add(LSTM(50, input_shape=input_shape, return_sequences=False))
+    model.add(LSTM(units, input_shape=input_shape, return_sequences=False))
     
     # 2. Dropout Layer (Prevents overfitting)
-    model.add(Dropout(0.2))
+    model.add(Dropout(dropout))
     
-    # 3. Dense Output Layer
-    model.add(Dense(1))
+    # 3. Dense Output Layer (all future hours / pollutants at once, no recursive predictions)
+    model.add(Dense(horizon * n_outputs))
+    if horizon > 1 and n_outputs > 1:
+        model.add(Reshape((horizon, n_outputs)))
     
     # 4. Compile
-    model.compile(optimizer='adam', loss='mse', metrics=['mae'])
+    return _compile(model, learning_rate, jit_compile, n_outputs)
+
+def build_global_model(input_shape, n_stations, units=50, dropout=0.2, learning_rate=None,
+                       jit_compile=False, horizon=1, embed_dim=STATION_EMBED_DIM, n_outputs=1):
+    """
+    Same LSTM, plus a learned station embedding joined to its output, so one model serves
+    every station with its own identity. Inputs: (window (24, F), station id from the pipeline).
+    """
+    window = Input(shape=input_shape, name='window')
+    station = Input(shape=(1,), dtype='int32', name='station')
     
-    return model
+    x = LSTM(units, return_sequences=False)(window)
+    x = Dropout(dropout)(x)
+    # id 0 is reserved for stations the model never saw
+    station_vec = Flatten()(Embedding(n_stations + 1, embed_dim)(station))
+    output = Dense(horizon * n_outputs)(Concatenate()([x, station_vec]))
+    if horizon > 1 and n_outputs > 1:
+        output = Reshape((horizon, n_outputs))(output)
+    
+    model = Model(inputs=[window, station], outputs=output)
+    return _compile(model, learning_rate, jit_compile, n_outputs)
+
+def model_path_for(horizon, global_model=False, multi=False):
+    """aeris_v1.keras for the next-hour model; _multi / _global / _h<H> suffixes for the variants."""
+    if horizon == 1 and not global_model and not multi:
+        return MODEL_PATH
+    return ('aeris_v1' + ('_multi' if multi else '') + ('_global' if global_model else '')
+            + (f'_h{horizon}' if horizon > 1 else '') + '.keras')
+
+def configure_cpu_threads(intra_op=None, inter_op=None):
+    """
+    Explicit TensorFlow thread pools. Must run before the first TF op.
+    intra_op: threads inside one op (matmuls) -> physical cores. inter_op: independent ops in parallel.
+    """
+    import os
+    intra_op = intra_op or os.cpu_count() or 1
+    inter_op = inter_op or 2
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    print(f"🧵 TensorFlow threads: intra-op={intra_op}, inter-op={inter_op}")
+
+def scaled_learning_rate(batch_size):
+    """Square-root LR scaling from the BATCH_SIZE baseline (gentler than linear, safer for Adam)."""
+    return BASE_LEARNING_RATE * np.sqrt(batch_size / BATCH_SIZE)
+
+def supports_jit(input_shape):
+    """Probes whether XLA can compile one LSTM train step on this machine."""
+    try:
+        probe = build_model(input_shape, units=4, jit_compile=True)
+        probe.train_on_batch(np.zeros((2,) + tuple(input_shape), dtype=np.float32), np.zeros((2,), dtype=np.float32))
+        return True
+    except Exception as e:
+        print(f"   ⚠️ XLA unavailable here ({type(e).__name__}). Training without jit_compile.")
+        return False
+
+class ThroughputLogger(Callback):
+    """Prints training samples/sec for every epoch and the average at the end."""
+
+    def __init__(self, n_samples):
+        super().__init__()
+        self.n_samples = n_samples
+        self.rates = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.started = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        # Includes the validation pass, so it is a slightly pessimistic training rate
+        rate = self.n_samples / (time.perf_counter() - self.started)
+        self.rates.append(rate)
+        print(f"   ⏱️ Epoch {epoch + 1}: {rate:,.0f} samples/sec")
+
+    def on_train_end(self, logs=None):
+        if self.rates:
+            steady = self.rates[1:] or self.rates  # epoch 1 includes tracing/compilation
+            print(f"⏱️ Throughput: {np.mean(steady):,.0f} samples/sec (steady state, {len(self.rates)} epochs)")
+
+def train_streaming(base, batch_size=BATCH_SIZE, learning_rate=None, jit_compile=False, horizon=1,
+                    n_stations=None):
+    """
+    Trains from a tf.data pipeline that cuts windows on the fly.
+    Peak memory follows the raw feature table, not 24x of it.
+    `base` comes from preprocessor.build_base_arrays() or FeatureTensorStore.base_arrays().
+    n_stations: train the global model (needs base['station_ids'], see attach_station_ids).
+    """
+    from window_dataset import make_train_val_datasets
+
+    if len(base['starts']) == 0:
+        print("❌ Error: Not enough data to create sequences. Need > 24 hours.")
+        return None
+
+    print(f"✅ Streaming dataset ready. Windows: {len(base['starts'])} (never materialized)")
+    global_model = n_stations is not None
+    input_shape = (LOOKBACK_WINDOW, base['features'].shape[1])
+    n_outputs = base['targets'].shape[1] if base['targets'].ndim > 1 else 1
+    train_ds, val_ds, boundary = make_train_val_datasets(base, batch_size, horizon=horizon,
+                                                         with_station=global_model)
+    n_train = int(np.sum(base['times'][base['starts'] + LOOKBACK_WINDOW] < boundary))
+
+    if global_model:
+        model = build_global_model(input_shape, n_stations, learning_rate=learning_rate,
+                                   jit_compile=jit_compile, horizon=horizon, n_outputs=n_outputs)
+    else:
+        model = build_model(input_shape, learning_rate=learning_rate,
+                            jit_compile=jit_compile, horizon=horizon, n_outputs=n_outputs)
+    model.summary()
+
+    print(f"\n🏃 Training started (streaming, batch={batch_size}, jit={jit_compile})...")
+    early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+
+    history = model.fit(
+        train_ds,
+        epochs=EPOCHS,
+        validation_data=val_ds,
+        callbacks=[early_stop, ThroughputLogger(n_train)],
+        verbose=1
+    )
+    return model, history
+
+def attach_station_ids(base, pipeline):
+    """Per-row embedding ids for the global model, from the pipeline's station vocabulary."""
+    base['station_ids'] = pipeline.station_ids(base['stations'])[base['station_codes']]
+    return base
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the Aeris LSTM.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Generate windows on the fly with tf.data instead of building X in memory.")
+    parser.add_argument('--shards', default=None,
+                        help="Train from windowed shards written by ooc_prepare.py (skips the DB fetch).")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Preprocess with a process pool of this many workers.")
+    parser.add_argument('--store', action='store_true',
+                        help="(Streaming) Cut windows from the dense hourly feature store (gaps explicit).")
+    parser.add_argument('--profile', choices=['default', 'perf'], default='default',
+                        help="'perf': float32 tf.data input, XLA where supported, explicit threads, "
+                             "larger batches with LR scaling.")
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help=f"Override the batch size (default {BATCH_SIZE}, perf profile {PERF_BATCH_SIZE}).")
+    parser.add_argument('--horizon', type=int, default=1,
+                        help=f"Predict this many future hours in one pass: 1 or {FORECAST_HORIZON} (FORECAST_HORIZON). "
+                             f"Saved as aeris_v1_h<H>.keras; the next-hour model stays in {MODEL_PATH}.")
+    parser.add_argument('--global-model', action='store_true',
+                        help="One model for all stations with a learned station embedding (implies --streaming).")
+    parser.add_argument('--all-pollutants', action='store_true',
+                        help="Multi-output model forecasting every tracked pollutant (implies --streaming).")
+    parser.add_argument('--intra-op-threads', type=int, default=None)
+    parser.add_argument('--inter-op-threads', type=int, default=None)
+    args = parser.parse_args()
+
     print("🚀 STARTING MODEL TRAINING PIPELINE...")
     
+    batch_size, learning_rate, jit = args.batch_size or BATCH_SIZE, None, False
+    if args.profile == 'perf':
+        print("⚡ Performance profile enabled.")
+        configure_cpu_threads(args.intra_op_threads, args.inter_op_threads)
+        args.streaming = True  # float32 tf.data input with prefetch
+        batch_size = args.batch_size or PERF_BATCH_SIZE
+        learning_rate = scaled_learning_rate(batch_size)
+        jit = supports_jit((LOOKBACK_WINDOW, len(FEATURE_COLS)))
+        print(f"   > batch_size={batch_size}, learning_rate={learning_rate:.5f}, jit_compile={jit}")
+    elif args.intra_op_threads or args.inter_op_threads:
+        configure_cpu_threads(args.intra_op_threads, args.inter_op_threads)
+    
+    horizon = args.horizon
+    if horizon not in (1, FORECAST_HORIZON):
+        # predict.py only looks for *_h{FORECAST_HORIZON}.keras: any other horizon would never be served
+        print(f"❌ Error: --horizon must be 1 or {FORECAST_HORIZON}. "
+              f"Change FORECAST_HORIZON in preprocessor.py to serve a different horizon.")
+        exit()
+    model_path = model_path_for(horizon, args.global_model, args.all_pollutants)
+    if horizon > 1:
+        print(f"🔭 Multi-horizon model: {horizon} hours per forward pass -> {model_path}")
+    if args.global_model:
+        print(f"🌐 Global model with station embedding -> {model_path}")
+        args.streaming = True  # Station ids ride along with the tf.data windows
+    if args.all_pollutants:
+        print(f"🧪 Multi-pollutant model: {len(MULTI_TARGET_COLS)} outputs per forward pass -> {model_path}")
+        args.streaming = True  # Per-pollutant target columns (NaN = not reported) stream with the windows
+        if args.store or args.workers > 1:
+            print("   ⚠️ --store/--workers cover the PM2.5 schema only; using the in-memory pipeline.")
+            args.store, args.workers = False, 1
+    
+    if args.shards:
+        if horizon > 1 or args.global_model or args.all_pollutants:
+            print("❌ Error: Shards hold next-hour PM2.5 windows only. Re-run without --shards for this model variant.")
+            exit()
+        # Out-of-core mode: the scaler/pipeline were already fitted by ooc_prepare.py
+        from window_dataset import make_shard_dataset, shard_samples
+        n_train = shard_samples(args.shards, 'train')
+        if n_train == 0:
+            print("❌ Error: The shards hold no training windows. Re-run ooc_prepare.py.")
+            exit()
+        train_ds = make_shard_dataset(args.shards, 'train', batch_size, shuffle=True)
+        val_ds = None
+        if shard_samples(args.shards, 'val'):
+            val_ds = make_shard_dataset(args.shards, 'val', batch_size)
+        else:
+            print("⚠️ No validation shards (archive shorter than one window past the cutoff?). "
+                  "Early stopping on training loss.")
+        monitor = 'val_loss' if val_ds is not None else 'loss'
+        
+        model = build_model((LOOKBACK_WINDOW, len(FEATURE_COLS)), learning_rate=learning_rate, jit_compile=jit)
+        print(f"\n🏃 Training started (shards, batch={batch_size}, jit={jit})...")
+        early_stop = EarlyStopping(monitor=monitor, patience=5, restore_best_weights=True)
+        history = model.fit(train_ds, epochs=EPOCHS, validation_data=val_ds,
+                            callbacks=[early_stop, ThroughputLogger(n_train)], verbose=1)
+        
+        model.save(MODEL_PATH)
+        print(f"\n🎉 SUCCESS! Model saved to {MODEL_PATH}")
+        print(f"Final {'Validation' if val_ds is not None else 'Training'} Loss: {history.history[monitor][-1]}")
+        exit()
+    
     # 1. Get Data using our existing pipeline
-    raw_df = fetch_data()
+    raw_df = fetch_multi_pollutant_data() if args.all_pollutants else fetch_data()
     
     if raw_df.empty:
         print("❌ Error: Not enough data to train.")
@@ -74,14 +322,56 @@ if __name__ == "__main__":
         # --- 🛡️ SAFETY FILTER END ---
 
         # 2. Preprocess
-        clean_df, scaler = preprocess_data(raw_df)
+        if args.all_pollutants:
+            from features import FeaturePipeline
+            print("2. [Transform] Cleaning and Feature Engineering (all pollutants)...")
+            pipeline = FeaturePipeline(MULTI_FEATURE_COLS, target_cols=MULTI_TARGET_COLS)
+            clean_df = pipeline.fit_transform(raw_df)
+        elif args.workers > 1:
+            from parallel_preprocess import parallel_preprocess_data
+            clean_df, pipeline = parallel_preprocess_data(raw_df, workers=args.workers)
+        else:
+            clean_df, pipeline = preprocess_data(raw_df)
         
         # Save the scaler! We need it to translate predictions back to real numbers later.
-        joblib.dump(scaler, SCALER_PATH)
-        print(f"✅ Scaler saved to {SCALER_PATH}")
+        # The full feature pipeline (imputation + time encoding + scaler) is saved next to it.
+        if args.all_pollutants:
+            pipeline.save(MULTI_PIPELINE_PATH)
+            print(f"✅ Feature pipeline saved to {MULTI_PIPELINE_PATH}")
+        else:
+            joblib.dump(pipeline.scaler, SCALER_PATH)
+            pipeline.save(PIPELINE_PATH)
+            print(f"✅ Scaler saved to {SCALER_PATH}, feature pipeline saved to {PIPELINE_PATH}")
         
         # 3. Create Sequences
-        X, y = create_sequences(clean_df)
+        if args.streaming:
+            if args.store:
+                from tensor_store import FeatureTensorStore
+                store = FeatureTensorStore()
+                store.ingest(raw_df)
+                base = store.base_arrays(pipeline, horizon=horizon)
+            else:
+                base = build_base_arrays(clean_df, horizon=horizon,
+                                         feature_cols=pipeline.feature_cols, target_cols=pipeline.targets)
+            del clean_df
+            if args.all_pollutants:
+                # Pollutants a station never reports stay NaN after imputation: zero inputs, masked targets
+                base['features'] = np.nan_to_num(base['features'], nan=0.0)
+            n_stations = None
+            if args.global_model:
+                attach_station_ids(base, pipeline)
+                n_stations = len(pipeline.stations)
+            result = train_streaming(base, batch_size=batch_size,
+                                     learning_rate=learning_rate, jit_compile=jit, horizon=horizon,
+                                     n_stations=n_stations)
+            if result is not None:
+                model, history = result
+                model.save(model_path)
+                print(f"\n🎉 SUCCESS! Model saved to {model_path}")
+                print(f"Final Validation Loss: {history.history['val_loss'][-1]}")
+            exit()
+        
+        X, y = create_sequences(clean_df, horizon=horizon)
         
         if len(X) == 0:
             print("❌ Error: Not enough data to create sequences. Need > 24 hours.")
@@ -93,7 +383,7 @@ if __name__ == "__main__":
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
             
             # 5. Build Model
-            model = build_model((X.shape[1], X.shape[2]))
+            model = build_model((X.shape[1], X.shape[2]), horizon=horizon)
             model.summary()
             
             # 6. Train Model
@@ -105,13 +395,13 @@ if __name__ == "__main__":
             history = model.fit(
                 X_train, y_train,
                 epochs=EPOCHS,
-                batch_size=BATCH_SIZE,
+                batch_size=batch_size,
                 validation_data=(X_test, y_test),
-                callbacks=[early_stop],
+                callbacks=[early_stop, ThroughputLogger(len(X_train))],
                 verbose=1
             )
             
             # 7. Save the Model
-            model.save(MODEL_PATH)
-            print(f"\n🎉 SUCCESS! Model saved to {MODEL_PATH}")
+            model.save(model_path)
+            print(f"\n🎉 SUCCESS! Model saved to {model_path}")
             print(f"Final Validation Loss: {history.history['val_loss'][-1]}")
\ No newline at end of file
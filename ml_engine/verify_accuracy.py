@@ -2,23 +2,43 @@
 import pandas as pd
 import psycopg2
 import os
+import argparse
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def check_scorecard():
+LATEST_VERSION_QUERY = """
+    SELECT model_version FROM forecast_logs
+    ORDER BY issued_at DESC
+    LIMIT 1;
+"""
+
+def check_scorecard(lead_hours=1, model_version=None):
+    """
+    Scores the precomputed forecasts in forecast_logs (written by forecast_writer.py) at one lead time.
+    model_version: which model to score; None = the one that issued the latest forecasts
+    (every retrain logs under a new version, so mixing them would count an hour more than once).
+    """
     try:
         conn = psycopg2.connect(
             dbname=os.getenv('DB_NAME'), user=os.getenv('DB_USER'),
             password=os.getenv('DB_PASS'), host=os.getenv('DB_HOST'), port=os.getenv('DB_PORT')
         )
         
+        if model_version is None:
+            cursor = conn.cursor()
+            cursor.execute(LATEST_VERSION_QUERY)
+            row = cursor.fetchone()
+            cursor.close()
+            model_version = row[0] if row else None
+
         # This query joins your predictions with the actual future reality
         # It only shows rows where BOTH exist.
         query = """
         SELECT 
             f.station_name,
             f.target_hour,
+            f.model_version,
             ROUND(f.predicted_aqi::numeric, 2) as "AI Prediction",
             a.pollutant_avg as "Actual Reality",
             ROUND((f.predicted_aqi - a.pollutant_avg)::numeric, 2) as "Error (Diff)"
@@ -27,16 +47,18 @@ def check_scorecard():
           ON f.station_name = a.station_name 
           AND f.target_hour = a.time
         WHERE a.pollutant_id = 'PM2.5'
+          AND f.lead_hours = %s
+          AND f.model_version = %s
         ORDER BY f.target_hour DESC;
         """
         
-        df = pd.read_sql(query, conn)
+        df = pd.read_sql(query, conn, params=(lead_hours, model_version))
         
         if df.empty:
             print("📭 No verified matches found yet.")
             print("   (Either you haven't made predictions, or the 'Actual' data hasn't arrived yet).")
         else:
-            print(f"\n📊 ACCURACY REPORT ({len(df)} Records Verified)")
+            print(f"\n📊 ACCURACY REPORT ({len(df)} Records Verified, {lead_hours}h ahead, model {model_version})")
             print("="*80)
             print(df.head(15).to_string(index=False)) # Show top 15
             print("="*80)
@@ -58,4 +80,8 @@ def check_scorecard():
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    check_scorecard()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scores logged forecasts against the observed PM2.5.")
+    parser.add_argument('--lead-hours', type=int, default=1)
+    parser.add_argument('--model-version', default=None, help="Default: the model behind the latest forecasts.")
+    args = parser.parse_args()
+    check_scorecard(args.lead_hours, args.model_version)
\ No newline at end of file
@@ -0,0 +1,140 @@
+# virtual_sensor.py
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from preprocessor import LOOKBACK_WINDOW
+
+# --- Settings ---
+WARDS_PATH = 'bangalore_wards_cleaned.csv'
+NEIGHBORS = 4              # Stations blended into each virtual sensor
+METHOD = 'idw'             # 'idw' (inverse distance) or 'gaussian' (Gaussian-process / kriging weights)
+IDW_POWER = 2.0
+LENGTH_SCALE_KM = 4.0      # Gaussian kernel length scale
+NUGGET = 0.05              # Kernel noise term: keeps close neighbour pairs well conditioned
+MIN_DISTANCE_KM = 0.05     # A target on top of a station just copies it
+MAX_DISTANCE_KM = 15.0     # Farther stations get no weight (the nearest one always does)
+EARTH_RADIUS_KM = 6371.0
+
+def to_km(lat, lon, lat0):
+    """Equirectangular projection around latitude lat0: (N, 2) km coordinates, exact enough at city scale."""
+    lat, lon = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(lon, dtype=np.float64))
+    return EARTH_RADIUS_KM * np.column_stack([lon * np.cos(np.radians(lat0)), lat])
+
+def _gaussian_weights(station_xy, dist, idx):
+    """Simple-kriging weights K⁻¹k* over each target's neighbours, one batched solve for all targets."""
+    points = station_xy[idx]                                               # (Targets, k, 2)
+    d2 = ((points[:, :, None] - points[:, None]) ** 2).sum(-1)             # (Targets, k, k)
+    kernel = np.exp(-d2 / (2 * LENGTH_SCALE_KM ** 2)) + NUGGET * np.eye(idx.shape[1])
+    k_star = np.exp(-dist ** 2 / (2 * LENGTH_SCALE_KM ** 2))
+    return np.clip(np.linalg.solve(kernel, k_star[..., None])[..., 0], 0, None)
+
+def interpolation_weights(target_xy, station_xy, k=NEIGHBORS, method=METHOD):
+    """
+    (Targets, Stations) CSR matrix with up to k non-zero weights per row, each row summing to 1,
+    plus the nearest station index and distance (km) of every target.
+    """
+    k = min(k, len(station_xy))
+    dist, idx = cKDTree(station_xy).query(target_xy, k=k)
+    dist, idx = dist.reshape(len(target_xy), k), idx.reshape(len(target_xy), k)
+
+    if method == 'gaussian':
+        weights = _gaussian_weights(station_xy, dist, idx)
+    else:
+        weights = 1.0 / np.maximum(dist, MIN_DISTANCE_KM) ** IDW_POWER
+    weights[dist > MAX_DISTANCE_KM] = 0.0
+    # No usable weight (all neighbours far away, or clipped kriging weights): nearest station only
+    empty = weights.sum(axis=1) <= 0
+    weights[empty, 0] = 1.0
+    weights /= weights.sum(axis=1, keepdims=True)
+
+    rows = np.repeat(np.arange(len(target_xy)), k)
+    matrix = sparse.csr_matrix((weights.ravel(), (rows, idx.ravel())), shape=(len(target_xy), len(station_xy)))
+    return matrix, idx[:, 0], dist[:, 0]
+
+class VirtualSensorGrid:
+    """
+    Precomputed interpolation from the station network onto fixed targets (wards, raster cells).
+    The weights depend only on coordinates, so they are built once; every hour, all targets'
+    input windows are a single sparse matmul against the stacked station windows.
+    """
+
+    def __init__(self, stations_df, targets_df, k=NEIGHBORS, method=METHOD, target_col='ward_name'):
+        stations_df = stations_df.dropna(subset=['lat', 'lon']).drop_duplicates('station_name')
+        self.station_names = list(stations_df['station_name'])
+        self.target_names = list(targets_df[target_col]) if target_col in targets_df else list(range(len(targets_df)))
+        lat0 = stations_df['lat'].mean()
+        self.weights, nearest, self.nearest_km = interpolation_weights(
+            to_km(targets_df['lat'], targets_df['lon'], lat0),
+            to_km(stations_df['lat'], stations_df['lon'], lat0), k=k, method=method
+        )
+        self.nearest = [self.station_names[i] for i in nearest]
+
+    def _available(self, names):
+        """Weights restricted to the stations in `names` (rows renormalized) + their window positions."""
+        position = {name: i for i, name in enumerate(self.station_names)}
+        pairs = [(position[n], j) for j, n in enumerate(names) if n in position]
+        cols, rows = (np.array(p, dtype=np.int64) for p in zip(*pairs)) if pairs else (np.empty(0, np.int64),) * 2
+        weights = self.weights[:, cols]
+        sums = np.asarray(weights.sum(axis=1)).ravel()
+        scale = np.divide(1.0, sums, out=np.zeros_like(sums), where=sums > 0)
+        return sparse.diags(scale) @ weights, rows, sums > 0
+
+    def interpolate(self, names, windows):
+        """
+        Station windows (N, T, F) for station `names` -> every target's window (Targets, T, F).
+        Stations without a window are left out and the remaining weights renormalized;
+        targets none of whose neighbours reported come back as NaN.
+        """
+        windows = np.asarray(windows, dtype=np.float32)
+        weights, rows, covered = self._available(names)
+        flat = windows[rows].reshape(len(rows), -1)
+        out = np.asarray(weights @ flat, dtype=np.float32).reshape((len(self.target_names),) + windows.shape[1:])
+        out[~covered] = np.nan
+        return out
+
+    def neighbors(self, names):
+        """Most heavily weighted station among `names` per target (its id feeds the global model's embedding)."""
+        weights, rows, covered = self._available(names)
+        names = list(names)
+        best = np.asarray(weights.argmax(axis=1)).ravel()
+        return [names[rows[b]] if ok else None for b, ok in zip(best, covered)]
+
+def station_windows(pipeline, raw_df, lookback=LOOKBACK_WINDOW):
+    """
+    Scaled (N, lookback, F) windows of the stations whose data reaches the network's newest hour,
+    so every blended window covers the same hours. Returns (names, windows, newest hour).
+    """
+    df, scaled = pipeline.transform_array(raw_df, fill_missing=True)
+    codes, names = pd.factorize(df['station_name'])
+    ends = np.flatnonzero(np.diff(np.append(codes, -1))) + 1
+    starts = np.concatenate(([0], ends[:-1]))
+    if not len(ends):
+        return [], np.empty((0, lookback, scaled.shape[1]), dtype=np.float32), None
+
+    last = df['time'].dt.floor('h').to_numpy()[ends - 1]
+    newest = last.max()
+    ok = (ends - starts >= lookback) & (last == newest)
+    rows = ends[ok][:, None] - lookback + np.arange(lookback)
+    return list(np.asarray(names)[ok]), scaled[rows], pd.Timestamp(newest)
+
+def load_wards(path=WARDS_PATH):
+    """Ward centroids as (ward_name, lat, lon)."""
+    return pd.read_csv(path).rename(columns={'latitude': 'lat', 'longitude': 'lon'})
+
+def generate_virtual_input(lat, lon, stations_df, pipeline, raw_df=None):
+    """
+    One-off virtual sensor at (lat, lon): (input_tensor (1, T, F), nearest contributing station),
+    or (None, nearest station) when none of its neighbours has a current window.
+    For many targets, build a VirtualSensorGrid once and call interpolate() per hour instead.
+    """
+    from preprocessor import fetch_recent
+
+    grid = VirtualSensorGrid(stations_df, pd.DataFrame({'lat': [lat], 'lon': [lon]}))
+    raw_df = fetch_recent(grid.station_names) if raw_df is None else raw_df
+    names, windows, _ = station_windows(pipeline, raw_df)
+    window = grid.interpolate(names, windows)
+    neighbor = grid.neighbors(names)[0] or grid.nearest[0]
+    return (None if np.isnan(window).any() else window), neighbor
@@ -0,0 +1,125 @@
+# window_dataset.py
+
+import os
+import json
+import numpy as np
+import tensorflow as tf
+
+from preprocessor import LOOKBACK_WINDOW
+
+# --- Settings ---
+VALIDATION_FRACTION = 0.2   # Share of the timeline (by target time) held out for validation
+
+def split_by_time(base, val_fraction=VALIDATION_FRACTION, starts=None, lookback=LOOKBACK_WINDOW):
+    """
+    Splits window start indices on a single time boundary.
+    Every window whose target hour is before the boundary trains, the rest validate,
+    so validation is always "the future" for every station at once.
+    """
+    starts = base['starts'] if starts is None else starts
+    if len(starts) == 0:
+        return starts, starts, None
+
+    target_times = base['times'][starts + lookback]
+    cut = min(int(len(target_times) * (1 - val_fraction)), len(target_times) - 1)
+    boundary = np.sort(target_times)[cut]
+
+    train_starts = starts[target_times < boundary]
+    val_starts = starts[target_times >= boundary]
+    return train_starts, val_starts, boundary
+
+def make_window_dataset(base, starts, batch_size, shuffle=False, horizon=1, with_station=False):
+    """
+    Builds a tf.data pipeline that cuts (24, Features) windows on the fly.
+    Only the flat base arrays (or a memmap of them) and an int64 index per window live in memory
+    (windows are never cached: a cache would hold 24x the base arrays).
+
+    horizon: 1 = scalar next-hour target, H > 1 = (H,) vector of the next H hours.
+    with_station: inputs become (window, station id) from base['station_ids'] (global model).
+    """
+    if isinstance(base['features'], np.memmap):
+        # Disk-backed features (FeatureTensorStore.base_arrays): each batch reads only its rows
+        memmap = base['features']
+        features = None
+    else:
+        features = tf.constant(base['features'])
+    targets = tf.constant(base['targets'])
+    station_ids = tf.constant(base['station_ids']) if with_station else None
+    offsets = tf.range(LOOKBACK_WINDOW, dtype=tf.int64)
+    target_offsets = LOOKBACK_WINDOW + tf.range(horizon, dtype=tf.int64)
+
+    def target_rows(start):
+        return start + LOOKBACK_WINDOW if horizon == 1 else tf.expand_dims(start, -1) + target_offsets
+
+    def inputs(windows, start):
+        # Station id as a length-1 vector, matching the global model's (1,) input
+        return (windows, tf.expand_dims(tf.gather(station_ids, start), -1)) if with_station else windows
+
+    def window_batch(batch_starts):
+        # (Batch, 1) + (24,) -> (Batch, 24) row indices -> (Batch, 24, Features)
+        rows = tf.expand_dims(batch_starts, 1) + offsets
+        return inputs(gather_windows(rows), batch_starts), tf.gather(targets, target_rows(batch_starts))
+
+    def gather_windows(rows):
+        if features is not None:
+            return tf.gather(features, rows)
+        windows = tf.numpy_function(lambda r: np.asarray(memmap[r]), [rows], tf.float32)
+        windows.set_shape([None, LOOKBACK_WINDOW, memmap.shape[1]])
+        return windows
+
+    ds = tf.data.Dataset.from_tensor_slices(starts)
+    # Shuffling the indices is a full shuffle of the training range for the cost of 8 bytes/sample
+    if shuffle:
+        ds = ds.shuffle(len(starts), reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(window_batch, num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+def make_train_val_datasets(base, batch_size, val_fraction=VALIDATION_FRACTION, horizon=1, with_station=False):
+    """
+    Returns (train_ds, val_ds, boundary). Training windows are shuffled, validation windows are not.
+    """
+    train_starts, val_starts, boundary = split_by_time(base, val_fraction)
+
+    train_ds = make_window_dataset(base, train_starts, batch_size, shuffle=True,
+                                   horizon=horizon, with_station=with_station)
+    val_ds = make_window_dataset(base, val_starts, batch_size, shuffle=False,
+                                 horizon=horizon, with_station=with_station)
+
+    print(f"   > Time split at {boundary}: {len(train_starts)} train / {len(val_starts)} validation windows")
+    return train_ds, val_ds, boundary
+
+def shard_samples(shard_dir, split):
+    """Number of windows in one split of an ooc_prepare.py shard directory."""
+    with open(os.path.join(shard_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    return sum(s['samples'] for s in manifest['shards'] if s['split'] == split)
+
+def make_shard_dataset(shard_dir, split, batch_size, shuffle=False):
+    """
+    Streams pre-windowed shards written by ooc_prepare.py. Shards are memory-mapped
+    and read one at a time, so RAM stays bounded by a single shard.
+    """
+    with open(os.path.join(shard_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    names = [s['name'] for s in manifest['shards'] if s['split'] == split]
+    n_features = None
+    if names:
+        n_features = np.load(os.path.join(shard_dir, f"{names[0]}.X.npy"), mmap_mode='r').shape[-1]
+
+    def generator():
+        order = np.random.permutation(len(names)) if shuffle else range(len(names))
+        for i in order:
+            X = np.load(os.path.join(shard_dir, f"{names[i]}.X.npy"), mmap_mode='r')
+            y = np.load(os.path.join(shard_dir, f"{names[i]}.y.npy"), mmap_mode='r')
+            rows = np.random.permutation(len(y)) if shuffle else np.arange(len(y))
+            for start in range(0, len(rows), batch_size):
+                # Sorted indices keep the memmap reads sequential within a batch
+                batch = np.sort(rows[start:start + batch_size])
+                yield X[batch], y[batch]
+
+    signature = (
+        tf.TensorSpec(shape=(None, manifest['lookback'], n_features), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.float32),
+    )
+    ds = tf.data.Dataset.from_generator(generator, output_signature=signature)
+    return ds.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,7 @@
+# conftest.py
+
+import os
+import sys
+
+# ml_engine modules import each other as top-level modules (scripts run from that directory)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ml_engine'))
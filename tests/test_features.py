@@ -0,0 +1,53 @@
+# test_features.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FeaturePipeline, impute_segments, segment_bounds
+from preprocessor import FEATURE_COLS, RAW_FEATURE_COLS
+
+def pandas_reference(df):
+    """The groupby interpolate/ffill/bfill + sin/cos path FeaturePipeline replaced."""
+    df = df.sort_values(by=['station_name', 'time'], kind='stable').reset_index(drop=True)
+    df[RAW_FEATURE_COLS] = df.groupby('station_name')[RAW_FEATURE_COLS].transform(
+        lambda group: group.interpolate(method='linear').ffill().bfill()
+    )
+    hour, day = df['time'].dt.hour, df['time'].dt.dayofweek
+    df['hour_sin'] = np.sin(2 * np.pi * hour / 24)
+    df['hour_cos'] = np.cos(2 * np.pi * hour / 24)
+    df['day_sin'] = np.sin(2 * np.pi * day / 7)
+    df['day_cos'] = np.cos(2 * np.pi * day / 7)
+    return df
+
+def make_frame(seed=0, hours=40):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for name in ['Station C', 'Station A', 'Station B']:   # Unsorted on purpose
+        times = pd.date_range('2024-01-01', periods=hours, freq='h', tz='Asia/Kolkata')
+        values = rng.normal(50, 10, size=(hours, len(RAW_FEATURE_COLS)))
+        values[rng.random(values.shape) < 0.2] = np.nan   # Interior gaps
+        values[:3, 0] = np.nan                            # Leading gap
+        values[-4:, 1] = np.nan                           # Trailing gap
+        frames.append(pd.DataFrame(values, columns=RAW_FEATURE_COLS).assign(time=times, station_name=name))
+    df = pd.concat(frames, ignore_index=True)
+    df.loc[df['station_name'] == 'Station B', 'congestion_factor'] = np.nan   # Column never reported
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_encode_matches_pandas_groupby_path(seed):
+    df = make_frame(seed)
+    expected = pandas_reference(df.copy())
+    sorted_df, matrix = FeaturePipeline().encode(df)
+
+    assert list(sorted_df['station_name']) == list(expected['station_name'])
+    np.testing.assert_allclose(matrix, expected[FEATURE_COLS].to_numpy(dtype=np.float64), equal_nan=True)
+
+def test_impute_segments_never_crosses_stations():
+    values = np.array([[1.0], [np.nan], [np.nan], [10.0], [np.nan]])
+    row_start, row_end = segment_bounds(np.array([0, 0, 0, 1, 1]))
+    # Station 0: trailing ffill from 1.0 (not interpolated towards station 1's 10.0); station 1: ffill
+    np.testing.assert_array_equal(impute_segments(values, row_start, row_end).ravel(), [1, 1, 1, 10, 10])
+
+def test_impute_segments_empty():
+    assert impute_segments(np.empty((0, 3)), np.empty(0, int), np.empty(0, int)).shape == (0, 3)
@@ -0,0 +1,45 @@
+# test_history.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from history import lttb, pick_resolution
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=np.float64) * 3600.0   # Hourly epochs
+    return x, np.cumsum(rng.normal(size=n)) + 50
+
+@pytest.mark.parametrize('n, threshold', [(1000, 400), (401, 400), (50, 3), (10_000, 97)])
+def test_lttb_keeps_endpoints_and_length(n, threshold):
+    x, y = series(n)
+    keep = lttb(x, y, threshold)
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == n - 1
+
+@pytest.mark.parametrize('threshold', [3, 50, 400])
+def test_lttb_indices_strictly_increasing(threshold):
+    x, y = series(2000, seed=1)
+    keep = lttb(x, y, threshold)
+    assert np.all(np.diff(keep) > 0)
+    assert np.all(np.diff(x[keep]) > 0)   # Time stays monotonic in the downsampled chart
+
+def test_lttb_short_series_unchanged():
+    x, y = series(10)
+    np.testing.assert_array_equal(lttb(x, y, 10), np.arange(10))
+    np.testing.assert_array_equal(lttb(x, y, 400), np.arange(10))
+    np.testing.assert_array_equal(lttb(x, y, 2), np.arange(10))
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[537] = 100.0
+    assert 537 in lttb(x, y, 20)
+
+def test_pick_resolution_boundaries():
+    assert pick_resolution(72) == 'raw'
+    assert pick_resolution(73) == 'hourly'
+    assert pick_resolution(24 * 120) == 'hourly'
+    assert pick_resolution(24 * 120 + 1) == 'daily'
@@ -0,0 +1,65 @@
+# test_numpy_lstm.py
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from numpy_lstm import NumpyLSTM, extract_weights
+from train_model import build_model, build_global_model
+
+STEPS, FEATURES, UNITS = 6, 4, 8
+
+@pytest.fixture(scope='module')
+def model():
+    tf.keras.utils.set_random_seed(0)
+    return build_model((STEPS, FEATURES), units=UNITS, horizon=3)
+
+@pytest.fixture(scope='module')
+def windows():
+    return np.random.default_rng(0).normal(size=(5, STEPS, FEATURES)).astype(np.float32)
+
+def keras_sequences(model, windows):
+    """Hidden and cell state after every step, from a Keras LSTM carrying the model's weights."""
+    source = next(layer for layer in model.layers if isinstance(layer, tf.keras.layers.LSTM))
+    lstm = tf.keras.layers.LSTM(UNITS, return_sequences=True, return_state=True)
+    lstm(windows)
+    lstm.set_weights(source.get_weights())
+    hs, cs = [], []
+    for t in range(1, STEPS + 1):
+        _, h, c = lstm(windows[:, :t])
+        hs.append(np.asarray(h))
+        cs.append(np.asarray(c))
+    return np.stack(hs), np.stack(cs)
+
+def test_run_matches_keras_states(model, windows):
+    engine = NumpyLSTM(extract_weights(model))
+    hs, cs = engine.run(windows, return_sequences=True)
+    keras_hs, keras_cs = keras_sequences(model, windows)
+    np.testing.assert_allclose(hs, keras_hs, atol=1e-5)
+    np.testing.assert_allclose(cs, keras_cs, atol=1e-5)
+
+    h, c = engine.run(windows)
+    np.testing.assert_allclose(h, keras_hs[-1], atol=1e-5)
+    np.testing.assert_allclose(c, keras_cs[-1], atol=1e-5)
+
+def test_step_matches_keras_states(model, windows):
+    engine = NumpyLSTM(extract_weights(model))
+    keras_hs, keras_cs = keras_sequences(model, windows)
+    h, c = engine.zero_state(len(windows))
+    for t in range(STEPS):
+        h, c = engine.step(windows[:, t], h, c)
+        np.testing.assert_allclose(h, keras_hs[t], atol=1e-5)
+        np.testing.assert_allclose(c, keras_cs[t], atol=1e-5)
+
+def test_forward_matches_keras_model(model, windows):
+    engine = NumpyLSTM(extract_weights(model))
+    np.testing.assert_allclose(engine(windows), model(windows, training=False), atol=1e-5)
+
+def test_forward_matches_global_model(windows):
+    tf.keras.utils.set_random_seed(1)
+    model = build_global_model((STEPS, FEATURES), n_stations=3, units=UNITS, horizon=3)
+    station_ids = np.array([[0], [2], [1], [0], [2]])
+    engine = NumpyLSTM(extract_weights(model))
+    np.testing.assert_allclose(engine([windows, station_ids]), model([windows, station_ids], training=False),
+                               atol=1e-5)
@@ -0,0 +1,81 @@
+# test_prediction_cache.py
+
+import threading
+import time
+
+import pytest
+
+from prediction_cache import PredictionCache
+
+def test_lru_evicts_least_recently_used():
+    cache = PredictionCache(max_entries=2)
+    cache.put('A', 1, 'v1', 10)
+    cache.put('B', 1, 'v1', 20)
+    assert cache.get('A', 1, 'v1') == 10   # A is now the most recent
+    cache.put('C', 1, 'v1', 30)
+
+    assert cache.get('B', 1, 'v1') is None
+    assert cache.get('A', 1, 'v1') == 10
+    assert cache.get('C', 1, 'v1') == 30
+    assert cache.stats()['entries'] == 2
+
+def test_key_includes_hour_and_version():
+    cache = PredictionCache()
+    cache.put('A', 1, 'v1', 10)
+    assert cache.get('A', 2, 'v1') is None
+    assert cache.get('A', 1, 'v2') is None
+    assert cache.stats() == {'entries': 1, 'hits': 0, 'misses': 2, 'hit_rate': 0.0}
+
+def test_concurrent_misses_compute_once():
+    cache = PredictionCache()
+    calls, started = [], threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)   # Keep the key in flight while the other threads arrive
+        return 42
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute('A', 1, 'v1', compute)))
+    owner.start()
+    started.wait()
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_compute('A', 1, 'v1', compute)))
+               for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    for thread in [owner] + waiters:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [42] * 5
+    assert not cache.inflight
+
+def test_none_results_are_not_cached():
+    cache = PredictionCache()
+    assert cache.get_or_compute('A', 1, 'v1', lambda: None) is None
+    assert cache.get_or_compute('A', 1, 'v1', lambda: 7) == 7
+    assert cache.get('A', 1, 'v1') == 7
+
+def test_failed_compute_releases_the_key():
+    cache = PredictionCache()
+
+    def fail():
+        raise RuntimeError("model unavailable")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('A', 1, 'v1', fail)
+    assert not cache.inflight
+    assert cache.get_or_compute('A', 1, 'v1', lambda: 5) == 5
+
+def test_invalidate_by_station_and_version():
+    cache = PredictionCache()
+    cache.put('A', 1, 'v1', 1)
+    cache.put('A', 2, 'v2', 2)
+    cache.put('B', 1, 'v1', 3)
+
+    assert cache.invalidate(station='A', version='v1') == 1
+    assert cache.invalidate(version='v1') == 1
+    assert cache.get('A', 2, 'v2') == 2
+    assert cache.invalidate() == 1
+    assert cache.stats()['entries'] == 0
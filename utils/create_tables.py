@@ -1,9 +1,19 @@
 # create_tables.py
 import os
+import importlib.util
+from pathlib import Path
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from dotenv import load_dotenv
 
+# forecast_logs is shared with ml_engine/forecast_writer.py through ml_engine/schema.py (no imports),
+# loaded by file so setup does not need the ML dependencies
+_schema_spec = importlib.util.spec_from_file_location(
+    "aeris_schema", Path(__file__).resolve().parent.parent / "ml_engine" / "schema.py")
+_schema = importlib.util.module_from_spec(_schema_spec)
+_schema_spec.loader.exec_module(_schema)
+FORECAST_LOGS_DDL = _schema.FORECAST_LOGS_DDL
+
 # Load environment variables
 load_dotenv()
 
@@ -59,9 +69,15 @@ def create_tables(conn):
             );
         """)
 
+        # --- 3. Create the Forecast Log Table ---
+        # Written by ml_engine/forecast_writer.py after every ingestion cycle.
+        # One row per (station, target hour, lead time, model); the scorecard joins it with aqi_data.
+        print("Creating 'forecast_logs' table...")
+        cursor.execute(FORECAST_LOGS_DDL)
+
         print("✅ Tables created successfully (if they didn't exist).")
 
-        # --- 3. Convert Tables to TimescaleDB Hypertables ---
+        # --- 4. Convert Tables to TimescaleDB Hypertables ---
         # This is the "magic" of TimescaleDB. It partitions the data
         # by time, making queries much faster.
         print("Converting tables to hypertables...")
@@ -69,9 +85,46 @@ def create_tables(conn):
         # We only need to do this once. The 'IF NOT EXISTS' is crucial.
         cursor.execute("SELECT create_hypertable('weather_data', 'time', if_not_exists => TRUE);")
         cursor.execute("SELECT create_hypertable('aqi_data', 'time', if_not_exists => TRUE);")
+        cursor.execute("SELECT create_hypertable('forecast_logs', 'target_hour', if_not_exists => TRUE);")
 
         print("✅ Hypertables configured successfully.")
 
+        # --- 5. Per-Station Indexes ---
+        # The primary keys lead with time; inference reads one station's newest hours
+        # (preprocessor.fetch_recent / latest_feature_hour), which wants the station first.
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS aqi_data_station_pollutant_time_idx
+            ON aqi_data (station_name, pollutant_id, time DESC);
+        """)
+        print("✅ Station indexes configured successfully.")
+
+        # --- 6. Rollups for Long-Range Charts ---
+        # Continuous aggregates read by ml_engine/history.py: a month or a year of history is
+        # served from hourly / daily rows instead of every raw reading.
+        # materialized_only = false adds the not-yet-materialized newest buckets at query time.
+        print("Creating 'aqi_hourly' / 'aqi_daily' rollups...")
+        for view, width, start_offset in (('aqi_hourly', '1 hour', '3 days'), ('aqi_daily', '1 day', '7 days')):
+            cursor.execute(f"""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+                WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+                SELECT time_bucket('{width}', time) AS bucket, station_name, pollutant_id,
+                       AVG(pollutant_avg)::float8 AS pollutant_avg,
+                       MIN(pollutant_avg)::float8 AS pollutant_min,
+                       MAX(pollutant_avg)::float8 AS pollutant_max
+                FROM aqi_data
+                GROUP BY 1, 2, 3
+                WITH NO DATA;
+            """)
+            cursor.execute(f"""
+                SELECT add_continuous_aggregate_policy('{view}',
+                    start_offset => INTERVAL '{start_offset}', end_offset => INTERVAL '{width}',
+                    schedule_interval => INTERVAL '{width}', if_not_exists => TRUE);
+            """)
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {view}_station_idx ON {view} (station_name, pollutant_id, bucket DESC);")
+            # Backfill whatever history is already in aqi_data (the policy only covers the recent window)
+            cursor.execute(f"CALL refresh_continuous_aggregate('{view}', NULL, NULL);")
+        print("✅ Rollups configured successfully.")
+
         cursor.close()
     except psycopg2.Error as e:
         print(f"Error creating tables or hypertables: \n{e}")
@@ -128,6 +128,18 @@ def sync():
         # Remote Cleanup
         run_command(f'ssh {ssh_opts} {REMOTE_USER}@{SERVER_IP} "rm {remote_csv_path}"')
 
+    # Rebuild the history rollups (utils/create_tables.py) over the replaced rows
+    for view in ("aqi_hourly", "aqi_daily"):
+        refresh_cmd = (
+            f"docker exec {LOCAL_CONTAINER} psql -U {LOCAL_DB_USER} -d aeris_db "
+            f"-c \"CALL refresh_continuous_aggregate('{view}', NULL, NULL);\""
+        )
+        subprocess.run(refresh_cmd, shell=True, stdin=subprocess.DEVNULL)
+
+    # Tell listening dashboards (ml_engine/data_events.py) that every table changed
+    notify_cmd = f"docker exec {LOCAL_CONTAINER} psql -U {LOCAL_DB_USER} -d aeris_db -c \"NOTIFY aeris_data;\""
+    subprocess.run(notify_cmd, shell=True, stdin=subprocess.DEVNULL)
+
     print("\n🧹 Cleaning up keys...")
     force_delete_temp_key()
     print("✅ All tables synced successfully! Check your row counts.")